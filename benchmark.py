@@ -0,0 +1,378 @@
+"""
+Conversion speed benchmark.
+
+    python -m benchmark                        # example log + 10 MB synthetic
+    python -m benchmark --sizes 10 100 1000 --legacy
+    python -m benchmark --vectorized
+    python -m benchmark --sizes --no-phases --event-windows
+
+Times the engine conversion the GUI runs (Model._convertLog) end to end and
+per phase, and optionally the legacy src/model/convertLog.py script and the
+engine with vectorIt, on the example log and on synthetic logs built from
+it.  Reports lines/s, MB/s and peak RSS, and checks the outputs against the
+reference out.txt (example log) or against the legacy script's outputs
+(synthetic logs), and the vectorized outputs against the engine's.  With
+--event-windows it also checks the event indexes of time windows of the
+example log against its whole conversion's.
+"""
+
+import argparse
+import contextlib
+import filecmp
+import io
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from helpers.helpers import get_root_dir
+from src.model.engine import ConvertEngine, output_paths
+from src.model.events import events_path, read_events
+from src.model.mapped import MappedLog
+from src.model.snapshot import convert_resumable, snapshot_path
+from src.model.timeindex import build_index, convert_span
+
+EXAMPLE_LOG: Path = get_root_dir() / 'log_data' / 'example_data' / 'sn1060log18.txt'
+REFERENCE_TXT: Path = EXAMPLE_LOG.with_name('sn1060log18out.txt')
+LEGACY_SCRIPT: Path = get_root_dir() / 'src' / 'model' / 'convertLog.py'
+
+_DT_DATE = re.compile(rb'^(DT )(\d\d/\d\d/\d\d)', re.MULTILINE)
+
+
+class _Discard(io.TextIOBase):
+    # An output that throws away what is written, to time everything but
+    # the write itself.
+    def write(self, s: str) -> int:
+        return len(s)
+
+
+def make_synthetic(template: Path, size_mb: int, output: Path) -> Path:
+    """
+    Build a raw log of about size_mb MB with the template's tag mix by
+    repeating it, moving the DT dates of every repeat on past the last.
+
+    Inputs [template, size_mb, output]:
+        The raw log to repeat, the size wanted and the file to write.
+    Returns [Path]:
+        output
+    """
+    data = template.read_bytes()
+    dates = [
+        datetime.strptime(m[2].decode(), '%m/%d/%y') for m in _DT_DATE.finditer(data)
+    ]
+    span = (max(dates) - min(dates)).days + 1 if dates else 0
+    pieces = _DT_DATE.split(data)  # text, 'DT ', date, text, 'DT ', date, ...
+    with open(output, 'wb') as f:
+        k = 0
+        while f.tell() < size_mb * 1048576:
+            shift = timedelta(days=k * span)
+            for i, piece in enumerate(pieces):
+                if i % 3 == 2:
+                    date = datetime.strptime(piece.decode(), '%m/%d/%y') + shift
+                    piece = date.strftime('%m/%d/%y').encode()
+                f.write(piece)
+            k += 1
+    return output
+
+
+def _count_lines(input_data: Path) -> int:
+    lines = 0
+    with open(input_data, 'rb') as f:
+        while block := f.read(1048576):
+            lines += block.count(b'\n')
+    return lines
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource  # not on Windows
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1048576 if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_engine(
+    input_data: Path, workdir: Path, vectorIt: bool = False
+) -> dict[str, Any]:
+    # Runs in a fresh process, so the peak RSS is this conversion's own
+    if vectorIt:
+        workdir = workdir / 'vectorized'
+    _, output_txt, output_csv = output_paths(workdir, input_data.stem)
+    output_txt.parent.mkdir(parents=True, exist_ok=True)
+    output_txt.write_text('')
+    snapshot_path(output_txt).unlink(missing_ok=True)
+    start = time.perf_counter()
+    with (
+        open(workdir / 'engine.stdout', 'w') as out,
+        contextlib.redirect_stdout(out),
+    ):
+        convert_resumable(
+            ConvertEngine(vectorIt=vectorIt), input_data, output_txt, output_csv
+        )
+    return {
+        'seconds': time.perf_counter() - start,
+        'rss': _peak_rss_mb(),
+        'txt': output_txt,
+        'csv': output_csv,
+    }
+
+
+def _run_legacy(input_data: Path, workdir: Path) -> dict[str, Any]:
+    # Runs in a fresh process.  Imported, the legacy script only defines
+    # convertLog(), which works on its module's files and settings.
+    from src.model import convertLog as legacy
+
+    legacy_dir = workdir / 'legacy'
+    legacy_dir.mkdir(parents=True, exist_ok=True)
+    output_txt = legacy_dir / f'{input_data.stem}out.txt'
+    output_csv = legacy_dir / f'{input_data.stem}.csv'
+    legacy.printIt = False
+    legacy.csvIt = True
+    start = time.perf_counter()
+    with (
+        open(input_data) as logIn,
+        open(output_txt, 'w') as logOut,
+        open(output_csv, 'w') as csvOut,
+        open(workdir / 'legacy.stdout', 'w') as out,
+        contextlib.redirect_stdout(out),
+    ):
+        legacy.logIn, legacy.logOut, legacy.csvOut = logIn, logOut, csvOut
+        legacy.convertLog()  # closes the files itself
+    return {
+        'seconds': time.perf_counter() - start,
+        'rss': _peak_rss_mb(),
+        'txt': output_txt,
+        'csv': output_csv,
+    }
+
+
+def _in_fresh_process(fn: Any, *args: Any) -> dict[str, Any]:
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def time_phases(input_data: Path) -> dict[str, float]:
+    """
+    Split the engine's conversion time into phases by running it with
+    parts of the work switched off and taking the differences.
+
+    Returns [dict(str, float)]:
+        Seconds for read, decode (the tag dispatch included), txt write,
+        csv build and csv write.
+    """
+    engine = ConvertEngine()
+
+    def timed(logOut: io.TextIOBase, csvOut: io.TextIOBase | None) -> float:
+        with MappedLog(input_data) as logIn:
+            start = time.perf_counter()
+            engine.run(logIn, logOut, csvOut)
+            return time.perf_counter() - start
+
+    with MappedLog(input_data) as logIn:
+        start = time.perf_counter()
+        lines = [logLine for logLine in iter(logIn.readline, '')]
+        read = time.perf_counter() - start
+    del lines
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(Path(tmp) / 'out.txt', 'w') as txt:
+            parsed = timed(_Discard(), None)
+            written = timed(txt, None)
+        with open(Path(tmp) / 'out.txt', 'w') as txt:
+            built = timed(txt, _Discard())
+        with (
+            open(Path(tmp) / 'out.txt', 'w') as txt,
+            open(Path(tmp) / 'out.csv', 'w') as csv,
+        ):
+            full = timed(txt, csv)
+    return {
+        'read': read,
+        'decode': max(parsed - read, 0.0),
+        'txt write': max(written - parsed, 0.0),
+        'csv build': max(built - written, 0.0),
+        'csv write': max(full - built, 0.0),
+    }
+
+
+def check_event_windows(input_data: Path, workdir: Path) -> tuple[int, int]:
+    """
+    Check that a time window's event index holds exactly the whole log's
+    events on the window's lines, leak and pump changes included: convert
+    the log with eventsIt, then the windows from each event's line to the
+    next event's and to 6 lines on (timeindex.convert_span()).
+
+    Returns [tuple(int, int)]:
+        The windows checked and those that differ.
+    """
+    log = workdir / input_data.name  # the time index goes next to it
+    shutil.copyfile(input_data, log)
+    engine = ConvertEngine(eventsIt=True)
+    _, output_txt, output_csv = output_paths(workdir / 'events', log.stem)
+    output_txt.parent.mkdir(parents=True, exist_ok=True)
+    output_txt.write_text('')
+    window_txt = output_txt.with_name('window.txt')
+    window_csv = output_csv.with_name('windowout.csv')
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.convert(log, output_txt, output_csv)
+        index = build_index(engine, log)
+    # The csv row is the window's own out.csv's, so it is left out
+    whole = [
+        (e.time, e.line, e.offset, e.type, e.payload)
+        for e in read_events(events_path(output_csv))
+    ]
+    lines = sorted({event[1] for event in whole})
+    windows = [
+        (first, stop)
+        for first, next_line in zip(lines, lines[1:] + [None], strict=True)
+        for stop in (next_line, first + 6)
+    ]
+    differ = 0
+    for first, stop in windows:
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_span(engine, log, index, (first, stop), window_txt, window_csv)
+        got = [
+            (e.time, e.line, e.offset, e.type, e.payload)
+            for e in read_events(events_path(window_csv))
+        ]
+        differ += got != [
+            event
+            for event in whole
+            if event[1] >= first and (stop is None or event[1] < stop)
+        ]
+    return len(windows), differ
+
+
+def _same(a: Path, b: Path) -> bool:
+    return a.exists() and b.exists() and filecmp.cmp(a, b, shallow=False)
+
+
+def _row(name: str, size: int, lines: int, result: dict[str, Any], match: str) -> str:
+    seconds = result['seconds']
+    rss = f'{result["rss"]:8.1f}' if result['rss'] is not None else '       -'
+    return (
+        f'{name:<28} {size / 1048576:9.1f} {seconds:9.2f} {lines / seconds:11.0f}'
+        f' {size / 1048576 / seconds:7.2f} {rss}  {match}'
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='benchmark', description=__doc__.split('\n')[1]
+    )
+    parser.add_argument(
+        '--sizes',
+        type=int,
+        nargs='*',
+        default=[10],
+        help='synthetic log sizes in MB (default: 10; try 10 100 1000)',
+    )
+    parser.add_argument(
+        '--legacy', action='store_true', help='also time src/model/convertLog.py'
+    )
+    parser.add_argument(
+        '--vectorized',
+        action='store_true',
+        help='also time the engine with vectorIt (needs numpy)',
+    )
+    parser.add_argument(
+        '--no-phases', action='store_true', help='skip the per phase timings'
+    )
+    parser.add_argument(
+        '--event-windows',
+        action='store_true',
+        help="also check the example log's time windows' event indexes against"
+        " its whole conversion's",
+    )
+    parser.add_argument('--keep', type=Path, help='work in this folder and keep it')
+    args = parser.parse_args(argv)
+
+    workroot = args.keep or Path(tempfile.mkdtemp(prefix='heu3bench'))
+    workroot.mkdir(parents=True, exist_ok=True)
+    inputs = [EXAMPLE_LOG]
+    for size_mb in args.sizes:
+        inputs.append(
+            make_synthetic(EXAMPLE_LOG, size_mb, workroot / f'sn9999log{size_mb}MB.txt')
+        )
+
+    print(
+        f'{"conversion":<28} {"MB":>9} {"seconds":>9} {"lines/s":>11}'
+        f' {"MB/s":>7} {"RSS MB":>8}  output'
+    )
+    failures = 0
+    try:
+        for input_data in inputs:
+            size = input_data.stat().st_size
+            lines = _count_lines(input_data)
+            workdir = workroot / input_data.stem
+            workdir.mkdir(exist_ok=True)
+            engine = _in_fresh_process(_run_engine, input_data, workdir)
+            legacy = None
+            if args.legacy:
+                legacy = _in_fresh_process(_run_legacy, input_data, workdir)
+
+            if input_data == EXAMPLE_LOG:
+                match = (
+                    'matches reference'
+                    if _same(engine['txt'], REFERENCE_TXT)
+                    else 'DIFFERS'
+                )
+            elif legacy is not None:
+                same = _same(engine['txt'], legacy['txt']) and _same(
+                    engine['csv'], legacy['csv']
+                )
+                match = 'matches legacy' if same else 'DIFFERS'
+            else:
+                match = 'unchecked (use --legacy)'
+            failures += match == 'DIFFERS'
+            print(_row(f'{input_data.stem} engine', size, lines, engine, match))
+            if args.vectorized:
+                vector = _in_fresh_process(_run_engine, input_data, workdir, True)
+                same = _same(vector['txt'], engine['txt']) and _same(
+                    vector['csv'], engine['csv']
+                )
+                failures += not same
+                print(
+                    _row(
+                        f'{input_data.stem} vectorized',
+                        size,
+                        lines,
+                        vector,
+                        'matches engine' if same else 'DIFFERS',
+                    )
+                )
+            if legacy is not None:
+                legacy_match = ''
+                if input_data == EXAMPLE_LOG:
+                    legacy_match = (
+                        'matches reference'
+                        if _same(legacy['txt'], REFERENCE_TXT)
+                        else 'DIFFERS'
+                    )
+                print(
+                    _row(f'{input_data.stem} legacy', size, lines, legacy, legacy_match)
+                )
+
+            if not args.no_phases:
+                phases = time_phases(input_data)
+                print('    ' + '  '.join(f'{k} {v:.2f}s' for k, v in phases.items()))
+            if args.event_windows and input_data == EXAMPLE_LOG:
+                checked, differ = check_event_windows(input_data, workdir)
+                failures += differ
+                print(
+                    f'    event windows: {checked} checked,'
+                    f' {"all match" if not differ else f"{differ} DIFFER"}'
+                )
+    finally:
+        if args.keep is None:
+            shutil.rmtree(workroot, ignore_errors=True)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,3 +9,16 @@ MEGS: int = 1
 MUTE: int = 0
 START_LINE: int = 0
 END_LINE: int = 20000000
+
+# Shared folder for converted outputs, reused for logs converted before ('' for
+# none; each output folder still remembers its own conversion), and its limit.
+CACHE_DIR: str = ''
+CACHE_MB: int = 1024
+
+# Compression of out.txt/out.csv and of pulled raw logs ('' for none, 'gz' or
+# 'zst'; zst needs the zstandard package).
+COMPRESSION: str = ''
+
+# SQLite database every conversion also inserts its csv rows and flag changes
+# into, for questions across the fleet ('' for none).
+FLEET_DB: str = ''
@@ -4,8 +4,6 @@ import sys
 from pathlib import Path
 from typing import TypeAlias
 
-from PySide6.QtWidgets import QFileDialog
-
 ConfigData: TypeAlias = configparser.ConfigParser
 
 
@@ -103,6 +101,7 @@ def select_folder() -> str:
         Path: The path to the selected folder. If the dialog is cancelled,
              an empty string is returned.
     """
+    from PySide6.QtWidgets import QFileDialog  # Qt only when a dialog is needed
 
     folder_path: str = QFileDialog.getExistingDirectory(
         parent=None,
@@ -115,6 +114,8 @@ def select_folder() -> str:
 
 
 def select_file(default_dir: str) -> str:
+    from PySide6.QtWidgets import QFileDialog  # Qt only when a dialog is needed
+
     file_path: str
     file_path, _ = QFileDialog.getOpenFileName(
         parent=None, caption='Choose File', dir=default_dir
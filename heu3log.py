@@ -0,0 +1,330 @@
+"""
+Headless command line for the HEU3 log converter.
+
+    python -m heu3log convert sn1060log18.txt --out DIR
+    python -m heu3log convert huge_log.txt --workers 8
+    python -m heu3log convert huge_log.txt --vectorized
+    python -m heu3log convert sn1060log18.txt.gz --compress gz
+    python -m heu3log batch log_data/ --fleet-db fleet.db
+    python -m heu3log convert sn1060log18.txt --from '2025-10-23 13:00' --to '2025-10-23 14:30'
+    python -m heu3log batch log_data/ --workers 8
+    python -m heu3log triage sn1060log18.txt --before 10 --after 2
+    python -m heu3log expand log_data/sn1060log18out/sn1060log18out.sparse.csv
+
+Settings not given on the command line come from configuration/config.ini.
+Nothing here imports Qt or pyserial, so it runs on machines without a
+display or a COM port.
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from helpers.helpers import get_ini_info
+from src.model.batch import convert_batch, find_logs, format_report
+from src.model.cache import CACHE_BYTES, ConversionCache
+from src.model.compress import COMPRESSIONS
+from src.model.engine import ConvertEngine, convert_file
+from src.model.incidents import FAULT_TYPES, extract_incidents
+from src.model.sparse import expand_sparse
+
+
+def _add_engine_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        '--csv',
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help='also create out.csv (default: yes)',
+    )
+    parser.add_argument(
+        '--npz',
+        action='store_true',
+        help='also save the csv columns as typed arrays in out.npz (needs numpy)',
+    )
+    parser.add_argument(
+        '--sparse',
+        action='store_true',
+        help='also save only the csv changes in out.sparse.csv (see expand)',
+    )
+    parser.add_argument(
+        '--decimate',
+        action='store_true',
+        help='also save min/max/last per 1 s, 10 s and 1 min in out.1s.csv, ...',
+    )
+    parser.add_argument(
+        '--events',
+        action='store_true',
+        help='also index the restarts, WDT reboots, leaks and pump faults in'
+        ' out.events.csv',
+    )
+    parser.add_argument(
+        '--compress',
+        choices=list(COMPRESSIONS),
+        help='write out.txt and out.csv compressed, as out.txt.gz ... (zst needs'
+        ' zstandard)',
+    )
+    parser.add_argument(
+        '--vectorized',
+        action='store_true',
+        help='convert the FL/TM/DB/TH lines a block at a time, same outputs (needs'
+        ' numpy)',
+    )
+    parser.add_argument(
+        '--fleet-db',
+        type=Path,
+        help='also insert the csv rows and flag changes into this SQLite database,'
+        ' shared by every unit (see src/model/fleet.py)',
+    )
+    parser.add_argument(
+        '--sn',
+        help="the unit's serial number in --fleet-db (default: from the log's name,"
+        ' sn<SN>log<N>)',
+    )
+    parser.add_argument('--print', action='store_true', help='print the log entries')
+    parser.add_argument('--log-version', type=int, help='LOG_VERSION override')
+    parser.add_argument('--tz', type=int, help='TIME_ZONE_OFFSET override (hours)')
+    parser.add_argument('--date-line', type=int, help='DATE_LINE_OFFSET override')
+    parser.add_argument('--mute', type=int, help='MUTE override')
+    parser.add_argument('--start-line', type=int, help='START_LINE override')
+    parser.add_argument('--end-line', type=int, help='END_LINE override')
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help='skip logs already converted into their outputs with the same settings',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=Path,
+        help='also keep outputs in this shared folder and reuse them (implies --cache)',
+    )
+    parser.add_argument(
+        '--cache-mb',
+        type=int,
+        default=CACHE_BYTES // 1048576,
+        help=f'size limit of --cache-dir in MB (default: {CACHE_BYTES // 1048576})',
+    )
+
+
+def _make_engine(args: argparse.Namespace) -> ConvertEngine:
+    """
+    Build the conversion engine from config.ini, overridden by any settings
+    given on the command line.
+    """
+    ini: dict[str, str | int] = get_ini_info()
+
+    def pick(value: int | None, key: str) -> int:
+        return value if value is not None else int(ini[key])
+
+    return ConvertEngine(
+        logVersion=pick(args.log_version, 'LOG_VERSION'),
+        timeZoneOffset=pick(args.tz, 'TIME_ZONE_OFFSET'),
+        dateLineOffset=pick(args.date_line, 'DATE_LINE_OFFSET'),
+        mute=pick(args.mute, 'MUTE'),
+        startLine=pick(args.start_line, 'START_LINE'),
+        endLine=pick(args.end_line, 'END_LINE'),
+        printIt=args.print,
+        csvIt=args.csv,
+        npzIt=args.npz,
+        sparseIt=args.sparse,
+        decimateIt=args.decimate,
+        compression=args.compress,
+        vectorIt=args.vectorized,
+        fleetDb=str(args.fleet_db) if args.fleet_db is not None else None,
+        fleetSN=args.sn,
+        eventsIt=args.events,
+    )
+
+
+def _make_cache(args: argparse.Namespace) -> ConversionCache | None:
+    if not args.cache and args.cache_dir is None:
+        return None
+    return ConversionCache(args.cache_dir, args.cache_mb * 1048576)
+
+
+def _convert(args: argparse.Namespace) -> int:
+    engine = _make_engine(args)
+    cache = _make_cache(args)
+    window = None
+    if args.start is not None or args.end is not None:
+        window = (args.start, args.end)
+    failures = 0
+    for input_data in args.inputs:
+        try:
+            output_txt, _ = convert_file(
+                input_data,
+                args.out,
+                engine,
+                args.workers,
+                args.resume,
+                window,
+                cache,
+            )
+        except Exception as e:
+            failures += 1
+            print(f'{input_data}: conversion failed: {e}', file=sys.stderr)
+            continue
+        print(f'{input_data} -> {output_txt.parent}')
+    return 1 if failures else 0
+
+
+def _batch(args: argparse.Namespace) -> int:
+    engine = _make_engine(args)
+    logs = find_logs(args.targets)
+    if not logs:
+        print('No logs found.', file=sys.stderr)
+        return 1
+    start = time.perf_counter()
+    results = convert_batch(logs, args.out, engine, args.workers, _make_cache(args))
+    print(format_report(results, time.perf_counter() - start))
+    return 1 if any(not r.ok for r in results) else 0
+
+
+def _triage(args: argparse.Namespace) -> int:
+    engine = _make_engine(args)
+    types = tuple(args.only) if args.only else FAULT_TYPES
+    failures = 0
+    for input_data in args.inputs:
+        try:
+            output_dir, incidents = extract_incidents(
+                engine,
+                input_data,
+                args.out,
+                round(args.before * 60),
+                round(args.after * 60),
+                types,
+            )
+        except Exception as e:
+            failures += 1
+            print(f'{input_data}: triage failed: {e}', file=sys.stderr)
+            continue
+        for n, incident in enumerate(incidents, start=1):
+            when = incident.time if incident.time is not None else 'before any stamp'
+            kinds = ' '.join(fault.type for fault in incident.faults)
+            print(f'{n:3d}  {when}  {kinds}')
+        print(f'{input_data}: {len(incidents)} incident(s) -> {output_dir}')
+    return 1 if failures else 0
+
+
+def _expand(args: argparse.Namespace) -> int:
+    failures = 0
+    for input_sparse in args.inputs:
+        try:
+            output_csv = expand_sparse(input_sparse)
+        except Exception as e:
+            failures += 1
+            print(f'{input_sparse}: expansion failed: {e}', file=sys.stderr)
+            continue
+        print(f'{input_sparse} -> {output_csv}')
+    return 1 if failures else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='heu3log', description='Convert HEU3 data logs without the GUI.'
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help='convert raw log file(s)')
+    convert.add_argument(
+        'inputs',
+        nargs='+',
+        type=Path,
+        help='raw log file(s), .txt, .txt.gz or .txt.zst',
+    )
+    convert.add_argument(
+        '--out',
+        type=Path,
+        help='folder to write <fname>out/ into (default: next to each log)',
+    )
+    convert.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='split each large log across this many processes (default: 1)',
+    )
+    convert.add_argument(
+        '--resume',
+        action='store_true',
+        help='only convert what was added since the last conversion',
+    )
+    convert.add_argument(
+        '--from',
+        dest='start',
+        type=datetime.fromisoformat,
+        help="only convert from this time on, e.g. '2025-10-23 13:00' (uses an index"
+        ' saved next to the log)',
+    )
+    convert.add_argument(
+        '--to',
+        dest='end',
+        type=datetime.fromisoformat,
+        help='only convert up to this time (its minute included)',
+    )
+    _add_engine_args(convert)
+    convert.set_defaults(func=_convert)
+
+    batch = commands.add_parser(
+        'batch', help='convert every log in folder(s) or glob(s) in parallel'
+    )
+    batch.add_argument('targets', nargs='+', help='folder(s) or glob pattern(s)')
+    batch.add_argument(
+        '--out',
+        type=Path,
+        help='folder to write <fname>out/ into (default: next to each log)',
+    )
+    batch.add_argument(
+        '--workers', type=int, help='worker processes (default: one per CPU)'
+    )
+    _add_engine_args(batch)
+    batch.set_defaults(func=_batch)
+
+    triage = commands.add_parser(
+        'triage',
+        help='convert only the minutes around each WDT reboot, restart without'
+        ' shutdown, leak and pump overheat',
+    )
+    triage.add_argument('inputs', nargs='+', type=Path, help='raw log file(s), .txt')
+    triage.add_argument(
+        '--out',
+        type=Path,
+        help='folder to write <fname>incidents/ into (default: next to each log)',
+    )
+    triage.add_argument(
+        '--before',
+        type=float,
+        default=5,
+        help='minutes of log to keep before each fault (default: 5)',
+    )
+    triage.add_argument(
+        '--after',
+        type=float,
+        default=1,
+        help='minutes of log to keep after each fault (default: 1)',
+    )
+    triage.add_argument(
+        '--only',
+        nargs='+',
+        choices=FAULT_TYPES,
+        help='only these faults (default: all)',
+    )
+    _add_engine_args(triage)
+    triage.set_defaults(func=_triage)
+
+    expand = commands.add_parser(
+        'expand', help='expand out.sparse.csv file(s) back into the full out.csv'
+    )
+    expand.add_argument('inputs', nargs='+', type=Path, help='sparse csv file(s)')
+    expand.set_defaults(func=_expand)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -35,8 +35,13 @@ class Controller(QObject):
     def receive_folder_path_sig(self, folder_path: str) -> None:
         self.model.wdir = Path(folder_path)
 
-    @Slot()
-    def receive_commandIt_sig(self) -> None:
+    @Slot(bool, bool, bool)
+    def receive_commandIt_sig(
+        self, pullNew: bool, convertIt: bool, csvIt: bool
+    ) -> None:
+        self.model.pullNew = pullNew
+        self.model.convertIt = convertIt
+        self.model.csvIt = csvIt
         self.model.start_commandIt_worker()
 
     @Slot(bool, bool)
@@ -0,0 +1,134 @@
+import contextlib
+import io
+import os
+import time
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from glob import glob
+from pathlib import Path
+
+from .cache import ConversionCache
+from .compress import COMPRESSIONS, log_stem
+from .engine import ConvertEngine, convert_file
+
+
+@dataclass
+class BatchResult:
+    """
+    Outcome of converting one log in a batch.
+    """
+
+    input_data: Path
+    size: int  # bytes of raw log
+    seconds: float
+    error: str = ''
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+    @property
+    def mb_per_sec(self) -> float:
+        return self.size / 1048576 / self.seconds if self.seconds > 0 else 0.0
+
+
+def find_logs(targets: Iterable[str]) -> list[Path]:
+    """
+    Expand folders and glob patterns into the raw logs to convert.
+
+    A folder yields every .txt, .txt.gz and .txt.zst file directly inside it
+    except converted <fname>out.txt files.  Anything else is treated as a glob pattern (or a
+    plain file path).
+
+    Inputs [targets]:
+        Folders, glob patterns or file paths.
+    Returns [list(Path)]:
+        The raw logs, sorted and without duplicates.
+    """
+    logs: set[Path] = set()
+    for target in targets:
+        path = Path(target)
+        if path.is_dir():
+            for suffix in ('', *COMPRESSIONS.values()):
+                logs.update(
+                    p
+                    for p in path.glob(f'*.txt{suffix}')
+                    if not log_stem(p).endswith('out')
+                )
+        else:
+            logs.update(Path(p) for p in glob(target) if Path(p).is_file())
+    return sorted(logs)
+
+
+def _convert_one(
+    input_data: Path,
+    wdir: Path | None,
+    engine: ConvertEngine,
+    cache: ConversionCache | None,
+) -> BatchResult:
+    # Runs in a worker process.  Keep the engine's console chatter out of the
+    # shared terminal; the batch report says what happened.
+    size = input_data.stat().st_size if input_data.exists() else 0
+    start = time.perf_counter()
+    error = ''
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            convert_file(input_data, wdir, engine, cache=cache)
+    except Exception as e:
+        error = str(e) or type(e).__name__
+    return BatchResult(input_data, size, time.perf_counter() - start, error)
+
+
+def convert_batch(
+    inputs: Iterable[Path],
+    wdir: Path | None = None,
+    engine: ConvertEngine | None = None,
+    workers: int | None = None,
+    cache: ConversionCache | None = None,
+) -> list[BatchResult]:
+    """
+    Convert many raw logs in parallel, one log per worker process, each into
+    the usual <fname>out/ folder.
+
+    Inputs [inputs, wdir, engine, workers, cache]:
+        The raw logs, the working directory (None puts each log's outputs
+        next to the log), the engine with the conversion settings, the
+        number of worker processes (None for one per CPU) and the cache to
+        skip logs converted before (None to convert every log).
+    Returns [list(BatchResult)]:
+        One result per log, in completion order.
+    """
+    if engine is None:
+        engine = ConvertEngine()
+    if workers is None:
+        workers = os.cpu_count() or 1
+    results: list[BatchResult] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_convert_one, p, wdir, engine, cache) for p in inputs]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
+
+
+def format_report(results: list[BatchResult], wall_seconds: float) -> str:
+    """
+    Per-file throughput and failures, followed by a one line summary.
+    """
+    lines: list[str] = []
+    for r in sorted(results, key=lambda r: str(r.input_data)):
+        if r.ok:
+            lines.append(
+                f'OK    {r.input_data}  {r.size / 1048576:8.2f} MB'
+                f'  {r.seconds:7.2f} s  {r.mb_per_sec:6.2f} MB/s'
+            )
+        else:
+            lines.append(f'FAIL  {r.input_data}  {r.error}')
+    failed = sum(not r.ok for r in results)
+    total_mb = sum(r.size for r in results) / 1048576
+    rate = total_mb / wall_seconds if wall_seconds > 0 else 0.0
+    lines.append(
+        f'{len(results) - failed} converted, {failed} failed, '
+        f'{total_mb:.2f} MB in {wall_seconds:.2f} s ({rate:.2f} MB/s)'
+    )
+    return '\n'.join(lines)
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any
+
+from .columns import npz_path
+from .compress import compressed_path
+from .decimate import DECIMATION_LEVELS, decimated_paths
+from .engine import ENGINE_VERSION, ConvertEngine
+from .events import events_path
+from .snapshot import snapshot_path
+from .sparse import sparse_path
+
+# Default limit on the size of a shared cache folder.
+CACHE_BYTES: int = 1024 * 1048576
+
+# What a shared cache entry keeps about itself, inside the entry's folder.
+_ENTRY_FILE = 'entry.json'
+
+
+def manifest_path(output_txt: Path) -> Path:
+    """
+    Where the record of what produced the outputs in <fname>out/ is kept:
+    <fname>out.manifest.json next to <fname>out.txt.
+    """
+    return output_txt.with_name(output_txt.stem + '.manifest.json')
+
+
+def _settings(engine: ConvertEngine) -> dict[str, Any]:
+    # The settings that shape the outputs; printIt only affects the console,
+    # vectorIt only the speed and fleetSN only the fleet database
+    ignored = ('printIt', 'vectorIt', 'fleetSN')
+    return {k: v for k, v in vars(engine).items() if k not in ignored}
+
+
+def _content_hash(input_data: Path) -> str:
+    digest = hashlib.sha256()
+    with open(input_data, 'rb') as f:
+        while block := f.read(1048576):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _roles(
+    output_txt: Path, output_csv: Path, compression: str | None
+) -> dict[str, Path]:
+    # Every file a conversion may leave, by role
+    return {
+        'txt': compressed_path(output_txt, compression),
+        'csv': compressed_path(output_csv, compression),
+        'npz': npz_path(output_csv),
+        'sparse': sparse_path(output_csv),
+        **{
+            f'decimated{level}': path
+            for level, path in decimated_paths(output_csv).items()
+        },
+        'events': events_path(output_csv),
+        'state': snapshot_path(output_txt),
+    }
+
+
+def _outputs(
+    engine: ConvertEngine, output_txt: Path, output_csv: Path
+) -> dict[str, Path]:
+    # The files a conversion with these settings left.  The snapshot is only
+    # there after a conversion that reached the end of the log.
+    roles = _roles(output_txt, output_csv, engine.compression)
+    wanted = {
+        'txt': True,
+        'csv': engine.csvIt,
+        'npz': engine.npzIt,
+        'sparse': engine.sparseIt,
+        **{f'decimated{level}': engine.decimateIt for level in DECIMATION_LEVELS},
+        'events': engine.eventsIt,
+        'state': True,
+    }
+    return {
+        role: path for role, path in roles.items() if wanted[role] and path.exists()
+    }
+
+
+def _stamp(path: Path) -> list[int] | None:
+    # Size and modification time: an output rewritten since has changed.
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _read_json(path: Path) -> dict[str, Any] | None:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+class ConversionCache:
+    """
+    Skips converting a raw log again when it already was, with the same
+    settings.
+
+    A conversion is identified by a key: the sha256 of the raw log's content
+    with the settings that shape the outputs and ENGINE_VERSION.  After each
+    conversion a manifest with the key and the outputs' sizes and times is
+    written next to the outputs (manifest_path()); while they are untouched,
+    converting the same log with the same settings into them again is a hit.
+    The log is only hashed again if its size or time changed.
+
+    With a shared cache folder the outputs are also kept there under their
+    key, so converting the same log into another folder (a copy, another
+    operator) is a copy.  The least recently used entries are evicted to
+    keep the folder under max_bytes.
+
+    A conversion into a fleet database is never skipped: the rows it
+    inserts are not outputs that can be checked or copied, and the database
+    may be new or shared.
+
+    Inputs [root, max_bytes]:
+        The shared cache folder (None for the manifests only) and the most
+        bytes it may hold.
+    """
+
+    def __init__(self, root: Path | None = None, max_bytes: int = CACHE_BYTES) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        # Content hashes by log path, size and time, to hash each log once
+        self._contents: dict[tuple[str, int, int], str] = {}
+
+    def _content(self, input_data: Path, output_txt: Path) -> tuple[list[Any], str]:
+        # The log's path, size and time, and its content hash: from the
+        # manifest if the log is unchanged since, else worked out
+        st = input_data.stat()
+        where = (str(input_data.resolve()), st.st_size, st.st_mtime_ns)
+        manifest = _read_json(manifest_path(output_txt)) or {}
+        if manifest.get('input') == list(where) and 'content' in manifest:
+            return list(where), manifest['content']
+        if where not in self._contents:
+            self._contents[where] = _content_hash(input_data)
+        return list(where), self._contents[where]
+
+    def key(self, engine: ConvertEngine, input_data: Path, output_txt: Path) -> str:
+        """
+        The cache key of converting input_data with the engine's settings.
+        """
+        _, content = self._content(input_data, output_txt)
+        settings = json.dumps(_settings(engine), sort_keys=True)
+        return hashlib.sha256(
+            f'{content} {settings} {ENGINE_VERSION}'.encode()
+        ).hexdigest()
+
+    def fetch(
+        self,
+        engine: ConvertEngine,
+        input_data: Path,
+        output_txt: Path,
+        output_csv: Path,
+    ) -> bool:
+        """
+        Put the outputs of an earlier conversion of the same log with the
+        same settings in place, if there are any.
+
+        Inputs [engine, input_data, output_txt, output_csv]:
+            As for engine.convert().
+        Returns [bool]:
+            True on a hit: the outputs are in place and need no conversion.
+            On a miss the manifest is removed, as the outputs are about to
+            be rewritten.
+        """
+        path = manifest_path(output_txt)
+        if engine.fleetDb is not None:
+            path.unlink(missing_ok=True)
+            return False
+        key = self.key(engine, input_data, output_txt)
+        manifest = _read_json(path)
+        if manifest is not None and manifest.get('key') == key:
+            files = manifest.get('files', {})
+            if files and all(_stamp(Path(p)) == s for p, s in files.values()):
+                return True
+        path.unlink(missing_ok=True)
+        if self.root is None:
+            return False
+        entry = self.root / key
+        info = _read_json(entry / _ENTRY_FILE)
+        if info is None:
+            return False
+        roles = _roles(output_txt, output_csv, engine.compression)
+        snapshot_path(output_txt).unlink(missing_ok=True)  # not of these outputs
+        for role, name in info['files'].items():
+            shutil.copyfile(entry / name, roles[role])
+        info['used'] = time.time()
+        (entry / _ENTRY_FILE).write_text(json.dumps(info))
+        self._write_manifest(key, engine, input_data, output_txt, output_csv)
+        return True
+
+    def store(
+        self,
+        engine: ConvertEngine,
+        input_data: Path,
+        output_txt: Path,
+        output_csv: Path,
+    ) -> None:
+        """
+        Note a finished conversion: write its manifest and keep a copy of
+        the outputs in the shared cache folder, if there is one.
+
+        Inputs [engine, input_data, output_txt, output_csv]:
+            As for engine.convert().
+        """
+        if engine.fleetDb is not None:
+            return  # fetch() won't use it
+        key = self.key(engine, input_data, output_txt)
+        outputs = self._write_manifest(key, engine, input_data, output_txt, output_csv)
+        if self.root is None:
+            return
+        entry = self.root / key
+        if (entry / _ENTRY_FILE).exists():
+            return
+        size = sum(p.stat().st_size for p in outputs.values())
+        if size > self.max_bytes:
+            return  # would only evict everything else, then itself
+        # Fill a private folder and rename it into place, as other processes
+        # may be using the same cache
+        self.root.mkdir(parents=True, exist_ok=True)
+        partial = self.root / f'{key}.{os.getpid()}.partial'
+        partial.mkdir(exist_ok=True)
+        files = {role: path.name for role, path in outputs.items()}
+        for role, path in outputs.items():
+            shutil.copyfile(path, partial / files[role])
+        info = {'files': files, 'bytes': size, 'used': time.time()}
+        (partial / _ENTRY_FILE).write_text(json.dumps(info))
+        try:
+            os.replace(partial, entry)
+        except OSError:  # another process stored it first
+            shutil.rmtree(partial, ignore_errors=True)
+        self.evict()
+
+    def _write_manifest(
+        self,
+        key: str,
+        engine: ConvertEngine,
+        input_data: Path,
+        output_txt: Path,
+        output_csv: Path,
+    ) -> dict[str, Path]:
+        outputs = _outputs(engine, output_txt, output_csv)
+        where, content = self._content(input_data, output_txt)
+        manifest = {
+            'key': key,
+            'engineVersion': ENGINE_VERSION,
+            'settings': _settings(engine),
+            'input': where,
+            'content': content,
+            'files': {role: [str(p), _stamp(p)] for role, p in outputs.items()},
+        }
+        manifest_path(output_txt).write_text(json.dumps(manifest, indent=1))
+        return outputs
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries of the shared cache folder
+        until it holds no more than max_bytes.
+        """
+        if self.root is None or not self.root.exists():
+            return
+        entries: list[tuple[float, int, Path]] = []
+        for info_path in self.root.glob(f'*/{_ENTRY_FILE}'):
+            info = _read_json(info_path)
+            if info is not None and info_path.parent.suffix != '.partial':
+                entries.append((info['used'], info['bytes'], info_path.parent))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,98 @@
+import array
+import math
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from .engine import CSV_HEADER
+
+# The csv columns after Time, with the narrowest array type that holds each:
+# b int8 for flags and small states, h int16, i int32, q int64 for the
+# running totals, f float32 for measurements (the CPU temperature included).
+COLUMN_TYPES: dict[str, str] = dict(
+    zip(
+        CSV_HEADER.strip().split(',')[1:],
+        'bbbbbbffffffbbbbbbfhiqqqffffhhhbb',
+    )
+)
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return math.nan  # a garbled field in the log
+
+
+def npz_path(output_csv: Path) -> Path:
+    """
+    The columnar file written next to out.csv: <fname>out.npz.
+    """
+    return output_csv.with_suffix('.npz')
+
+
+class ColumnWriter:
+    """
+    The csv rows of a conversion kept as typed columns and saved as a NumPy
+    .npz file, so a dump can be loaded column by column without parsing
+    the csv text.
+
+    Time is the row's time stamp in seconds since 1970-01-01 (with the
+    configured time zone and date line offsets applied, as in out.csv) in
+    float64; the other columns are named as in the csv header and typed as
+    in COLUMN_TYPES.  Values are held in compact arrays until save().
+    Needs NumPy, which the rest of the converter does not.
+
+    Inputs [output_npz]:
+        Path to the .npz file to write.
+    """
+
+    def __init__(self, output_npz: Path) -> None:
+        try:
+            import numpy
+        except ImportError as e:
+            raise ImportError('The columnar (.npz) export needs numpy') from e
+        self._np = numpy
+        self.output_npz = output_npz
+        self.time = array.array('d')
+        self.columns = {name: array.array(t) for name, t in COLUMN_TYPES.items()}
+        self._appends = [col.append for col in self.columns.values()]
+        self._converts: list[Callable[[Any], Any]] = [
+            _to_float if t in 'fd' else int for t in COLUMN_TYPES.values()
+        ]
+        self._last: tuple[Any, ...] = ()
+
+    def append(self, epoch: float, values: tuple[Any, ...]) -> None:
+        """
+        Add a row.
+
+        Inputs [epoch, values]:
+            The row's time in seconds since 1970-01-01 and the values of the
+            csv columns after Time.
+        """
+        self.time.append(epoch)
+        for add, convert, value in zip(self._appends, self._converts, values):
+            add(convert(value))
+        self._last = values
+
+    def repeat(self, epoch: float) -> None:
+        """
+        Add a row with the previous row's values at a new time, like the
+        csv's leading-edge rows.
+        """
+        if self._last:
+            self.append(epoch, self._last)
+
+    def save(self) -> None:
+        """
+        Write the .npz file, compressed: most columns hardly ever change.
+        """
+        np = self._np
+        np.savez_compressed(
+            self.output_npz,
+            Time=np.frombuffer(self.time, dtype='d'),
+            **{
+                name: np.frombuffer(col, dtype=col.typecode)
+                for name, col in self.columns.items()
+            },
+        )
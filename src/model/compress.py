@@ -0,0 +1,179 @@
+import gzip
+import io
+import queue
+import threading
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Self, TextIO, cast
+
+from .mapped import MappedLog
+
+# File suffix of each compression: <fname>out.txt.gz, sn1060log18.txt.zst ...
+COMPRESSIONS: dict[str, str] = {'gz': '.gz', 'zst': '.zst'}
+
+# Writes gathered before they are handed to the writer thread, and batches
+# waiting for it before write() does: a few MB of text at most.
+WRITER_BATCH_SIZE: int = 8192
+WRITER_QUEUE_SIZE: int = 4
+
+# gzip level: close to the best size at a fraction of the time of level 9.
+GZIP_LEVEL: int = 6
+
+
+def compressed_path(path: Path, compression: str | None) -> Path:
+    """
+    The file an output is written to: path itself, or path with the
+    compression's suffix added (out.txt -> out.txt.gz).
+    """
+    if compression is None:
+        return path
+    return path.with_name(path.name + COMPRESSIONS[compression])
+
+
+def compression_of(path: Path) -> str | None:
+    """
+    The compression of a file, going by its suffix (None for a plain file).
+    """
+    for compression, suffix in COMPRESSIONS.items():
+        if path.name.endswith(suffix):
+            return compression
+    return None
+
+
+def log_stem(input_data: Path) -> str:
+    """
+    The name of a raw log without its suffixes: sn1060log18 for
+    sn1060log18.txt and sn1060log18.txt.gz alike.
+    """
+    name = input_data.name
+    compression = compression_of(input_data)
+    if compression is not None:
+        name = name.removesuffix(COMPRESSIONS[compression])
+    return Path(name).stem
+
+
+def open_compressed(path: Path, compression: str, mode: str) -> IO[bytes]:
+    """
+    Open a compressed file as a binary stream of its uncompressed bytes.
+
+    Inputs [path, compression, mode]:
+        Path to the file, 'gz' or 'zst' and 'rb', 'wb' or 'ab'.  Appending
+        adds a new gzip member or zstd frame, read back as one stream.
+    Returns [IO(bytes)]:
+        The stream, closing the file when closed.
+    """
+    if compression == 'gz':
+        return gzip.open(path, mode, compresslevel=GZIP_LEVEL)
+    if compression != 'zst':
+        raise ValueError(f'Unknown compression {compression!r}')
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError('zstd compression needs the zstandard package') from e
+    f = open(path, mode)
+    try:
+        if mode == 'rb':
+            return zstandard.ZstdDecompressor().stream_reader(
+                f, read_across_frames=True, closefd=True
+            )
+        return zstandard.ZstdCompressor().stream_writer(f, closefd=True)
+    except Exception:
+        f.close()
+        raise
+
+
+def open_log(input_data: Path) -> MappedLog | TextIO:
+    """
+    Open a raw log for the engine: memory-mapped if it is plain text, read
+    through a decompressor if it is a .gz or .zst file.  Either way the
+    lines read are those of open(input_data, 'r') on the plain log.
+    """
+    compression = compression_of(input_data)
+    if compression is None:
+        return MappedLog(input_data)
+    return io.TextIOWrapper(open_compressed(input_data, compression, 'rb'))
+
+
+class CompressedWriter:
+    """
+    A text file written compressed, with the compression done on a writer
+    thread so the parser never waits for it.
+
+    write() only gathers the text; every WRITER_BATCH_SIZE writes the batch
+    is queued for the writer thread, which encodes and compresses it while
+    the parser carries on.  Once WRITER_QUEUE_SIZE batches are waiting,
+    write() waits for the thread.  The text is encoded and its line ends
+    written just as by open(path, 'w').  An error in the writer thread is
+    raised by the next write() or by close().
+
+    Inputs [path, compression, append]:
+        Path to the compressed file, 'gz' or 'zst' and whether to add to
+        an existing file instead of starting it over.
+    """
+
+    def __init__(self, path: Path, compression: str, append: bool = False) -> None:
+        self._file = io.TextIOWrapper(
+            open_compressed(path, compression, 'ab' if append else 'wb')
+        )
+        self._batch: list[str] = []
+        self._queue: queue.Queue[list[str] | None] = queue.Queue(WRITER_QUEUE_SIZE)
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(
+            target=self._write_batches, name=f'write {path.name}', daemon=True
+        )
+        self._thread.start()
+
+    def _write_batches(self) -> None:
+        # Runs on the writer thread until close()
+        while (batch := self._queue.get()) is not None:
+            if self._error is None:
+                try:
+                    self._file.write(''.join(batch))
+                except BaseException as e:
+                    self._error = e  # keep taking batches so write() never hangs
+
+    def write(self, text: str) -> int:
+        self._batch.append(text)
+        if len(self._batch) >= WRITER_BATCH_SIZE:
+            if self._error is not None:
+                raise self._error
+            self._queue.put(self._batch)
+            self._batch = []
+        return len(text)
+
+    def close(self) -> None:
+        """
+        Write out what is left, wait for the writer thread and close the file.
+        """
+        if self._thread.is_alive():
+            self._queue.put(self._batch)
+            self._queue.put(None)
+            self._thread.join()
+            self._batch = []
+        try:
+            self._file.close()
+        finally:
+            if self._error is not None:
+                raise self._error
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def open_output(path: Path) -> TextIO:
+    """
+    Open a text file for writing like open(path, 'w'), compressed through a
+    CompressedWriter if it is a .gz or .zst file.
+    """
+    compression = compression_of(path)
+    if compression is None:
+        return open(path, 'w')
+    return cast(TextIO, CompressedWriter(path, compression))  # write() and close()
@@ -38,7 +38,8 @@ commandIt = True   # True = pull the log anew over USB from the HEU.
 
 megs = 1
 
-if commandIt:
+# Only run as a script: importing it just defines convertLog() and its settings.
+if __name__ == '__main__' and commandIt:
 #    port = 'COM3' #1110
 #    port = 'COM8' #1059
 #    port = 'COM6' #1058
@@ -76,11 +77,12 @@ if commandIt:
     logOut.close()
 
 
-logIn  = open(fname+'.txt', 'r')
-#+bail gracefully if that file didn't open...
-logOut = open(wdir+fname+'out.txt', 'w')  #not appending, wipe previous.
-if csvIt:
-    csvOut = open(wdir+fname+'.csv', 'w')
+if __name__ == '__main__':
+    logIn  = open(fname+'.txt', 'r')
+    #+bail gracefully if that file didn't open...
+    logOut = open(wdir+fname+'out.txt', 'w')  #not appending, wipe previous.
+    if csvIt:
+        csvOut = open(wdir+fname+'.csv', 'w')
 
 mute = 0
 
@@ -650,5 +652,6 @@ def convertLog():
     logOut.close()
     if csvIt: csvOut.close()
 
-convertLog()
+if __name__ == '__main__':
+    convertLog()
 
@@ -0,0 +1,196 @@
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .engine import ParserState
+
+# Stands for "not formatted yet": never the same object as a field's value.
+_UNSET: Any = object()
+
+
+class CsvRowFormatter:
+    """
+    Formats the values of out.csv rows (everything after the Time column),
+    keeping the text of every field from the previous row and formatting
+    again only the fields that changed since.
+
+    Between two rows usually only the flow, the temperatures and the
+    dissipated power change.  The float fields are formatted again only
+    when their decoder stored a new value (a different object); the other
+    fields are kept in groups of columns that hardly ever change, formatted
+    again when a value in the group differs.  The text is exactly that of
+    formatting the whole row each time.
+
+    With track, row() also lists in changes the columns whose text differs
+    from the previous row's, for the sparse csv.
+
+    Inputs [track]:
+        Whether to list the changed columns.
+    """
+
+    __slots__ = (
+        'changes',
+        'counts',
+        'countsText',
+        'fFlow',
+        'fInTemp',
+        'fMinFlow',
+        'fOutTemp',
+        'fThrot',
+        'fields',
+        'flags',
+        'flagsText',
+        'flowText',
+        'iCpuTemp',
+        'inTempText',
+        'outTempText',
+        'pumps',
+        'pumpsText',
+        'tail',
+        'throtText',
+    )
+
+    def __init__(self, track: bool = False) -> None:
+        self.pumps: tuple[Any, ...] = ()
+        self.pumpsText = ''
+        self.fThrot: float = _UNSET
+        self.throtText = ''
+        self.fInTemp: float = _UNSET
+        self.inTempText = ''
+        self.fOutTemp: float = _UNSET
+        self.outTempText = ''
+        self.fFlow: float = _UNSET
+        self.flowText = ''
+        self.flags: tuple[Any, ...] = ()
+        self.fMinFlow: float = _UNSET
+        self.flagsText = ''
+        self.counts: tuple[Any, ...] = ()
+        self.iCpuTemp: float = _UNSET
+        self.countsText = ''
+        # Columns (by index after Time) changed by the last row and their text
+        self.changes: list[tuple[int, str]] | None = [] if track else None
+        self.fields = [''] * 33  # text of every column, kept when tracking
+        self.tail: tuple[int, ...] = ()
+
+    def _track(self, first: int, texts: list[str]) -> None:
+        # Note the columns from first on whose text changed
+        for i, text in enumerate(texts, first):
+            if text != self.fields[i]:
+                self.fields[i] = text
+                self.changes.append((i, text))
+
+    def row(self, st: 'ParserState') -> str:
+        """
+        The csv values of the parser state as it is now, '\\n' included.
+        """
+        changes = self.changes
+        if changes is not None:
+            changes.clear()
+        # Pump states.  maxIp1/2 are never negative, so equal means same text.
+        pumps = (
+            st.Pon,
+            st.PumpsHot,
+            st.ePumpSelection,
+            st.PumpsShutdown,
+            st.P1CurrentHigh,
+            st.P2CurrentHigh,
+            st.maxIp1,
+            st.maxIp2,
+        )
+        if pumps != self.pumps:
+            self.pumps = pumps
+            self.pumpsText = '{},{},{},{},{},{},{},{}'.format(*pumps)
+            if changes is not None:
+                self._track(0, self.pumpsText.split(','))
+        # The measurements, by identity: 0.0 == -0.0 but they print apart
+        value = st.fThrot
+        if value is not self.fThrot:
+            self.fThrot = value
+            text = f'{value:05.3f}'
+            if changes is not None and text != self.throtText:
+                changes.append((8, text))
+            self.throtText = text
+        value = st.fInTemp
+        if value is not self.fInTemp:
+            self.fInTemp = value
+            text = f'{value:5.2f}'
+            if changes is not None and text != self.inTempText:
+                changes.append((9, text))
+            self.inTempText = text
+        value = st.fOutTemp
+        if value is not self.fOutTemp:
+            self.fOutTemp = value
+            text = f'{value:5.2f}'
+            if changes is not None and text != self.outTempText:
+                changes.append((10, text))
+            self.outTempText = text
+        value = st.fFlow
+        if value is not self.fFlow:
+            self.fFlow = value
+            text = f'{value:5.2f}'
+            if changes is not None and text != self.flowText:
+                changes.append((11, text))
+            self.flowText = text
+        # Flags and limits
+        flags = (
+            st.bIntOn,
+            st.bRestart,
+            st.bCold,
+            st.bPowerdown,
+            st.bLogClosed,
+            st.bLeak,
+            st.iMaxTemp,
+        )
+        if flags != self.flags or st.fMinFlow is not self.fMinFlow:
+            self.flags = flags
+            self.fMinFlow = st.fMinFlow
+            self.flagsText = (
+                f'{int(st.bIntOn)},{int(st.bRestart)},{int(st.bCold)},'
+                f'{int(st.bPowerdown)},{int(st.bLogClosed)},{int(st.bLeak)},'
+                f'{st.fMinFlow:4.2f},{st.iMaxTemp}'
+            )
+            if changes is not None:
+                self._track(12, self.flagsText.split(','))
+        # Interface counts and supplies.  iCpuTemp starts as int 0, which
+        # equals its first float 0.0, so it goes by identity too.
+        counts = (st.iCmds, st.iQrys, st.iTouches, st.ps24V, st.ps5V, st.ps3p3V)
+        if counts != self.counts or st.iCpuTemp is not self.iCpuTemp:
+            self.counts = counts
+            self.iCpuTemp = st.iCpuTemp
+            self.countsText = '{},{},{},{},{},{},'.format(*counts) + f'{st.iCpuTemp}'
+            if changes is not None:  # the supplies are log text, maybe with a ','
+                self._track(21, [f'{value}' for value in (*counts, st.iCpuTemp)])
+        if changes is not None:
+            tail = (
+                st.iDissWatts,
+                st.iGlitch0,
+                st.iGlitch1,
+                st.iGlitch2,
+                st.bWDTreboot,
+                int(st.bMysteryRestart),
+            )
+            if tail != self.tail:  # all ints: equal means same text
+                self.tail = tail
+                self._track(20, [f'{tail[0]}'])
+                self._track(28, [f'{value}' for value in tail[1:]])
+        return (
+            f'{self.pumpsText},{self.throtText},{self.inTempText},'
+            f'{self.outTempText},{self.flowText},{self.flagsText},'
+            f'{st.iDissWatts},{self.countsText},'
+            f'{st.iGlitch0},{st.iGlitch1},{st.iGlitch2},'
+            f'{st.bWDTreboot},{int(st.bMysteryRestart)}\n'
+        )
+
+    def frame(self, st: 'ParserState') -> tuple[str, str, str, str]:
+        """
+        The text of row(st) around the fields the FL, TM, TH and DB tags
+        change: the row is frame[0] + 'fThrot,fInTemp,fOutTemp,fFlow' +
+        frame[1] + 'iDissWatts' + frame[2] + 'iGlitch0,iGlitch1,iGlitch2' +
+        frame[3].  The measurement texts are left in throtText ... flowText.
+        """
+        self.row(st)
+        return (
+            self.pumpsText + ',',
+            ',' + self.flagsText + ',',
+            ',' + self.countsText + ',',
+            f',{st.bWDTreboot},{int(st.bMysteryRestart)}\n',
+        )
@@ -0,0 +1,225 @@
+import math
+import operator
+import time
+from pathlib import Path
+from typing import Any, TextIO
+
+from .engine import CSV_HEADER
+from .sinks import OUTPUT_BUFFER_SIZE
+
+# Bucket widths in seconds, by the suffix of their file: <fname>out.1s.csv ...
+DECIMATION_LEVELS: dict[str, int] = {'1s': 1, '10s': 10, '1min': 60}
+
+_COLUMNS = CSV_HEADER.strip().split(',')[1:]
+
+# Measurements, which get the last value and the minimum and maximum of
+# every bucket.  The supplies are logged as text and read as floats.
+ANALOG_COLUMNS: tuple[str, ...] = (
+    'fThrot',
+    'fInTemp',
+    'fOutTemp',
+    'fFlow',
+    'iDissWatts',
+    'ps24V',
+    'ps5V',
+    'ps3p3V',
+    'iCpuTemp',
+)
+
+# Flags and events, OR-ed over every bucket so none is hidden.  The other
+# columns (settings, running totals) get the bucket's last value.
+FLAG_COLUMNS: tuple[str, ...] = (
+    'Pon',
+    'PumpsHot',
+    'PumpsShutdown',
+    'P1CurrentHigh',
+    'P2CurrentHigh',
+    'bIntOn',
+    'bRestart',
+    'bCold',
+    'bPowerdown',
+    'bLogClosed',
+    'bLeak',
+    'bWDTreboot',
+    'bMysteryRestart',
+)
+
+_get_measured = operator.itemgetter(
+    *(_COLUMNS.index(name) for name in ANALOG_COLUMNS[:5])  # fThrot..iDissWatts
+)
+_SUPPLIES = slice(_COLUMNS.index('ps24V'), _COLUMNS.index('ps3p3V') + 1)
+_CPU_TEMP = _COLUMNS.index('iCpuTemp')
+_get_flags = operator.itemgetter(*(_COLUMNS.index(name) for name in FLAG_COLUMNS))
+
+
+def _row_layout() -> tuple[str, operator.itemgetter]:
+    # The header, and where each of its columns after Time is found in the
+    # values of a bucket laid end to end: its last row, last measurements,
+    # their minima and maxima and its OR-ed flags (see _Level.flush()).
+    a, lo, hi, f = (len(_COLUMNS) + k * len(ANALOG_COLUMNS) for k in range(4))
+    header = ['Time']
+    fields = []
+    for i, name in enumerate(_COLUMNS):
+        if name in ANALOG_COLUMNS:
+            k = ANALOG_COLUMNS.index(name)
+            header += [name, f'{name}_min', f'{name}_max']
+            fields += [a + k, lo + k, hi + k]
+        elif name in FLAG_COLUMNS:
+            header.append(name)
+            fields.append(f + FLAG_COLUMNS.index(name))
+        else:
+            header.append(name)
+            fields.append(i)
+    return ','.join(header) + '\n', operator.itemgetter(*fields)
+
+
+DECIMATED_HEADER, _pick_row = _row_layout()
+
+
+def _volts(supply: str) -> float:
+    try:
+        return float(supply)
+    except ValueError:
+        return math.nan  # a garbled field in the log
+
+
+def decimated_paths(output_csv: Path) -> dict[str, Path]:
+    """
+    The decimated csvs written next to out.csv, by level:
+    <fname>out.1s.csv, <fname>out.10s.csv and <fname>out.1min.csv.
+    """
+    return {
+        level: output_csv.with_suffix(f'.{level}.csv') for level in DECIMATION_LEVELS
+    }
+
+
+class _Level:
+    # One decimation level: the rows (or finer buckets) of the bucket being
+    # filled, summed up, written out and passed on to the next (coarser)
+    # level when a row falls in another bucket.
+
+    def __init__(self, width: int, out: TextIO, coarser: '_Level | None') -> None:
+        self.width = width
+        self.out = out
+        self.coarser = coarser
+        self.bucket: int | None = None
+        self.lows: list[tuple[Any, ...]] = []
+        self.highs: list[tuple[Any, ...]] = []
+        self.flags: list[tuple[Any, ...]] = []
+        self.measured: tuple[Any, ...] = ()
+        self.values: tuple[Any, ...] = ()
+
+    def add(
+        self,
+        epoch: float,
+        low: tuple[Any, ...],
+        high: tuple[Any, ...],
+        measured: tuple[Any, ...],
+        flags: tuple[Any, ...],
+        values: tuple[Any, ...],
+    ) -> None:
+        bucket = int(epoch // self.width)
+        if bucket != self.bucket:
+            self.flush()
+            self.bucket = bucket
+        self.lows.append(low)
+        self.highs.append(high)
+        self.flags.append(flags)
+        self.measured = measured
+        self.values = values
+
+    def flush(self) -> None:
+        if self.bucket is None:
+            return
+        if len(self.lows) == 1:
+            low, high, flags = self.lows[0], self.highs[0], self.flags[0]
+        else:  # column by column over the bucket
+            low = tuple(map(min, *self.lows))
+            high = tuple(map(max, *self.highs))
+            flags = tuple(map(max, *self.flags))
+        self.lows, self.highs, self.flags = [], [], []
+        start = self.bucket * self.width
+        row = _pick_row((*self.values, *self.measured, *low, *high, *map(int, flags)))
+        self.out.write(
+            time.strftime('%m/%d/%y %H:%M:%S.00,', time.gmtime(start))
+            + ','.join(map(str, row))
+            + '\n'
+        )
+        if self.coarser is not None:
+            self.coarser.add(start, low, high, self.measured, flags, self.values)
+        self.bucket = None
+
+
+class Decimator:
+    """
+    The csv rows of a conversion summed up in fixed time buckets (1 s, 10 s
+    and 1 min, DECIMATION_LEVELS), so a viewer can draw a whole day from a
+    few thousand rows and only load the full csv to zoom in.
+
+    Every bucket with rows in it gets a row stamped with the bucket's start:
+    the last value and the minimum and maximum of each of ANALOG_COLUMNS
+    (<name>, <name>_min, <name>_max), FLAG_COLUMNS OR-ed over the bucket
+    and the last value of the other columns.  A bucket without rows means
+    nothing changed: the previous bucket's last values hold.  Times are the
+    csv's, as logged; a clock set back starts new buckets.
+
+    Only the 1 s buckets are filled from the rows, each coarser level from
+    the buckets of the level below, in the same pass as the conversion.
+
+    Inputs [output_csv, buffer_size]:
+        Path to out.csv, next to which the decimated csvs are written
+        (decimated_paths()), and the write buffer size of each.
+    """
+
+    def __init__(self, output_csv: Path, buffer_size: int = OUTPUT_BUFFER_SIZE) -> None:
+        self._files: list[TextIO] = []
+        self._levels: list[_Level] = []  # finest first
+        try:
+            for level, path in reversed(decimated_paths(output_csv).items()):
+                out = open(path, 'w', buffering=buffer_size)
+                self._files.append(out)
+                out.write(DECIMATED_HEADER)
+                coarser = self._levels[0] if self._levels else None
+                self._levels.insert(0, _Level(DECIMATION_LEVELS[level], out, coarser))
+        except Exception:
+            self.close()
+            raise
+        self._finest = self._levels[0]
+        self._supplies: tuple[str, ...] = ()
+        self._volts: tuple[float, ...] = ()
+        self._last: tuple[Any, ...] = ()
+
+    def append(self, epoch: float, values: tuple[Any, ...]) -> None:
+        """
+        Add a row.
+
+        Inputs [epoch, values]:
+            The row's time in seconds since 1970-01-01 and the values of the
+            csv columns after Time.
+        """
+        supplies = values[_SUPPLIES]
+        if supplies != self._supplies:  # they hardly ever change
+            self._supplies = supplies
+            self._volts = tuple(map(_volts, supplies))
+        a = (*_get_measured(values), *self._volts, values[_CPU_TEMP])
+        self._finest.add(epoch, a, a, a, _get_flags(values), values)
+        self._last = values
+
+    def repeat(self, epoch: float) -> None:
+        """
+        Add a row with the previous row's values at a new time, like the
+        csv's leading-edge rows.
+        """
+        if self._last:
+            self.append(epoch, self._last)
+
+    def close(self) -> None:
+        """
+        Write out the buckets still being filled and close the files.
+        """
+        try:
+            for level in self._levels:  # finest first, each feeds the next
+                level.flush()
+        finally:
+            for out in self._files:
+                out.close()
@@ -0,0 +1,145 @@
+from collections.abc import Callable
+from typing import TextIO
+
+from serial import Serial
+
+# Most bytes taken off the port per read.  A read returns whatever has
+# arrived so far, so a dump is written out as it comes in.
+RECEIVE_BLOCK_SIZE: int = 64 * 1024
+
+
+class LogReceiver:
+    """
+    The preamble/guts/postamble state machine of a `frlog` dump, fed with
+    raw bytes as they come off the serial port.
+
+    The HEU replies with a printable preamble (command echo, serial number,
+    file size), a '<' line, the log itself (the guts), a '>' line and a
+    postamble.  Guts lines are written to logOut as soon as they are
+    complete; nothing else is kept in memory but the unfinished last line.
+
+    Inputs [logOut, printIt, on_guts]:
+        The raw log file to write the guts to, whether to print them and,
+        optionally, a callable handed each batch of new guts lines.
+    """
+
+    def __init__(
+        self,
+        logOut: TextIO,
+        printIt: bool = False,
+        on_guts: Callable[[list[str]], None] | None = None,
+    ) -> None:
+        self.logOut = logOut
+        self.printIt = printIt
+        self.on_guts = on_guts
+        self._guts: list[str] = []  # guts lines of the current feed
+        self.ambleState: int = 0  # 0==printable preamble: command echo, file size.
+        self.SN: str = ''  # serial number from the preamble, if it had one
+        self._partial: bytes = b''  # start of a line still coming in
+
+    @property
+    def midLine(self) -> bool:
+        """
+        True while part of a line has been received but not its end.
+        """
+        return bool(self._partial)
+
+    @property
+    def done(self) -> bool:
+        """
+        True once the '>' postamble line has been received.
+        """
+        return self.ambleState >= 3
+
+    def feed(self, data: bytes) -> bool:
+        """
+        Process the next bytes off the port.
+
+        Inputs [data]:
+            Bytes as received, not necessarily whole lines.
+        Returns [bool]:
+            True once the postamble has started; the rest is not needed.
+        """
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self._line(line.decode('utf-8') + '\n')
+            if self.done:
+                break
+        self._hand_over()
+        return self.done
+
+    def finish(self) -> None:
+        """
+        Process the last line if the port went quiet in the middle of it.
+        """
+        if self._partial and not self.done:
+            self._line(self._partial.decode('utf-8'))
+        self._partial = b''
+        self._hand_over()
+
+    def _hand_over(self) -> None:
+        if self.on_guts is not None and self._guts:
+            self.on_guts(self._guts)
+        self._guts = []
+
+    def _line(self, readstr: str) -> None:
+        if self.ambleState < 2 and readstr[0:6] == 'Serial':
+            self.SN = readstr[14:18]
+        if readstr == '<\n':
+            self.ambleState = 1  # guts, first line
+        if readstr == '>\n':
+            self.ambleState = 3  # postamble, first line
+        if self.ambleState == 2:  # guts, the rest
+            self.logOut.write(readstr)
+            if self.on_guts is not None:
+                self._guts.append(readstr)
+            if self.printIt:
+                print(readstr)
+        if self.ambleState == 1:
+            self.ambleState += 1
+
+
+def receive_log(
+    ser: Serial,
+    logOut: TextIO,
+    megs: int,
+    printIt: bool = False,
+    on_guts: Callable[[list[str]], None] | None = None,
+) -> LogReceiver:
+    """
+    Stream a `frlog` reply off the port into logOut.
+
+    Reads whatever has arrived, up to RECEIVE_BLOCK_SIZE bytes at a time, and
+    returns as soon as the '>' postamble line is seen.  It also stops at the
+    end of the line that passes `megs` MB or when the port stays quiet for
+    its read timeout.
+
+    Inputs [ser, logOut, megs, printIt, on_guts]:
+        The open serial port (the command already sent), the raw log file,
+        the MB requested, whether to print the guts and an optional callable
+        handed each batch of guts lines as it arrives.
+    Returns [LogReceiver]:
+        The receiver, with the serial number from the preamble in .SN.
+    """
+    return receive_into(ser, LogReceiver(logOut, printIt, on_guts), megs)
+
+
+def receive_into(ser: Serial, receiver: LogReceiver, megs: int) -> LogReceiver:
+    """
+    Same as receive_log(), feeding a receiver made beforehand, so the caller
+    can look at it (its .SN) while the guts come in.
+    """
+    limit = 1048576 * megs
+    received = 0
+    while received < limit or receiver.midLine:  # whole lines, like readlines()
+        # Blocks for the first byte (up to the port timeout), then takes
+        # everything already waiting.
+        data = ser.read(min(RECEIVE_BLOCK_SIZE, max(1, ser.in_waiting)))
+        if not data:
+            break  # timed out, the HEU has stopped sending
+        received += len(data)
+        if receiver.feed(data):
+            return receiver
+    receiver.finish()
+    return receiver
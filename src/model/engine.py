@@ -0,0 +1,1083 @@
+import copy
+import math
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TextIO
+
+from .compress import compressed_path, log_stem, open_log
+from .csvrow import CsvRowFormatter
+from .sinks import OutputSinks
+from .stamps import (
+    TICKS_PER_DAY,
+    TICKS_PER_HOUR,
+    TICKS_PER_SEC,
+    day_ticks,
+    minute_ticks,
+    render_minute,
+    time_ticks,
+)
+
+if TYPE_CHECKING:
+    from .cache import ConversionCache
+    from .columns import ColumnWriter
+    from .decimate import Decimator
+    from .events import EventWriter
+    from .fleet import FleetWriter
+    from .sparse import SparseWriter
+
+# Bump when a change to the engine changes what it writes for the same log,
+# so conversions cached by an older version are not reused.
+ENGINE_VERSION: int = 2
+
+
+@dataclass(slots=True)
+class ParserState:
+    """
+    The parser state carried from one log line to the next, with the values a
+    conversion starts from.  ConvertEngine.run() starts from, and hands back,
+    one of these so a conversion can be split up or picked up later: it can
+    be copied, pickled to another process and saved as json.
+    """
+
+    # Latest date/time/secs read, the first and last in the log, and the
+    # values used to detect a change
+    date: str = ''
+    startDate: str = ''
+    endDate: str = ''
+    lastDate: str = ''
+    time: str = ''
+    startTime: str = ''
+    endTime: str = ''
+    lastTime: str = ''
+    newTime: bool = False
+    secs: str = ''
+    startSecs: str = ''
+    endSecs: str = ''
+    lastSecs: str = ''
+    newSecs: bool = False
+    linenum: int = 1  # line number of the next line read, starting at 1
+    numThings: int = 0
+    tag: str = ''
+    # Components of pump states, stored to detect changes:
+    lastPumpsOn: int = -1
+    lastPumpsHTshutdown: int = -1
+    lastPumpSelection: int = -1
+    lastPumpsShutdown: int = -1
+    lastP1CurrentHigh: float = -1.0
+    lastP2CurrentHigh: float = -1.0
+    lastMaxIp1: float = -1.0
+    lastMaxIp2: float = -1.0
+    # State vars for .csv file writing
+    Pon: int = 0
+    PumpsHot: int = 0
+    ePumpSelection: int = 0
+    PumpsShutdown: int = 0
+    P1CurrentHigh: int = 0
+    P2CurrentHigh: int = 0
+    maxIp1: float = 0.0
+    maxIp2: float = 0.0
+    fThrot: float = 0.0
+    fInTemp: float = 0.0
+    fOutTemp: float = 0.0
+    fFlow: float = 0.0
+    bIntOn: bool = False
+    bRestart: bool = False
+    bCold: bool = False
+    bPowerdown: bool = False
+    bLogClosed: bool = False
+    bLeak: bool = False
+    fMinFlow: float = 0.0
+    iMaxTemp: int = 0
+    iDissWatts: int = 0
+    iCmds: int = 0
+    iQrys: int = 0
+    iTouches: int = 0
+    ps24V: str = ' 0.00'
+    ps5V: str = ' 0.00'
+    ps3p3V: str = ' 0.00'
+    iCpuTemp: float = 0
+    iGlitch0: int = 0
+    iGlitch1: int = 0
+    iGlitch2: int = 0
+    rbtMarker: int | str = 0
+    dogExpired: int | str = 0
+    bWDTreboot: int = 0
+    bMysteryRestart: int | bool = 0
+    # Result of the last parsed entry
+    gotIt: bool = False
+    txt: str = ''
+    wasPowerdown: bool = False  # bPowerdown as it stood before the current tag
+    # csv writing
+    extraLines: int = 0
+    csvLine: str = ''  # values of the last csv row, repeated for leading edges
+    lastDateDup: str | None = ''
+    fSecs: float = 0.0
+    fTimeSecs: float = 0.0  # seconds into the day of the latest csv row
+    # The clock (see stamps) at the latest HH:MM stamp, its seconds into the
+    # day and the date of the latest good DT stamp as logged
+    minuteClock: int = 0
+    minuteSecs: int = 0
+    logDate: str = ''
+
+    def copy(self) -> 'ParserState':
+        return copy.copy(self)
+
+    def to_json(self) -> dict[str, Any]:
+        """
+        The state as json-ready values.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_json(cls, values: dict[str, Any]) -> 'ParserState':
+        """
+        The state saved by to_json().
+        """
+        return cls(**values)
+
+
+# A tag decoder: parses one log entry into the state, see ConvertEngine.run().
+Decoder = Callable[[ParserState, str, TextIO], None]
+
+# Specific heat of the coolant, J/(kg K), for the dissipated power.
+FLUID_SPECIFIC_HEAT: float = 1796.0
+
+
+CSV_HEADER: str = (
+    'Time,'
+    'Pon,PumpsHot,ePumpSelection,PumpsShutdown,P1CurrentHigh,P2CurrentHigh,maxIp1,maxIp2,'
+    'fThrot,fInTemp,fOutTemp,fFlow,bIntOn,bRestart,bCold,bPowerdown,bLogClosed,bLeak,fMinFlow,'
+    'iMaxTemp,iDissWatts,newCmds,newQrys,newTouches,ps24V,ps5V,ps3p3V,iCpuTemp,iGlitch0,iGlitch1,iGlitch2,'
+    'bWDTreboot,bMysteryRestart\n'
+)
+
+
+def leading_edge(fSecs: float) -> float:
+    """
+    Seconds stamp for the extra csv row that repeats the previous values just
+    before a change, so plots draw a step instead of a ramp.
+    """
+    if math.floor(fSecs * 100.0) != 0:
+        return (math.floor(fSecs * 100.0) - 1.0) / 100.0
+    return (math.floor(fSecs * 100.0)) / 100.0
+
+
+def output_paths(wdir: Path, fname: str) -> tuple[Path, Path, Path]:
+    """
+    Get the <fname>out/ folder and the out.txt and out.csv paths inside it
+    that a conversion of log `fname` writes to.
+
+    Inputs [wdir, fname]:
+        Working directory and the log's base name, e.g. sn1060log18.
+    Returns [tuple(Path, Path, Path)]:
+        The output folder, the out.txt path and the out.csv path.
+    """
+    output_dir = wdir / Path(fname + 'out')
+    return (
+        output_dir,
+        output_dir / Path(fname + 'out.txt'),
+        output_dir / Path(fname + 'out.csv'),
+    )
+
+
+class ConvertEngine:
+    """
+    Converts a raw HEU3 log into the expanded, human-readable out.txt and the
+    out.csv for the CSV viewer.
+
+    Only holds the conversion settings, so it runs without Qt or a serial
+    port: from the GUI worker thread, the command line or another process.
+    """
+
+    def __init__(
+        self,
+        logVersion: int = 2,
+        timeZoneOffset: int = 0,
+        dateLineOffset: int = 0,
+        mute: int = 0,
+        startLine: int = 0,
+        endLine: int = 20000000,
+        printIt: bool = False,
+        csvIt: bool = True,
+        npzIt: bool = False,
+        sparseIt: bool = False,
+        decimateIt: bool = False,
+        compression: str | None = None,
+        vectorIt: bool = False,
+        fleetDb: str | None = None,
+        fleetSN: str | None = None,
+        eventsIt: bool = False,
+    ) -> None:
+        self.logVersion: int = logVersion
+        self.timeZoneOffset: int = timeZoneOffset
+        self.dateLineOffset: int = dateLineOffset
+        self.mute: int = mute
+        self.startLine: int = startLine
+        self.endLine: int = endLine
+        self.printIt: bool = printIt
+        self.csvIt: bool = csvIt
+        self.npzIt: bool = npzIt  # also the csv columns as <fname>out.npz
+        # also the csv rows as changes only, in <fname>out.sparse.csv
+        self.sparseIt: bool = sparseIt
+        # also min/max summaries of the csv in <fname>out.1s.csv/.10s.csv/.1min.csv
+        self.decimateIt: bool = decimateIt
+        # out.txt and out.csv written compressed: None, 'gz' or 'zst'
+        self.compression: str | None = compression
+        # FL/TM/DB/TH entries and TI stamps taken a block at a time with numpy
+        # (vectorized.py): same outputs, faster
+        self.vectorIt: bool = vectorIt
+        # also the csv rows and flag changes into this SQLite database (fleet.py)
+        self.fleetDb: str | None = fleetDb
+        # the unit's serial number there; None to take it from the log's name
+        self.fleetSN: str | None = fleetSN
+        # also the restarts, leaks, pump faults... in <fname>out.events.csv
+        self.eventsIt: bool = eventsIt
+
+    def convert(
+        self, input_data: Path, output_txt: Path, output_csv: Path
+    ) -> ParserState | None:
+        """
+        Convert the raw log `input_data`, appending the expanded log to
+        `output_txt` and, if csvIt, writing the csv to `output_csv` (and if
+        npzIt, its columns to <fname>out.npz next to it, if sparseIt, its
+        changes to <fname>out.sparse.csv, if decimateIt, its summaries to
+        <fname>out.1s.csv, .10s.csv and .1min.csv, if eventsIt, its events to
+        <fname>out.events.csv, and with a fleetDb, its rows into that
+        database).  With a compression
+        out.txt and out.csv are written to out.txt.gz and out.csv.gz (or
+        .zst) instead.  The log can be a .txt.gz or .txt.zst file.
+        Raises whatever went wrong; everything converted up to that point is
+        still flushed to the outputs.
+
+        Returns [ParserState | None]:
+            The parser state at the end, None if the log ended before
+            START_LINE.
+        """
+        ## Open the file only once
+        with open_log(input_data) as logIn:
+            return self.convert_lines(logIn, output_txt, output_csv)
+
+    def convert_lines(
+        self, logIn: TextIO, output_txt: Path, output_csv: Path
+    ) -> ParserState | None:
+        """
+        Same as convert(), reading the raw log lines from logIn, which can be
+        anything with a readline() (an open file, a download in progress).
+        """
+        colOut = None
+        if self.npzIt:
+            from .columns import ColumnWriter, npz_path
+
+            colOut = ColumnWriter(npz_path(output_csv))
+        sparseOut = None
+        if self.sparseIt:
+            from .sparse import SparseWriter, sparse_path
+
+            sparseOut = SparseWriter(sparse_path(output_csv))
+        decOut = None
+        if self.decimateIt:
+            from .decimate import Decimator
+
+            decOut = Decimator(output_csv)
+        dbOut = None
+        if self.fleetDb is not None:
+            from .fleet import fleet_writer
+
+            dbOut = fleet_writer(self.fleetDb, output_csv, self.fleetSN)
+        evOut = None
+        if self.eventsIt:
+            from .events import EventWriter, events_path
+
+            evOut = EventWriter(events_path(output_csv), logIn)
+        # Open the outputs once for the whole conversion
+        with OutputSinks(
+            output_txt,
+            output_csv if self.csvIt else None,
+            compression=self.compression,
+        ) as sinks:
+            try:
+                if sinks.csv is not None:
+                    # Write the HEADER line with the column names         #248 characters!
+                    sinks.csv.write(CSV_HEADER)
+
+                linenum = 1  # Start line number at 1
+
+                # Loop 1: Move to start line by reading and discarding lines
+                while linenum < self.startLine:
+                    logLine = logIn.readline()
+                    if not logLine:  # Check for end-of-file (shouldn't happen here if startLine is valid)
+                        print(
+                            f'Error: Reached end of file at line {linenum} before start line {self.startLine}'
+                        )
+                        return None  # Or break, or handle the error
+                    linenum += 1
+
+                # Loop 2: Scan log lines from self.startLine
+                state = self.run(
+                    logIn,
+                    sinks.txt,
+                    sinks.csv,
+                    ParserState(linenum=linenum),
+                    colOut,
+                    sparseOut,
+                    decOut,
+                    dbOut,
+                    evOut,
+                )
+                self.print_summary(state)
+                return state
+            finally:
+                if colOut is not None:
+                    colOut.save()
+                if sparseOut is not None:
+                    sparseOut.close()
+                if decOut is not None:
+                    decOut.close()
+                if dbOut is not None:
+                    dbOut.close()
+                if evOut is not None:
+                    evOut.close()
+
+    def print_summary(self, state: ParserState) -> None:
+        """
+        Print where the scan stopped and the limits of the converted log.
+        """
+        if state.linenum < self.endLine:  # stopped by the end of the file
+            print(f'End of file reached at line {state.linenum}. Stopping scan.')
+        # print / return limits.
+        if state.endDate:  # This line isn't in the .csv file in any case:
+            print('End  :', state.endDate, state.endTime, state.endSecs)
+        print(state.linenum, 'lines +', state.extraLines, 'added')
+
+    def run(
+        self,
+        logIn: TextIO,
+        logOut: TextIO,
+        csvOut: TextIO | None,
+        entry: ParserState | None = None,
+        colOut: 'ColumnWriter | None' = None,
+        sparseOut: 'SparseWriter | None' = None,
+        decOut: 'Decimator | None' = None,
+        dbOut: 'FleetWriter | None' = None,
+        evOut: 'EventWriter | None' = None,
+    ) -> ParserState:
+        """
+        Convert the log lines from logIn's current position to its end (or to
+        endLine), writing the expanded log to logOut and csv rows to csvOut.
+
+        Inputs [logIn, logOut, csvOut, entry, colOut, sparseOut, decOut, dbOut,
+                evOut]:
+            The raw log, the outputs (csvOut None for no csv), the parser
+            state to start from (None for a fresh one; it is not changed),
+            where to also add the csv rows as columns, as changes, to bucket
+            summaries and to the fleet database and where to index the
+            events, if anywhere.
+        Returns [ParserState]:
+            The parser state after the last line converted.
+        """
+        st = ParserState() if entry is None else entry.copy()
+        exports = any(
+            out is not None for out in (colOut, sparseOut, decOut, dbOut, evOut)
+        )
+        if self.vectorIt and not self.printIt and not exports:
+            # Runs of FL/TM/DB/TH entries and TI stamps are converted a block at
+            # a time; the .npz, sparse, decimated, fleet and event exports and
+            # printIt need every line here
+            from .vectorized import VectorReader
+
+            logIn = VectorReader(self, st, self.clock_offset(), logIn, logOut, csvOut)
+        for _ in self.steps(
+            st, logIn, logOut, csvOut, colOut, sparseOut, decOut, dbOut, evOut
+        ):
+            pass
+        return st
+
+    def clock_offset(self) -> int:
+        """
+        The ticks added to the clock for the time zone and date line, so they
+        carry over month and year ends.
+        """
+        return (
+            self.timeZoneOffset * TICKS_PER_HOUR + self.dateLineOffset * TICKS_PER_DAY
+        )
+
+    def steps(
+        self,
+        st: ParserState,
+        logIn: TextIO,
+        logOut: TextIO,
+        csvOut: TextIO | None,
+        colOut: 'ColumnWriter | None' = None,
+        sparseOut: 'SparseWriter | None' = None,
+        decOut: 'Decimator | None' = None,
+        dbOut: 'FleetWriter | None' = None,
+        evOut: 'EventWriter | None' = None,
+    ) -> Iterator[str]:
+        """
+        Convert the log lines from logIn's current position like run(), one
+        at a time: st is updated in place and each line is yielded once it
+        has been taken in, so st can be looked at in between.
+        """
+        offset = self.clock_offset()
+        # Formats only the csv fields that changed since the previous row
+        rowFormatter = CsvRowFormatter(track=sparseOut is not None)
+        csvRow = rowFormatter.row
+        rowsOut = any(
+            out is not None for out in (csvOut, colOut, sparseOut, decOut, dbOut, evOut)
+        )
+        rows = 0  # csv rows so far, for the event index
+
+        # Registry of tag decoders, built once per conversion so each log line
+        # costs a single lookup.  Support for a new tag only needs a decode_XX
+        # method and an entry here.
+        decoders: dict[str, Decoder] = {
+            'PS': self.decode_PS,
+            'TH': self.decode_TH,
+            'TM': self.decode_TM,
+            'FL': self.decode_FL,
+            'PR': self.decode_PR,
+            'IN': self.decode_IN,
+            'RE': self.decode_RE,
+            'PD': self.decode_PD,
+            'CL': self.decode_CL,
+            'LE': self.decode_LE,
+            'MF': self.decode_MF,
+            'MT': self.decode_MT,
+            'VE': self.decode_VE,
+            'DW': self.decode_DW,
+            'IF': self.decode_IF,
+            'TU': self.decode_TU,
+            'SV': self.decode_SV,
+            'CT': self.decode_CT,
+            'DB': self.decode_DB,
+            'WD': self.decode_WD,
+        }
+
+        # Scan log lines up to (but not including) self.endLine
+        while st.linenum < self.endLine:
+            logLine = logIn.readline()
+
+            # Check for end-of-file *within* the desired scan range
+            if not logLine:
+                break
+
+            # IMPORTANT: Only increment linenum *after* successfully reading a line
+            st.linenum += 1
+            gotStamp = False
+            # Extract date and time stamps, combine.
+            st.tag = logLine[:2]
+            # gotBAD = False
+
+            if st.tag == 'DT':  # Update MM/DD/YY HH:MM:SS
+                if logLine[3:6] != 'BAD':  # BAD 1/BAD 2: the date is unchanged
+                    st.logDate = logLine[3:11]
+                st.time = logLine[12:17]
+                # Raises ValueError for a garbled stamp
+                st.minuteClock = minute_ticks(st.logDate, st.time) + offset
+                st.minuteSecs = st.minuteClock % TICKS_PER_DAY // TICKS_PER_SEC
+                if offset:
+                    st.date, st.time = render_minute(st.minuteClock)
+                else:
+                    st.date = st.logDate
+
+                st.secs = logLine[18:23]
+                if st.startDate == '':
+                    st.startDate = st.date
+                st.endDate = st.date
+                if st.time != '':
+                    st.newTime = True
+                    if st.startTime == '':
+                        st.startTime = st.time
+                        st.endTime = st.time
+                if st.secs != '':
+                    st.lastSecs = st.secs
+                    if st.startSecs == '':
+                        st.startSecs = st.secs
+                        if (
+                            self.mute == 0
+                        ):  # This line isn't in the .csv file in any case:
+                            print('\nStart:', st.startDate, st.startTime, st.startSecs)
+                    st.endSecs = st.secs
+                    st.newSecs = True
+                gotStamp = True  # This log line is a time stamp?
+
+            # Update H:M  (always preceeds another log entry, which has seconds)
+            if st.tag == 'TI':
+                self.take_TI(st, logLine, offset)
+                gotStamp = True
+
+            if gotStamp is False:  # Other log entries: Update :secs.hundredths
+                st.numThings += 1
+                st.secs = logLine[3:8]
+                if st.secs != '':
+                    if st.secs != st.lastSecs:
+                        if st.startSecs == '':
+                            st.startSecs = st.secs
+                        st.endSecs = st.secs
+                    st.newSecs = True
+                    st.lastSecs = st.secs
+                self.parseLogEntries(
+                    st, logLine, logOut, decoders
+                )  # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
+            # Ok, did we get a time stamp or a parsable tag with something else?
+            if rowsOut and st.date != '':
+                # if time == '14:25': print(gotStamp,gotIt,txt,date,time,secs)
+                if (gotStamp and st.newSecs) or (
+                    st.gotIt and st.txt != '' and st.newSecs
+                ):  # blank txt is a flag to mute this log entry
+                    # Did we get a "BAD n" DateTime stamp?  Calculate the next hour and use that.
+
+                    # Did we log an earlier date stamp after a later one?
+                    # if (int(date[6:8]==0)) or (int(date[0:2]==0)) or (int(date[3:5]==0)):
+                    #    print ('Ble?', date[6:8], date[0:2], date[3:5])
+                    # if (date!='') and (lastDate!=''):
+                    #    yearD  = int(date[6:8]) - int(lastDate[6:8])
+                    #    monthD = int(date[0:2]) - int(lastDate[0:2])
+                    #    dayD   = int(date[3:5]) - int(lastDate[3:5])
+                    #    if (yearD<0) or (yearD==0 and monthD<0) or (yearD==0 and monthD==0 and dayD<0):
+                    #         print ('Bleh! ', date, lastDate)
+
+                    fTimeSecsPrev = st.fTimeSecs
+                    st.fSecs = float(st.secs)
+                    st.fTimeSecs = st.minuteSecs + st.fSecs
+                    # print (fSecs)
+                    # In floats, as ever: an exact 0.02 s gap may come out
+                    # either side of 0.02 and the csv has always followed that
+                    if (
+                        st.date == st.lastDateDup
+                        and (st.fTimeSecs - fTimeSecsPrev) > 0.02
+                    ):
+                        # if date==lastDateDup and time==lastTimeDup and secs==lastSecsDup:
+                        fLeadingEdge = leading_edge(st.fSecs)
+                        if csvOut is not None:
+                            csvOut.write(
+                                f'{st.date} {st.time}:{fLeadingEdge:05.2f},'
+                                + st.csvLine
+                            )  # duplicate previous values
+                        if colOut is not None or decOut is not None:
+                            edge = st.minuteClock + round(fLeadingEdge * TICKS_PER_SEC)
+                            if colOut is not None:
+                                colOut.repeat(edge / TICKS_PER_SEC)
+                            if decOut is not None:
+                                decOut.repeat(edge / TICKS_PER_SEC)
+                        st.extraLines += 1
+                        rows += 1
+                    #    print ('!')
+                    if csvOut is not None or sparseOut is not None:
+                        st.csvLine = csvRow(st)
+                        if csvOut is not None:
+                            csvOut.write(f'{st.date} {st.time}:{st.secs},' + st.csvLine)
+                        if sparseOut is not None:
+                            sparseOut.append(
+                                f'{st.date} {st.time}:{st.secs}', rowFormatter.changes
+                            )
+                    if colOut is not None or decOut is not None or dbOut is not None:
+                        values = (
+                            st.Pon,
+                            st.PumpsHot,
+                            st.ePumpSelection,
+                            st.PumpsShutdown,
+                            st.P1CurrentHigh,
+                            st.P2CurrentHigh,
+                            st.maxIp1,
+                            st.maxIp2,
+                            st.fThrot,
+                            st.fInTemp,
+                            st.fOutTemp,
+                            st.fFlow,
+                            st.bIntOn,
+                            st.bRestart,
+                            st.bCold,
+                            st.bPowerdown,
+                            st.bLogClosed,
+                            st.bLeak,
+                            st.fMinFlow,
+                            st.iMaxTemp,
+                            st.iDissWatts,
+                            st.iCmds,
+                            st.iQrys,
+                            st.iTouches,
+                            st.ps24V,
+                            st.ps5V,
+                            st.ps3p3V,
+                            st.iCpuTemp,
+                            st.iGlitch0,
+                            st.iGlitch1,
+                            st.iGlitch2,
+                            st.bWDTreboot,
+                            st.bMysteryRestart,
+                        )
+                        clock = st.minuteClock + round(st.fSecs * TICKS_PER_SEC)
+                        if colOut is not None:
+                            colOut.append(clock / TICKS_PER_SEC, values)
+                        if decOut is not None:
+                            decOut.append(clock / TICKS_PER_SEC, values)
+                        if dbOut is not None:
+                            dbOut.append(clock / TICKS_PER_SEC, values)
+                    st.lastDateDup = st.date
+                    rows += 1
+                    # lastTimeDup = time
+                    # lastSecsDup = secs
+
+            if evOut is not None and not gotStamp and st.gotIt:
+                evOut.take(st, rows)
+
+            if st.date != st.lastDate:
+                st.lastDate = st.date
+                # newDate = True
+            if st.newSecs is True and st.newTime is True:
+                st.newSecs = False
+                st.newTime = False
+                # newDate = False
+            yield logLine
+
+    def take_TI(self, st: ParserState, logLine: str, offset: int) -> None:
+        """
+        Take in a TI (HH:MM) time stamp line, offset being the ticks added to
+        the clock for the time zone and date line.
+        """
+        st.time = logLine[3:8]
+        try:
+            clock = time_ticks(st.time) + offset
+            if st.logDate:  # on the date of the last DT stamp
+                clock += day_ticks(st.logDate)
+            st.minuteClock = clock
+            st.minuteSecs = clock % TICKS_PER_DAY // TICKS_PER_SEC
+            if offset:
+                date, st.time = render_minute(clock)
+                if st.logDate:
+                    st.date = date
+        except ValueError:
+            pass  # a garbled time: the clock holds
+
+        if st.startTime == '':  # this may never happen... DT stamp comes first.
+            st.startTime = st.time
+        st.endTime = st.time
+        if st.time != st.lastTime:  # Detect changed time and print that.
+            st.newTime = True
+            st.lastTime = st.time
+        st.newSecs = False
+
+    def parseLogEntries(
+        self,
+        st: ParserState,
+        logLine: str,
+        logOut: TextIO,
+        decoders: dict[str, Decoder],
+    ) -> None:
+        # Parse and convert this non-timestamp log entry, recording in logOut.
+        st.gotIt = False  # Did this line parse?
+        st.txt = ''
+        st.bRestart = False  # bRestart is only true for one tag's duration.
+        st.bCold = False  # bCold is only true for one tag's duration.
+        st.wasPowerdown = st.bPowerdown  # RE checks the previous tag's value
+        st.bPowerdown = False
+        st.bLogClosed = False  # Log bool is only true for one tag's duration.
+
+        decoder = decoders.get(st.tag)
+        if decoder is not None:
+            decoder(st, logLine, logOut)
+        # Now print that        :
+        if st.gotIt is False and logLine != '\n' and logLine != '':
+            st.txt = f'Unrecognizable tag: {logLine}'
+            if self.printIt:  # Comment out for verbose run
+                print(f'Line {st.linenum} ' + st.txt)
+        else:
+            if (self.mute == 0) & (st.txt != ''):
+                if self.printIt:
+                    print(st.txt, f'{st.date} {st.time}{st.lastSecs}')
+                logOut.write(st.txt + f' {st.date} {st.time}:{st.secs}\n')
+            # if csvIt:
+            #    csvOut.write('')
+        # end parseLogEntries
+
+    # Tag decoders: each one parses a non-timestamp log entry into the
+    # state variables and sets gotIt/txt for parseLogEntries to record.
+    def decode_PS(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Pump states.  Many combined things packed in 24b / 8 decimal digits.
+
+        st.secs = logLine[3:8]
+        st.gotIt = True
+        pStates = int(logLine[9:18])  # number conversion
+        #  unsigned combined = (unsigned)pumpsOn&0x1;            //bit0
+        st.Pon = pStates & 0x1
+        if st.Pon != st.lastPumpsOn:
+            st.lastPumpsOn = st.Pon
+            if st.Pon == 1:
+                st.txt = 'Pumps On                   '
+            else:
+                st.txt = 'Pumps Off                  '
+            if self.printIt:
+                print(
+                    st.txt, f'{st.date} {st.time}:{st.secs}'
+                )  # ...28 charactors allowed...
+            logOut.write(st.txt + f' {st.date} {st.time}:{st.secs}\n')
+        #  combined |= ((unsigned)pumpsHighTempShutdown&0x1)<<1; //bit1
+        st.PumpsHot = (pStates >> 1) & 0x1
+        if st.PumpsHot != st.lastPumpsHTshutdown:
+            st.lastPumpsHTshutdown = st.PumpsHot
+            if st.PumpsHot == 1:
+                st.txt = 'PUMPS HOT, shut down!      '
+            else:
+                st.txt = 'Pumps not hot.             '
+            if self.printIt:
+                print(st.txt, f'{st.date} {st.time}:{st.secs}')
+            logOut.write(st.txt + f' {st.date} {st.time}:{st.secs}\n')
+        #  combined |= ((unsigned)pumpSelection&0x3)<<2;         //bit2, bit3
+        st.ePumpSelection = (pStates >> 2) & 0x3
+        if st.ePumpSelection != st.lastPumpSelection:
+            st.lastPumpSelection = st.ePumpSelection
+            if st.ePumpSelection == 0:
+                st.txt = 'BOTH PUMPS DISABLED!?      '
+            elif st.ePumpSelection == 1:
+                st.txt = 'P.1 Enabled, P.2 DISABLED  '
+            elif st.ePumpSelection == 2:
+                st.txt = 'P.1 DISABLED, P.2 Enabled  '
+            elif st.ePumpSelection == 3:
+                st.txt = 'Both pumps enabled.        '
+            if self.printIt:
+                print(st.txt, f'{st.date} {st.time}:{st.secs}')
+            logOut.write(st.txt + f' {st.date} {st.time}:{st.secs}\n')
+        #  combined |= ((unsigned)pumpShutdownOverride&0x1)<<4;  //bit4
+        st.PumpsShutdown = (pStates >> 4) & 0x1
+        if st.PumpsShutdown != st.lastPumpsShutdown:
+            st.lastPumpsShutdown = st.PumpsShutdown
+            if st.PumpsShutdown == 1:
+                st.txt = 'Pumps shutting down        '
+            else:
+                st.txt = 'Pumps running              '
+            if self.printIt:
+                print(st.txt, f'{st.date} {st.time}:{st.secs}')
+            logOut.write(st.txt + f' {st.date} {st.time}:{st.secs}\n')
+        #  combined |= ((unsigned)p1CurrentHigh&0x1)<<5;         //bit5
+        st.P1CurrentHigh = (pStates >> 5) & 0x1
+        if st.P1CurrentHigh != st.lastP1CurrentHigh:
+            st.lastP1CurrentHigh = st.P1CurrentHigh
+            if st.P1CurrentHigh == 1:
+                st.txt = 'Pump 1 CURRENT HIGH        '
+            else:
+                st.txt = 'Pump 1 current normal.     '
+            if self.printIt:
+                print(st.txt, f'{st.date} {st.time}:{st.secs}')
+            logOut.write(st.txt + f' {st.date} {st.time}:{st.secs}\n')
+        #  combined |= ((unsigned)p2CurrentHigh&0x1)<<6;         //bit6
+        st.P2CurrentHigh = (pStates >> 6) & 0x1
+        if st.P2CurrentHigh != st.lastP2CurrentHigh:
+            st.lastP2CurrentHigh = st.P2CurrentHigh
+            if st.P2CurrentHigh == 1:
+                st.txt = 'Pump 2 CURRENT HIGH        '
+            else:
+                st.txt = 'Pump 2 current normal.     '
+            if self.printIt:
+                print(st.txt, f'{st.date} {st.time}:{st.secs}')
+            logOut.write(st.txt + f' {st.date} {st.time}:{st.secs}\n')
+        #  combined |= ((unsigned)maxIp1<<7);                    //bits 7-14
+        st.maxIp1 = float((pStates >> 7) & 0xFF) / 10.0
+        if st.maxIp1 != st.lastMaxIp1:
+            st.lastMaxIp1 = st.maxIp1
+            if self.printIt:
+                print(
+                    f'Max pump 1 current {st.maxIp1:4.1f} A   {st.date} {st.time}{st.secs}'
+                )
+            logOut.write(
+                f'Max pump 1 current {st.maxIp1:4.1f} A   {st.date} {st.time}:{st.secs}\n'
+            )
+        #  combined |= ((unsigned)maxIp2<<15);                   //bits 15-22
+        st.maxIp2 = float((pStates >> 15) & 0xFF) / 10.0
+        if st.maxIp2 != st.lastMaxIp2:
+            st.lastMaxIp2 = st.maxIp2
+            if self.printIt:
+                print(
+                    f'Max pump 2 current {st.maxIp2:4.1f} A   {st.date} {st.time}{st.secs}'
+                )
+            logOut.write(
+                f'Max pump 2 current {st.maxIp2:4.1f} A   {st.date} {st.time}:{st.secs}\n'
+            )
+        # txt = f'(PS:{pStates:8d})              '
+        st.txt = ''
+        # bits 23-25 SPARE in 8 digits
+        ### end tag=='PS' #####################################################################################
+
+    def decode_TH(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Pump Throttle change.
+
+        st.gotIt = True
+        throt = logLine[9:15]
+        st.fThrot = float(throt)
+        st.txt = f'Throttle: {st.fThrot:5.3f}            '
+
+    def decode_TM(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Temperature(s) changed.
+
+        st.gotIt = True
+        if self.logVersion == 1:
+            inTemp = logLine[9:13]
+            outTemp = logLine[13:18]
+            st.fInTemp = float(inTemp)
+            st.fOutTemp = float(outTemp)
+            st.txt = f'Inlet:{st.fInTemp:4.1f} C, Outlet:{st.fOutTemp:4.1f} C'
+        else:
+            inTemp = logLine[9:14]
+            outTemp = logLine[14:20]
+            st.fInTemp = float(inTemp)
+            st.fOutTemp = float(outTemp)
+            st.txt = f'Inlet:{st.fInTemp:5.2f}C, Outlet:{st.fOutTemp:5.2f}C'
+        st.iDissWatts = int(
+            st.fFlow / 60.0 * (st.fInTemp - st.fOutTemp) * FLUID_SPECIFIC_HEAT
+        )
+        if self.mute == 1:
+            st.txt = ''
+
+    def decode_FL(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Flow rate changed.
+
+        st.gotIt = True
+        flow = logLine[9:14]
+        st.fFlow = float(flow)
+        st.txt = f'Flow rate: {st.fFlow:5.2f} l/min     '
+        st.iDissWatts = int(
+            st.fFlow / 60.0 * (st.fInTemp - st.fOutTemp) * FLUID_SPECIFIC_HEAT
+        )
+        if self.mute == 1:
+            st.txt = ''
+
+    def decode_PR(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Print of log.
+
+        st.gotIt = True
+        st.txt = 'Log File Read              '
+
+    def decode_IN(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Interlock On/Off.
+
+        st.gotIt = True
+        intOn = logLine[9:10]
+        st.bIntOn = bool(int(intOn))
+        if st.bIntOn:
+            st.txt = 'Interlock On               '
+        else:
+            st.txt = 'Interlock Off              '
+
+    def decode_RE(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Restart
+
+        st.bRestart = True
+        if st.linenum != 0:  # not a blank log prior to this
+            st.bMysteryRestart = (
+                st.wasPowerdown is False
+            )  # We should have had a logged shutdown before this.  Why?  WDT?
+        st.bWDTreboot = 0  # Will be set with another tag soon if it is a WDT reboot.
+        st.gotIt = True
+        cold = logLine[9:10]
+        if cold == 'C':
+            st.bCold = True
+            st.txt = '\nCOLD RESTART               '  # From power-down or hard reset.
+        else:
+            st.txt = '\nWARM RESTART               '  # From brownout.
+        st.lastPumpsOn = -1
+        st.lastPumpsHTshutdown = -1
+        st.lastPumpSelection = -1
+        st.lastPumpsShutdown = -1
+        st.lastP1CurrentHigh = -1.0
+        st.lastP2CurrentHigh = -1.0
+        st.lastMaxIp1 = -1.0
+        st.lastMaxIp2 = -1.0
+
+    def decode_PD(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Power going down (voltage<min).
+
+        st.bPowerdown = True
+        st.gotIt = True
+        st.txt = 'POWER GOING DOWN           '
+
+    def decode_CL(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Close of log.
+
+        st.bLogClosed = True
+        st.bPowerdown = True  # COULD BE A SOFTWARE RELOAD WITH "RELOD" COMMAND, NOTE?
+        st.gotIt = True
+        st.txt = 'LOG CLOSED.                '
+
+    def decode_LE(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Leak detected?
+
+        st.gotIt = True
+        leak = logLine[9:10]
+        st.bLeak = bool(int(leak))
+        if st.bLeak:
+            st.txt = 'LEAK detected              '
+        else:
+            st.txt = 'No leak                    '
+
+    def decode_MF(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Minimum (interlock) flow rate setting
+
+        st.gotIt = True
+        minFlow = logLine[9:14]
+        st.fMinFlow = float(minFlow)
+        st.txt = f'Min flow lim set:{st.fMinFlow:5.2f} l/m '
+
+    def decode_MT(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Minimum (interlock) temp rate setting
+
+        st.gotIt = True
+        maxTemp = logLine[9:11]
+        st.iMaxTemp = int(maxTemp)
+        st.txt = f'Max temp limit set:{st.iMaxTemp:2d} C    '
+
+    def decode_VE(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Version numbers
+
+        st.gotIt = True
+        th = logLine[9:11]
+        ts = logLine[12:14]
+        st.txt = f'Hardware V{th}, Software V{ts} '  # NOTE: does not sucessfuly produce ints, just strings.
+        # txt = f'Hardware V{hV:2d}, Software V{sV:2d} '
+        # Now determine and print if the unit rebooted without a shutdown or WDT reboot message:
+        if st.bMysteryRestart:  # Restart without reason!
+            logOut.write(
+                f'Restart without Shutdown!   {st.date} {st.time}:{st.secs}\n'
+            )  # Extra log entry
+
+    def decode_DW(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Dissipated Power, Watts.
+
+        st.gotIt = True
+        # dWatts = logLine[9:13]
+        # iDissWatts = int(dWatts)   #logged power, but ignore it as it's behind the values it's created from,
+        # and just adds double entries.
+        # iDissWatts = int(fFlow/60.*(fInTemp-fOutTemp)*FLUID_SPECIFIC_HEAT)
+        # txt = f'Dissipated Power:{iDissWatts:4d} W    '
+        st.txt = ''  # kill this anyway, it's a duplicate.
+
+    def decode_IF(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # New valid commands and queries received over the HEU interface(s)
+
+        st.gotIt = True
+        cmds = logLine[9:20]
+        st.iCmds += int(cmds)
+        qrys = logLine[20:31]
+        st.iQrys += int(qrys)
+        st.txt = f'Cmds:{st.iCmds:11d} Qrys:{st.iQrys:11d}'
+        # txt = '' #IGNORE
+
+    def decode_TU(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # New screen touches
+
+        st.gotIt = True
+        touches = logLine[9:20]
+        st.iTouches += int(touches)
+        st.txt = f'Touches:{st.iTouches:11d}'
+
+    def decode_SV(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # (power) Supply Voltages.
+
+        st.gotIt = True
+        st.ps24V = logLine[9:14]  # 5 of 5 chars
+        st.ps5V = logLine[16:20]  # 4 of 5 chars
+        st.ps3p3V = logLine[22:26]  # 4 of 5 chars
+        # fPs24V = float(ps24V)
+        # fPs5V  = float(ps5V)
+        # fPs3p3V = float(ps3p3V)
+        st.txt = '24V:' + st.ps24V + ' 5V:' + st.ps5V + ' 3.3V:' + st.ps3p3V
+
+    def decode_CT(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # CPU temperature
+
+        st.gotIt = True
+        cpuTemp = logLine[9:13]
+        st.iCpuTemp = float(cpuTemp)
+        st.txt = f'CPU temperature: {st.iCpuTemp:4.1f} C    '
+
+    def decode_DB(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # Debug print: three counters, 000-999, or any three charactor strings
+
+        st.gotIt = True
+        # print (logLine)
+        glitch0 = logLine[9:12]  # 000 000 000\n
+        glitch1 = logLine[13:16]
+        glitch2 = logLine[17:20]
+        st.iGlitch0 = int(glitch0)
+        st.iGlitch1 = int(glitch1)
+        st.iGlitch2 = int(glitch2)
+        st.txt = (
+            f'Debug 0:{st.iGlitch0:03d} 1:{st.iGlitch1:03d} 2:{st.iGlitch2:03d}    '
+        )
+        # txt = 'Debug 0:'+glitch0+'  1:'+glitch1+'  2:'+glitch2+'  '
+        # txt = ''
+
+    def decode_WD(self, st: ParserState, logLine: str, logOut: TextIO) -> None:
+        # WDT reboot: type?
+
+        # "WD:%05.2f %1d %1d\n", secondz(), rebootMarker, dog3.expired());
+        st.gotIt = True
+        st.rbtMarker = logLine[9:11]
+        st.dogExpired = logLine[11:12]
+        # txt = f'WDT reboot: {rbtMarker:1d} {dogExpired:1d} '
+        st.txt = 'WDT reboot:' + st.rbtMarker + st.dogExpired
+        st.bWDTreboot = 1
+        st.bMysteryRestart = False  # Aah.  That's why.
+
+
+def convert_file(
+    input_data: Path,
+    wdir: Path | None = None,
+    engine: ConvertEngine | None = None,
+    workers: int = 1,
+    resume: bool = False,
+    window: tuple[datetime | None, datetime | None] | None = None,
+    cache: 'ConversionCache | None' = None,
+) -> tuple[Path, Path]:
+    """
+    Convert one raw log into <wdir>/<fname>out/, named after the log file,
+    replacing any outputs a previous conversion left there.
+
+    Inputs [input_data, wdir, engine, workers, resume, window, cache]:
+        Path to the raw log, the working directory (defaults to the log's
+        folder), the engine holding the conversion settings, the number
+        of processes to split a large log across, whether to only
+        convert what was added since the outputs were last written and the
+        (start, end) times to convert between, None for the whole log, and
+        the cache to skip the conversion of a log converted before (whole
+        logs only).
+    Returns [tuple(Path, Path)]:
+        The out.txt and out.csv paths (out.txt.gz and out.csv.gz, or .zst,
+        with the engine's compression).
+    """
+    if engine is None:
+        engine = ConvertEngine()
+    if wdir is None:
+        wdir = input_data.parent
+    output_dir, output_txt, output_csv = output_paths(wdir, log_stem(input_data))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = (
+        compressed_path(output_txt, engine.compression),
+        compressed_path(output_csv, engine.compression),
+    )
+    if window is not None:
+        from .snapshot import snapshot_path
+        from .timeindex import convert_window
+
+        snapshot_path(output_txt).unlink(missing_ok=True)  # not the whole log
+        convert_window(engine, input_data, *window, output_txt, output_csv)
+        return written
+    if cache is not None and cache.fetch(engine, input_data, output_txt, output_csv):
+        print(f'{input_data.name} already converted with these settings.')
+        return written
+    if resume:
+        from .snapshot import convert_resumable
+
+        convert_resumable(engine, input_data, output_txt, output_csv)
+    else:
+        written[0].write_text('')  # out.txt is appended to, start it empty
+        if workers > 1:
+            from .parallel import convert_parallel
+
+            convert_parallel(engine, input_data, output_txt, output_csv, workers)
+        else:
+            engine.convert(input_data, output_txt, output_csv)
+    if cache is not None:
+        cache.store(engine, input_data, output_txt, output_csv)
+    return written
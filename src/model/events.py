@@ -0,0 +1,161 @@
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, TextIO
+
+from .sinks import OUTPUT_BUFFER_SIZE
+
+if TYPE_CHECKING:
+    from .engine import ParserState
+
+EVENTS_HEADER: str = 'Time,Line,Offset,Row,Type,Payload\n'
+
+# The event types, by the tag that logs them.  The pump, leak and current
+# events are changes: the same value logged again is not an event.
+EVENT_TYPES: dict[str, tuple[str, ...]] = {
+    'RE': ('coldRestart', 'warmRestart'),
+    'VE': ('restartWithoutShutdown',),
+    'WD': ('wdtReboot',),
+    'LE': ('leak', 'leakCleared'),
+    'PS': (
+        'pumpsHot',
+        'pumpsCooled',
+        'p1CurrentHigh',
+        'p1CurrentNormal',
+        'p2CurrentHigh',
+        'p2CurrentNormal',
+    ),
+    'PD': ('powerDown',),
+    'CL': ('logClosed',),
+}
+
+
+def events_path(output_csv: Path) -> Path:
+    """
+    The event index written next to out.csv: <fname>out.events.csv.
+    """
+    return output_csv.with_suffix('.events.csv')
+
+
+@dataclass(slots=True, frozen=True)
+class LogEvent:
+    """
+    One row of an event index, see EventWriter.
+    """
+
+    time: str
+    line: int
+    offset: int | None
+    row: int
+    type: str
+    payload: str
+
+
+class EventWriter:
+    """
+    The incidents of a log (restarts, WDT reboots, leaks, pump faults, power
+    downs) indexed in a small csv next to out.csv as the log is converted,
+    so they can be found without reading out.txt.
+
+    Each event gets its time as out.csv prints it, the raw log line number
+    and byte offset of the line that logged it (the offset is empty when
+    the log isn't read from a plain file), the out.csv row of that line (1
+    for the first row after the header; the row before if the line has
+    none; counted as written, though an entry cut short in a garbled log
+    can break its row in two), its type (EVENT_TYPES) and a payload: the
+    pump's max current for the current events, the reboot marker and
+    watchdog for a WDT reboot and the versions for a restart without
+    shutdown.
+
+    Inputs [output_events, logIn, buffer_size]:
+        Path to the event index to write, the raw log being converted and
+        the write buffer size in bytes.
+    """
+
+    def __init__(
+        self,
+        output_events: Path,
+        logIn: TextIO,
+        buffer_size: int = OUTPUT_BUFFER_SIZE,
+    ) -> None:
+        self.out = open(output_events, 'w', newline='', buffering=buffer_size)
+        self.out.write(EVENTS_HEADER)
+        # The payloads are log text, maybe with a ','
+        self._writer = csv.writer(self.out, lineterminator='\n')
+        # Only a memory-mapped log knows where its lines start
+        self._line_start = getattr(logIn, 'line_start', None)
+        self._leak = False
+        self._pumps = (0, 0, 0)  # PumpsHot, P1CurrentHigh, P2CurrentHigh
+
+    def resume(self, st: 'ParserState') -> None:
+        """
+        Carry on from a parser state reached without this writer (the lines
+        before a time window): the leak and pump changes are those since st.
+        """
+        self._leak = st.bLeak
+        self._pumps = (st.PumpsHot, st.P1CurrentHigh, st.P2CurrentHigh)
+
+    def take(self, st: 'ParserState', row: int) -> None:
+        """
+        Note the events of the log entry just parsed into st, if any.
+
+        Inputs [st, row]:
+            The parser state and the csv rows written so far.
+        """
+        tag = st.tag
+        if tag == 'RE':
+            self._add(st, row, 'coldRestart' if st.bCold else 'warmRestart')
+        elif tag == 'VE':
+            if st.bMysteryRestart:
+                self._add(st, row, 'restartWithoutShutdown', st.txt.strip())
+        elif tag == 'WD':
+            self._add(st, row, 'wdtReboot', f'{st.rbtMarker}{st.dogExpired}')
+        elif tag == 'LE':
+            if st.bLeak != self._leak:
+                self._leak = st.bLeak
+                self._add(st, row, 'leak' if st.bLeak else 'leakCleared')
+        elif tag == 'PS':
+            pumps = (st.PumpsHot, st.P1CurrentHigh, st.P2CurrentHigh)
+            if pumps != self._pumps:
+                hot, p1, p2 = pumps
+                if hot != self._pumps[0]:
+                    self._add(st, row, 'pumpsHot' if hot else 'pumpsCooled')
+                if p1 != self._pumps[1]:
+                    kind = 'p1CurrentHigh' if p1 else 'p1CurrentNormal'
+                    self._add(st, row, kind, f'{st.maxIp1:.1f}')
+                if p2 != self._pumps[2]:
+                    kind = 'p2CurrentHigh' if p2 else 'p2CurrentNormal'
+                    self._add(st, row, kind, f'{st.maxIp2:.1f}')
+                self._pumps = pumps
+        elif tag == 'PD':
+            self._add(st, row, 'powerDown')
+        elif tag == 'CL':
+            self._add(st, row, 'logClosed')
+
+    def _add(self, st: 'ParserState', row: int, kind: str, payload: str = '') -> None:
+        offset = '' if self._line_start is None else self._line_start()
+        stamp = f'{st.date} {st.time}:{st.secs}' if st.date != '' else ''
+        self._writer.writerow((stamp, st.linenum - 1, offset, row, kind, payload))
+
+    def close(self) -> None:
+        self.out.close()
+
+
+def read_events(input_events: Path) -> list[LogEvent]:
+    """
+    The events of an event index written by EventWriter.
+    """
+    with open(input_events, newline='') as f:
+        rows = csv.reader(f)
+        next(rows)  # header
+        return [
+            LogEvent(
+                stamp,
+                int(line),
+                int(offset) if offset else None,
+                int(row),
+                kind,
+                payload,
+            )
+            for stamp, line, offset, row, kind, payload in rows
+        ]
@@ -0,0 +1,299 @@
+import calendar
+import math
+import operator
+import re
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Self
+
+from .columns import COLUMN_TYPES
+from .decimate import FLAG_COLUMNS
+
+# Rows inserted per transaction: one commit per batch, not per row.
+FLEET_BATCH_ROWS: int = 50000
+
+_COLUMNS = list(COLUMN_TYPES)
+_SUPPLIES = [_COLUMNS.index(name) for name in ('ps24V', 'ps5V', 'ps3p3V')]
+_get_flags = operator.itemgetter(*(_COLUMNS.index(name) for name in FLAG_COLUMNS))
+_SAMPLE_COLUMNS = ', '.join(
+    f'{name} {"REAL" if t in "fd" else "INTEGER"}' for name, t in COLUMN_TYPES.items()
+)
+
+# The samples table holds the csv rows under the csv's column names; every
+# table is keyed by serial number and time for the fleet queries.
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    SN TEXT NOT NULL,
+    name TEXT NOT NULL,
+    converted REAL NOT NULL,
+    UNIQUE (SN, name)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    log INTEGER NOT NULL REFERENCES logs (id),
+    SN TEXT NOT NULL,
+    Time REAL NOT NULL,
+    {_SAMPLE_COLUMNS}
+);
+CREATE INDEX IF NOT EXISTS samples_SN_Time ON samples (SN, Time);
+CREATE TABLE IF NOT EXISTS events (
+    log INTEGER NOT NULL REFERENCES logs (id),
+    SN TEXT NOT NULL,
+    Time REAL NOT NULL,
+    type TEXT NOT NULL,
+    value INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_SN_Time ON events (SN, Time);
+CREATE INDEX IF NOT EXISTS events_type_Time ON events (type, Time);
+"""
+
+_INSERT_SAMPLE = (
+    f'INSERT INTO samples VALUES (?, ?, ?, {", ".join("?" * len(_COLUMNS))})'
+)
+_INSERT_EVENT = 'INSERT INTO events VALUES (?, ?, ?, ?, ?)'
+
+
+def log_serial(name: str) -> str:
+    """
+    The serial number in a log's name: 1060 for sn1060log18, '' if the name
+    isn't sn<SN>log<N>.
+    """
+    found = re.match(r'sn(.+?)log', name)
+    return found[1] if found else ''
+
+
+def fleet_writer(
+    fleetDb: str, output_csv: Path, SN: str | None = None
+) -> 'FleetWriter':
+    """
+    The FleetWriter of a conversion into output_csv: the log is named after
+    it (sn1060log18 for sn1060log18out.csv), its serial number is SN or, if
+    that isn't given, taken from that name.
+    """
+    name = output_csv.stem.removesuffix('out')
+    return FleetWriter(Path(fleetDb), SN or log_serial(name), name)
+
+
+def _volts(supply: str) -> float:
+    try:
+        return float(supply)
+    except ValueError:
+        return math.nan  # a garbled field in the log, stored as NULL
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    # The database, created if need be.  WAL lets queries run while a
+    # conversion is writing.
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.executescript(_SCHEMA)
+    return db
+
+
+def _seconds(when: datetime | None) -> float | None:
+    # A time as printed in out.csv, in seconds since 1970-01-01
+    return None if when is None else calendar.timegm(when.timetuple())
+
+
+class FleetWriter:
+    """
+    The csv rows of a conversion inserted into a SQLite fleet database
+    shared by every unit's logs, so questions across units and logs are a
+    query instead of a conversion.
+
+    Each row goes into the samples table (the csv columns, with Time in
+    seconds since 1970-01-01 as in out.csv; the supplies as numbers, NULL
+    if garbled) and each change of one of FLAG_COLUMNS into the events
+    table, with the flag's name as type and its new value.  The leading
+    edge rows of the csv are left out.  Rows are inserted FLEET_BATCH_ROWS
+    to a transaction.  A log converted again replaces what its previous
+    conversion inserted: logs are told apart by serial number and name.
+
+    Inputs [path, SN, name]:
+        The database file (created if need be), the unit's serial number
+        and the log's name, e.g. sn1060log18.
+    """
+
+    def __init__(self, path: Path, SN: str, name: str) -> None:
+        self.SN = SN
+        self._db = _connect(path)
+        try:
+            with self._db:
+                db = self._db
+                db.execute(
+                    'INSERT INTO logs (SN, name, converted) VALUES (?, ?, ?)'
+                    ' ON CONFLICT (SN, name) DO UPDATE SET converted = excluded.converted',
+                    (SN, name, time.time()),
+                )
+                (self.log,) = db.execute(
+                    'SELECT id FROM logs WHERE SN = ? AND name = ?', (SN, name)
+                ).fetchone()
+                db.execute('DELETE FROM samples WHERE log = ?', (self.log,))
+                db.execute('DELETE FROM events WHERE log = ?', (self.log,))
+        except Exception:
+            self._db.close()
+            raise
+        self._samples: list[tuple[Any, ...]] = []
+        self._events: list[tuple[Any, ...]] = []
+        self._flags: tuple[Any, ...] = (0,) * len(FLAG_COLUMNS)
+
+    def append(self, epoch: float, values: tuple[Any, ...]) -> None:
+        """
+        Add a row.
+
+        Inputs [epoch, values]:
+            The row's time in seconds since 1970-01-01 and the values of the
+            csv columns after Time.
+        """
+        row = [self.log, self.SN, epoch, *values]
+        for i in _SUPPLIES:
+            row[i + 3] = _volts(row[i + 3])
+        self._samples.append(row)
+        flags = _get_flags(values)
+        if flags != self._flags:  # bools equal their ints
+            for name, value, last in zip(FLAG_COLUMNS, flags, self._flags):
+                if value != last:
+                    self._events.append((self.log, self.SN, epoch, name, int(value)))
+            self._flags = flags
+        if len(self._samples) >= FLEET_BATCH_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Insert the rows added since the last flush, in one transaction.
+        """
+        with self._db:
+            self._db.executemany(_INSERT_SAMPLE, self._samples)
+            self._db.executemany(_INSERT_EVENT, self._events)
+        self._samples = []
+        self._events = []
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self._db.close()
+
+
+class FleetStore:
+    """
+    Queries on a fleet database written by FleetWriter.
+
+    Times are as printed in out.csv, from start on and before end; None
+    leaves that end open.  Rows come back as tuples, in time order.
+
+    Inputs [path]:
+        The database file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._db = _connect(path)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def query(self, sql: str, params: tuple[Any, ...] = ()) -> list[tuple[Any, ...]]:
+        """
+        Any other question, in SQL on the logs, samples and events tables.
+        """
+        return self._db.execute(sql, params).fetchall()
+
+    def units(self) -> list[str]:
+        """
+        The serial numbers with logs in the database.
+        """
+        return [SN for (SN,) in self.query('SELECT DISTINCT SN FROM logs ORDER BY SN')]
+
+    def logs(self, SN: str | None = None) -> list[tuple[Any, ...]]:
+        """
+        (SN, name, converted) of every log, or of one unit's.  converted is
+        when it was inserted, in seconds since 1970-01-01.
+        """
+        where, params = ('WHERE SN = ?', (SN,)) if SN is not None else ('', ())
+        return self.query(
+            f'SELECT SN, name, converted FROM logs {where} ORDER BY SN, name', params
+        )
+
+    def samples(
+        self,
+        SN: str,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        columns: tuple[str, ...] = ('fThrot', 'fInTemp', 'fOutTemp', 'fFlow'),
+    ) -> list[tuple[Any, ...]]:
+        """
+        The Time and the given csv columns of a unit's samples.
+
+        Inputs [SN, start, end, columns]:
+            The serial number, the time span and the csv columns wanted.
+        Returns [list(tuple)]:
+            (Time, *columns) per sample.
+        """
+        unknown = set(columns) - set(_COLUMNS)
+        if unknown:
+            raise ValueError(f'No such csv columns: {", ".join(sorted(unknown))}')
+        where, params = self._span('SN = ?', [SN], start, end)
+        return self.query(
+            f'SELECT Time, {", ".join(columns)} FROM samples'
+            f' WHERE {where} ORDER BY Time',
+            params,
+        )
+
+    def events(
+        self,
+        kind: str | None = None,
+        SN: str | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        value: int | None = 1,
+    ) -> list[tuple[Any, ...]]:
+        """
+        Flag changes across the fleet, e.g. events('bLeak', start=...) for
+        every leak since then.
+
+        Inputs [kind, SN, start, end, value]:
+            The flag (one of FLAG_COLUMNS, None for all), the serial number
+            (None for every unit), the time span and the new value (1 for
+            the flag going up, 0 for it clearing, None for both).
+        Returns [list(tuple)]:
+            (SN, log name, Time, type, value) per event.
+        """
+        conditions = ['1']
+        params: list[Any] = []
+        for column, wanted in (('type', kind), ('events.SN', SN), ('value', value)):
+            if wanted is not None:
+                conditions.append(f'{column} = ?')
+                params.append(wanted)
+        where, params = self._span(' AND '.join(conditions), params, start, end)
+        return self.query(
+            'SELECT events.SN, name, Time, type, value FROM events'
+            f' JOIN logs ON logs.id = events.log WHERE {where} ORDER BY Time',
+            params,
+        )
+
+    @staticmethod
+    def _span(
+        where: str, params: list[Any], start: datetime | None, end: datetime | None
+    ) -> tuple[str, tuple[Any, ...]]:
+        # Add the time span to a WHERE clause
+        for condition, when in (('Time >= ?', start), ('Time < ?', end)):
+            seconds = _seconds(when)
+            if seconds is not None:
+                where += f' AND {condition}'
+                params = [*params, seconds]
+        return where, tuple(params)
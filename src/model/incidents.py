@@ -0,0 +1,268 @@
+import bisect
+import contextlib
+import copy
+import csv
+import io
+import itertools
+import mmap
+import re
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from .compress import compression_of, log_stem
+from .engine import ConvertEngine
+from .mapped import MappedLog
+from .timeindex import build_index, convert_span, load_index
+
+INCIDENTS_HEADER: str = 'Incident,Time,Types,Lines,FirstLine,StopLine\n'
+
+# The faults looked for: WD lines, restarts the entry before which isn't a
+# power down or log close and that no WDT reboot explains by the time the
+# versions are logged (the VE line), and the LE and PS lines where a leak
+# or hot pumps start (not those where they last).
+FAULT_TYPES: tuple[str, ...] = ('wdtReboot', 'mysteryRestart', 'leak', 'pumpsHot')
+
+# Seconds of log kept before and after each fault by default.
+BEFORE_SECONDS: int = 300
+AFTER_SECONDS: int = 60
+
+
+# The lines scan_faults() looks at, found by a regex over the whole file.
+_FAULT_LINES = re.compile(rb'^(?:WD|RE|VE|LE|PS)', re.MULTILINE)
+
+
+@dataclass(slots=True, frozen=True)
+class Fault:
+    """
+    A fault found in a raw log: its line number, the byte offset of the line
+    and its type (FAULT_TYPES).
+    """
+
+    line: int
+    offset: int
+    type: str
+
+
+@dataclass(slots=True)
+class Incident:
+    """
+    One or more faults close enough that their windows overlap, and the
+    lines of the raw log around them.
+
+    time is the time of the stamp before the first fault, as out.txt prints
+    it (None before the first stamp); firstLine and stopLine the window, the
+    first line and the line after it (None for the end of the log).
+    """
+
+    time: datetime | None
+    faults: list[Fault]
+    firstLine: int
+    stopLine: int | None
+
+
+def _entry_before(log: mmap.mmap, pos: int) -> bytes:
+    # Tag of the last entry (not DT or TI stamp) before the line at pos
+    while pos > 0:
+        pos = log.rfind(b'\n', 0, pos - 1) + 1
+        tag = log[pos : pos + 2]
+        if tag != b'DT' and tag != b'TI':
+            return tag
+    return b''
+
+
+def scan_faults(input_data: Path) -> list[Fault]:
+    """
+    Find the faults in a raw log by their tags alone, without converting it:
+    a regex over the memory-mapped file picks out the few lines that can
+    log one, so even a huge log is scanned in seconds.
+
+    Inputs [input_data]:
+        Path to the raw log (plain text).
+    Returns [list(Fault)]:
+        The faults, in log order.
+    """
+    faults: list[Fault] = []
+    leak = False
+    hot = 0
+    restart = False  # a restart no power down or WDT reboot accounts for yet
+    with open(input_data, 'rb') as f:
+        if not f.seek(0, 2):
+            return faults  # an empty file can't be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as log:
+            linenum, counted = 1, 0
+            for found in _FAULT_LINES.finditer(log):
+                pos = found.start()
+                linenum += log[counted:pos].count(b'\n')
+                counted = pos
+                tag = found[0]
+                if tag == b'WD':
+                    faults.append(Fault(linenum, pos, 'wdtReboot'))
+                    restart = False
+                elif tag == b'RE':
+                    restart = _entry_before(log, pos) not in (b'PD', b'CL')
+                elif tag == b'VE':
+                    if restart:
+                        faults.append(Fault(linenum, pos, 'mysteryRestart'))
+                        restart = False
+                elif tag == b'LE':
+                    now = log[pos + 9 : pos + 10] == b'1'
+                    if now and not leak:
+                        faults.append(Fault(linenum, pos, 'leak'))
+                    leak = now
+                else:  # PS
+                    try:
+                        now = (int(log[pos + 9 : pos + 18]) >> 1) & 0x1
+                    except ValueError:
+                        now = hot  # a garbled entry
+                    if now and not hot:
+                        faults.append(Fault(linenum, pos, 'pumpsHot'))
+                    hot = now
+    return faults
+
+
+def _line_offset(input_data: Path, fault: Fault, linenum: int) -> int:
+    # Byte offset of a line at or after a fault's
+    with MappedLog(input_data, fault.offset) as logIn:
+        lines = itertools.islice(logIn.lines(), linenum - fault.line)
+        return fault.offset + sum(map(len, lines))
+
+
+def _window(
+    times: list[int], lines: list[int], linenum: int, before: int, after: int
+) -> tuple[int | None, int, int | None]:
+    # The time of the stamp before a fault and the lines from `before`
+    # seconds before it to `after` seconds after.  The stamps are walked
+    # out from the fault's own, so a clock set back elsewhere in the log
+    # doesn't matter; one set back inside the window ends it there.
+    k = bisect.bisect_right(lines, linenum) - 1
+    if k < 0:
+        if not times:
+            return None, 1, None
+        time, first, stop = times[0], 1, 0
+    else:
+        time, first, stop = times[k], k, k + 1
+        while first > 0 and time - before <= times[first - 1] <= time:
+            first -= 1
+        first = lines[first]
+    while stop < len(times) and time <= times[stop] <= time + after:
+        stop += 1
+    return time, first, lines[stop] if stop < len(lines) else None
+
+
+def find_incidents(
+    index: dict[str, Any],
+    faults: list[Fault],
+    before: int = BEFORE_SECONDS,
+    after: int = AFTER_SECONDS,
+) -> list[Incident]:
+    """
+    The windows of log around the faults, those that overlap merged.
+
+    Inputs [index, faults, before, after]:
+        The log's time index (see timeindex.build_index()), its faults as
+        scan_faults() finds them and the seconds to keep before and after
+        each one.
+    Returns [list(Incident)]:
+        The incidents, in log order.
+    """
+    times, lines = index['times'], index['lines']
+    incidents: list[Incident] = []
+    for fault in faults:
+        time, first, stop = _window(times, lines, fault.line, before, after)
+        last = incidents[-1] if incidents else None
+        if last is not None and (last.stopLine is None or first < last.stopLine):
+            last.faults.append(fault)
+            if last.stopLine is not None and (stop is None or stop > last.stopLine):
+                last.stopLine = stop
+            continue
+        when = None
+        if time is not None:
+            when = datetime.fromtimestamp(time, UTC).replace(tzinfo=None)
+        incidents.append(Incident(when, [fault], first, stop))
+    return incidents
+
+
+def extract_incidents(
+    engine: ConvertEngine,
+    input_data: Path,
+    wdir: Path | None = None,
+    before: int = BEFORE_SECONDS,
+    after: int = AFTER_SECONDS,
+    types: tuple[str, ...] = FAULT_TYPES,
+) -> tuple[Path, list[Incident]]:
+    """
+    Convert only the few minutes of a raw log around each WDT reboot,
+    restart without shutdown, leak and pump overheat, one small out.txt and
+    out.csv per incident, as the same stretch of a whole conversion reads.
+
+    The faults are found by one pass over the raw bytes that only looks at
+    the tags.  The log's time index (built and saved the first time, which
+    takes one conversion of the log without output, see
+    timeindex.build_index()) gives the lines around each fault and the
+    parser state to start each window from: the nearest checkpoint or the
+    end of the window before, whichever is nearer.  The incidents go into
+    <wdir>/<fname>incidents/ as <fname>incident01out.txt and .csv, ...,
+    listed in <fname>incidents.csv there, replacing a previous extraction.
+    The fleet database, if the engine has one, is left alone.
+
+    Inputs [engine, input_data, wdir, before, after, types]:
+        The engine with the conversion settings (its line range is replaced
+        by each window's), the raw log (plain text), the working directory
+        (defaults to the log's folder), the seconds to keep before and
+        after each fault and the faults wanted (of FAULT_TYPES).
+    Returns [tuple(Path, list(Incident))]:
+        The folder written to and the incidents, in log order.
+    """
+    if compression_of(input_data) is not None:
+        raise ValueError(f'{input_data.name}: decompress the log to extract incidents')
+    if wdir is None:
+        wdir = input_data.parent
+    fname = log_stem(input_data)
+    output_dir = wdir / f'{fname}incidents'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for old in output_dir.glob(f'{fname}incident*'):
+        old.unlink()
+    engine = copy.copy(engine)
+    engine.printIt = False
+    engine.fleetDb = None
+    index = load_index(engine, input_data)
+    if index is None:
+        index = build_index(engine, input_data)
+    faults = [fault for fault in scan_faults(input_data) if fault.type in types]
+    incidents = find_incidents(index, faults, before, after)
+    entry = None
+    summary = output_dir / f'{fname}incidents.csv'
+    with open(summary, 'w', newline='') as f:
+        f.write(INCIDENTS_HEADER)
+        writer = csv.writer(f, lineterminator='\n')
+        for n, incident in enumerate(incidents, start=1):
+            stem = f'{fname}incident{n:02d}out'
+            with contextlib.redirect_stdout(io.StringIO()):
+                state = convert_span(
+                    engine,
+                    input_data,
+                    index,
+                    (incident.firstLine, incident.stopLine),
+                    output_dir / f'{stem}.txt',
+                    output_dir / f'{stem}.csv',
+                    entry,
+                )
+            # Without the csv the state isn't all a checkpoint's would be
+            if engine.csvIt and incident.stopLine is not None and state is not None:
+                offset = _line_offset(
+                    input_data, incident.faults[-1], incident.stopLine
+                )
+                entry = (offset, state)
+            writer.writerow(
+                (
+                    n,
+                    '' if incident.time is None else incident.time,
+                    ' '.join(fault.type for fault in incident.faults),
+                    ' '.join(str(fault.line) for fault in incident.faults),
+                    incident.firstLine,
+                    '' if incident.stopLine is None else incident.stopLine,
+                )
+            )
+    return output_dir, incidents
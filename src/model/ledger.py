@@ -0,0 +1,174 @@
+import hashlib
+import json
+import math
+import time
+from pathlib import Path
+from typing import Any
+
+# The ledger lives in the log_data folder, next to the default pulls.
+LEDGER_FILE: str = 'ledger.json'
+
+# Lines at the end of the last pull that identify where it stopped.
+ANCHOR_LINES: int = 32
+
+# Bytes read from the end of the archive for its anchor, doubled until
+# they hold ANCHOR_LINES whole lines.
+TAIL_BYTES: int = 65536
+
+# Ask for this much more than the log is expected to have grown.
+GROWTH_MARGIN: float = 1.5
+
+
+def _fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _tail_lines(data: bytes, lines: int) -> bytes:
+    # The last `lines` whole lines of data.
+    start = len(data)
+    for _ in range(lines):
+        start = data.rfind(b'\n', 0, start - 1) + 1
+        if start == 0:
+            break
+    return data[start:]
+
+
+def _read_tail(path: Path, size: int, lines: int) -> bytes:
+    # The last `lines` whole lines of a file of `size` bytes, read from its
+    # end only
+    with open(path, 'rb') as f:
+        block = TAIL_BYTES
+        while True:
+            f.seek(max(size - block, 0))
+            data = f.read()
+            # One line end more than the lines wanted: the first is whole
+            if block >= size or data.count(b'\n') > lines:
+                return _tail_lines(data, lines)
+            block *= 2
+
+
+class PullLedger:
+    """
+    What has already been pulled from each HEU, kept in a json file so a
+    routine pull only has to fetch the log written since the last one.
+
+    Each serial number's entry holds the position (the size of the local
+    archive the pulls are appended to), the fingerprint and length of its
+    last ANCHOR_LINES lines, the time of the pull, the rate the log grows
+    at and the last log number.
+
+    Inputs [path]:
+        Path to the ledger json file; it is created on the first record().
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.entries: dict[str, dict[str, Any]] = {}
+        if path.exists():
+            self.entries = json.loads(path.read_text())
+
+    def save(self) -> None:
+        self.path.write_text(json.dumps(self.entries, indent=2))
+
+    def holds(self, SN: str, archive: Path) -> bool:
+        """
+        Whether a new pull can be appended to the archive: the ledger has an
+        entry for the HEU and the archive is still the size it recorded, so
+        it hasn't been deleted, replaced or edited since.
+        """
+        entry = self.entries.get(SN)
+        return (
+            entry is not None
+            and archive.exists()
+            and archive.stat().st_size == entry['position']
+        )
+
+    def megs_for(self, SN: str, megs: int, now: float | None = None) -> int:
+        """
+        How many MB to ask the HEU for to get everything new since the last
+        pull, from how fast its log has been growing.
+
+        Inputs [SN, megs, now]:
+            The serial number, the most MB to ask for (MEGS) and the time
+            (defaults to now).
+        Returns [int]:
+            MB for the `frlog` command, from 1 up to megs.
+        """
+        entry = self.entries.get(SN)
+        if entry is None or not entry.get('rate'):
+            return megs  # nothing to go on yet
+        if now is None:
+            now = time.time()
+        expected = entry['rate'] * max(now - entry['time'], 0) * GROWTH_MARGIN
+        need = expected + entry['anchorBytes']
+        return max(1, min(megs, math.ceil(need / 1048576)))
+
+    def trim(self, SN: str, pulled: Path) -> int | None:
+        """
+        Cut everything up to the end of the last pull out of a new pull, so
+        the file only holds the log written since.
+
+        Inputs [SN, pulled]:
+            The serial number and the raw log just pulled.
+        Returns [int | None]:
+            Bytes left in the file, or None if the end of the last pull is
+            not in it (too little was pulled, or it is the first pull); the
+            file is then left as it is.
+        """
+        entry = self.entries.get(SN)
+        if entry is None:
+            return None
+        data = pulled.read_bytes()
+        length = entry['anchorBytes']
+        # Newest match first: the anchor ends on a line end of the new pull
+        end = len(data)
+        while end >= length:
+            if (end - length == 0 or data[end - length - 1] == ord('\n')) and (
+                _fingerprint(data[end - length : end]) == entry['fingerprint']
+            ):
+                pulled.write_bytes(data[end:])
+                return len(data) - end
+            end = data.rfind(b'\n', 0, end - 1) + 1
+            if end == 0:
+                break
+        return None
+
+    def record(
+        self,
+        SN: str,
+        archive: Path,
+        added: int,
+        logNum: str = '',
+        now: float | None = None,
+    ) -> None:
+        """
+        Note a pull in the ledger and save it.
+
+        Inputs [SN, archive, added, logNum, now]:
+            The serial number, the archive the pull was added to, the bytes
+            it added (the whole archive for a first pull), its log number
+            and the time of the pull (defaults to now).
+        """
+        if now is None:
+            now = time.time()
+        size = archive.stat().st_size
+        entry = self.entries.get(SN)
+        if entry is not None and not added:
+            entry['time'] = now  # nothing new, the old anchor still holds
+            entry['logNum'] = logNum or entry.get('logNum', '')
+            self.save()
+            return
+        anchor = _read_tail(archive, size, ANCHOR_LINES)
+        rate = 0.0
+        if entry is not None and added < size and now > entry['time']:
+            rate = added / (now - entry['time'])
+        self.entries[SN] = {
+            'position': size,
+            'fingerprint': _fingerprint(anchor),
+            'anchorBytes': len(anchor),
+            'time': now,
+            'rate': rate,
+            'logNum': logNum,
+            'file': str(archive),
+        }
+        self.save()
@@ -0,0 +1,133 @@
+import functools
+import io
+import itertools
+import locale
+import mmap
+import operator
+from collections.abc import Iterator
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+# Bytes of the log decoded at a time, rounded to whole lines.
+DECODE_BLOCK_SIZE: int = 1024 * 1024
+
+
+class MappedLog:
+    """
+    A raw log file memory-mapped for reading, so the OS page cache does the
+    I/O and nothing is copied through a read buffer first.
+
+    readline() hands out str lines exactly as open(input_data, 'r') would
+    (same encoding, '\\r\\n' and '\\r' line ends read as '\\n'), decoding a
+    block of whole lines at a time, for the engine.  lines() iterates the
+    raw bytes for scans that only look at tags and fixed-width columns and
+    never need the text.  tell() and seek() are plain byte offsets.
+
+    Inputs [input_data, start, end]:
+        Path to the raw log and the byte range to read, which must start
+        and end on line boundaries (end None for the end of the file).
+    """
+
+    def __init__(
+        self, input_data: Path, start: int = 0, end: int | None = None
+    ) -> None:
+        self._encoding = locale.getpreferredencoding(False)
+        self._file = open(input_data, 'rb')
+        size = self._file.seek(0, 2)
+        self._map: mmap.mmap | bytes = b''
+        if size:  # an empty file can't be mapped
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._start = start
+        self._end = size if end is None else min(end, size)
+        self.seek(start)
+
+    def _blocks(self, pos: int) -> Iterator[Iterator[str]]:
+        # The lines of each block, remembering where the block lies in the
+        # file and its raw lines if the line ends were translated, for tell().
+        while pos < self._end:
+            stop = self._map.rfind(b'\n', pos, min(pos + DECODE_BLOCK_SIZE, self._end))
+            if stop < 0:  # a very long line
+                stop = self._map.find(b'\n', pos, self._end)
+            stop = self._end if stop < 0 else stop + 1
+            data = self._map[pos:stop]
+            if b'\r' in data:
+                self._raw = data.splitlines(keepends=True)  # at \n, \r\n and \r
+                self._lines = [
+                    line.decode(self._encoding).rstrip('\r\n') + '\n'
+                    if line[-1:] in b'\r\n'
+                    else line.decode(self._encoding)
+                    for line in self._raw
+                ]
+            else:
+                self._raw = None
+                self._lines = io.StringIO(data.decode(self._encoding)).readlines()
+            self._block = (pos, stop)
+            self._next = iter(self._lines)
+            yield self._next
+            pos = stop
+
+    def lines(self) -> Iterator[bytes]:
+        """
+        The raw lines of the range as bytes, '\\n' ends included, whatever
+        readline() has read.
+        """
+        pos = self._start
+        while pos < self._end:
+            stop = self._map.find(b'\n', pos, self._end)
+            stop = self._end if stop < 0 else stop + 1
+            yield self._map[pos:stop]
+            pos = stop
+
+    def tell(self) -> int:
+        """
+        Byte offset of the next line readline() returns.
+        """
+        return self._offset(len(self._lines) - operator.length_hint(self._next))
+
+    def line_start(self) -> int:
+        """
+        Byte offset of the line readline() returned last.
+        """
+        return self._offset(len(self._lines) - operator.length_hint(self._next) - 1)
+
+    def _offset(self, read: int) -> int:
+        # Byte offset of the line after the first `read` lines of the block
+        start, stop = self._block
+        if read == len(self._lines):
+            return stop
+        if self._raw is not None:
+            return start + sum(map(len, self._raw[:read]))
+        return start + len(''.join(self._lines[:read]).encode(self._encoding))
+
+    def seek(self, offset: int) -> int:
+        """
+        Carry on reading at this byte offset, which must be a line start.
+        """
+        self._raw: list[bytes] | None = None
+        self._lines: list[str] = []
+        self._block = (offset, offset)
+        self._next: Iterator[str] = iter(self._lines)
+        # A C-level call per line: the engine calls readline() for every line
+        self.readline = functools.partial(
+            next, itertools.chain.from_iterable(self._blocks(offset)), ''
+        )
+        return offset
+
+    def close(self) -> None:
+        try:
+            if isinstance(self._map, mmap.mmap):
+                self._map.close()
+        finally:
+            self._file.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
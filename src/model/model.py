@@ -1,6 +1,6 @@
-import math
-from datetime import datetime, timedelta
+import shutil
 from pathlib import Path
+from typing import TextIO
 
 from PySide6.QtCore import QObject, QThreadPool, Signal
 from serial import Serial
@@ -8,6 +8,13 @@ from serial import Serial
 import helpers.constants as C
 import helpers.helpers as h
 
+from .cache import ConversionCache
+from .compress import compressed_path, open_output
+from .download import LogReceiver, receive_log
+from .engine import ConvertEngine, output_paths
+from .ledger import LEDGER_FILE, PullLedger
+from .pipeline import pull_and_convert
+from .snapshot import convert_resumable
 from .worker import Worker
 
 
@@ -38,6 +45,20 @@ class Model(QObject):
         self.wdir: Path = self._get_log_data_dir()  # default to log_data dir
         self.printIt: bool = False  # QCheckbox in gui
         self.csvIt: bool = True  # QCheckbox in gui
+        self.npzIt: bool = False  # csv columns also as <fname>out.npz
+        self.sparseIt: bool = False  # csv changes also as <fname>out.sparse.csv
+        self.decimateIt: bool = False  # csv min/max per 1 s/10 s/1 min too
+        self.eventsIt: bool = False  # incidents also indexed in <fname>out.events.csv
+        # out.txt/out.csv and pulled logs written compressed: None, 'gz' or 'zst'
+        self.compression: str | None = C.COMPRESSION or None
+        self.vectorIt: bool = False  # FL/TM/DB/TH lines a block at a time (numpy)
+        # csv rows and flag changes also into this SQLite database (None for none)
+        self.fleetDb: str | None = C.FLEET_DB or None
+        self.convertIt: bool = False  # QCheckbox in gui, convert while pulling
+        self.pullNew: bool = False  # QCheckbox in gui, only what's new per the ledger
+        self.cache = ConversionCache(
+            Path(C.CACHE_DIR) if C.CACHE_DIR else None, C.CACHE_MB * 1048576
+        )
         self.threadpool = QThreadPool()
 
         self.fname: str
@@ -56,15 +77,18 @@ class Model(QObject):
         return log_data_dir
 
     def _make_output_dir(self) -> None:
-        self.output_dir = self.wdir / Path(self.fname + 'out')
+        self.output_dir, _, _ = output_paths(self.wdir, self.fname)
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
     def _make_output_files(self) -> None:
-        self.output_txt = self.output_dir / Path(self.fname + 'out.txt')
-        self.output_csv = self.output_dir / Path(self.fname + 'out.csv')
-        self.output_txt.touch()
-        if self.csvIt:
-            self.output_csv.touch()
+        _, self.output_txt, self.output_csv = output_paths(self.wdir, self.fname)
+        # Only create them: touching existing outputs would look like a change
+        output_txt = compressed_path(self.output_txt, self.compression)
+        output_csv = compressed_path(self.output_csv, self.compression)
+        if not output_txt.exists():
+            output_txt.touch()
+        if self.csvIt and not output_csv.exists():
+            output_csv.touch()
 
     def serial_connect(self, com_port: str) -> None:
         try:
@@ -96,29 +120,17 @@ class Model(QObject):
                 self.not_connected_sig.emit('No Serial Connection')
                 return
             output_path = self.wdir / f'{self.fname}.txt'
-            with open(output_path, 'w') as logOut:
-                self.ser.write(f'frlog977{self.megs:04.0f}\n'.encode())
-                reply = self.ser.readlines(1048576 * self.megs)
-                ambleState = 0  # 0==printable preamble: command echo, file size.
-                for lines in reply:
-                    readstr = str(lines.decode('utf-8'))
-                    if ambleState < 2 and readstr[0:6] == 'Serial':
-                        SN = readstr[14:18]
-                        # Check that user input SN is the same as SN in HEU
-                        if SN != self.SN:
-                            self.SN = SN
-                    if readstr == '<\n':
-                        ambleState = 1  # guts, first line
-                    if readstr == '>\n':
-                        ambleState = 3  # postamble, first line
-                    if ambleState == 2:  # guts, the rest
-                        logOut.writelines(readstr)
-                        if self.printIt:
-                            print(readstr)
-                    if ambleState == 1:
-                        ambleState += 1
-                    if ambleState == 3:
-                        ambleState += 1
+            if self.pullNew:
+                receiver = self._pull_new(output_path)
+            else:
+                receiver = self._pull(
+                    compressed_path(output_path, self.compression),
+                    self.megs,
+                    self.convertIt,
+                )
+            # Check that user input SN is the same as SN in HEU
+            if receiver.SN and receiver.SN != self.SN:
+                self.SN = receiver.SN
 
             success_flag = True
         except Exception as e:
@@ -127,671 +139,106 @@ class Model(QObject):
         finally:
             self.commandIt_worker_finished_sig.emit(success_flag)
 
+    def _pull(self, output_path: Path, megs: int, convertIt: bool) -> LogReceiver:
+        # Pull the latest `megs` MB of the log into output_path, compressed
+        # if it is a .txt.gz or .txt.zst
+        with open_output(output_path) as logOut:
+            self.ser.write(f'frlog977{megs:04.0f}\n'.encode())
+            if convertIt:
+                return self._pull_and_convert(logOut, megs)
+            return receive_log(self.ser, logOut, megs, self.printIt)
+
+    def _pull_and_convert(self, logOut: TextIO, megs: int) -> LogReceiver:
+        # Convert the log into <fname>out/ while it downloads
+        self._make_output_dir()
+        self._make_output_files()
+        receiver, error = pull_and_convert(
+            self.ser,
+            logOut,
+            megs,
+            self._make_engine(),
+            self.output_txt,
+            self.output_csv,
+            self.printIt,
+        )
+        if error is not None:
+            self.convertLog_failed_sig.emit(str(error))
+        return receiver
+
+    def _pull_new(self, output_path: Path) -> LogReceiver:
+        # Pull only the log written since the last pull from this HEU,
+        # going by the ledger, append it to the archive in output_path and
+        # convert the archive afterwards if asked to.  The pull goes to a
+        # file of its own first, to be cut down to what the archive lacks.
+        ledger = PullLedger(self._get_log_data_dir() / LEDGER_FILE)
+        megs = self.megs
+        if ledger.holds(self.SN, output_path):
+            megs = ledger.megs_for(self.SN, self.megs)
+        pulled = output_path.with_name(output_path.name + '.pull')
+        try:
+            while True:
+                receiver = self._pull(pulled, megs, convertIt=False)
+                SN = receiver.SN or self.SN
+                if not ledger.holds(SN, output_path):
+                    if megs < self.megs:
+                        megs = self.megs  # no archive to add to: start one whole
+                        continue
+                    added = pulled.stat().st_size
+                    pulled.replace(output_path)  # the first pull is the archive
+                    break
+                if ledger.trim(SN, pulled) is not None or megs >= self.megs:
+                    # If the archive's end still isn't in the pull, all of it
+                    # is new: more was logged than MEGS holds
+                    added = pulled.stat().st_size
+                    with open(output_path, 'ab') as archive, open(pulled, 'rb') as f:
+                        shutil.copyfileobj(f, archive)
+                    break
+                megs = min(self.megs, megs * 2)  # more new log than expected
+        finally:
+            pulled.unlink(missing_ok=True)
+        ledger.record(SN, output_path, added, self.logNum)
+        if self.convertIt:
+            self._make_output_dir()
+            self._make_output_files()
+            try:
+                # Only the lines appended need converting
+                convert_resumable(
+                    self._make_engine(SN), output_path, self.output_txt, self.output_csv
+                )
+            except Exception as e:
+                self.convertLog_failed_sig.emit(str(e))
+        return receiver
+
+    def _make_engine(self, SN: str = '') -> ConvertEngine:
+        # SN: the serial number the HEU just reported, if it did; the fleet
+        # database files the log under it, else under the SN entered
+        return ConvertEngine(
+            logVersion=self.logVersion,
+            timeZoneOffset=self.timeZoneOffset,
+            dateLineOffset=self.dateLineOffset,
+            mute=self.mute,
+            startLine=self.startLine,
+            endLine=self.endLine,
+            printIt=self.printIt,
+            csvIt=self.csvIt,
+            npzIt=self.npzIt,
+            sparseIt=self.sparseIt,
+            decimateIt=self.decimateIt,
+            compression=self.compression,
+            vectorIt=self.vectorIt,
+            fleetDb=self.fleetDb,
+            fleetSN=SN or self.SN or None,
+            eventsIt=self.eventsIt,
+        )
+
     def _convertLog(self, input_data: Path, output_txt: Path, output_csv: Path) -> None:
         success_flag: bool = False
         try:
-            date = '<none>'  # Latest read
-            startDate = ''  # first date in log
-            endDate = ''  # last date in log
-            lastDate = ''  # for detecting change of date
-            # newDate = False #is this is a known new date?
-
-            time = '<none>'
-            startTime = ''
-            endTime = ''
-            lastTime = ''
-            newTime = False
-
-            secs = '<none>'
-            startSecs = ''
-            endSecs = ''
-            lastSecs = ''
-            newSecs = False
-
-            linenum = 0
-            numThings = 0
-
-            # Components of pump states, stored to detect changes:
-            lastPumpsOn = -1
-            lastPumpsHTshutdown = -1
-            lastPumpSelection = -1
-            lastPumpsShutdown = -1
-            lastP1CurrentHigh = -1.0
-            lastP2CurrentHigh = -1.0
-            lastMaxIp1 = -1.0
-            lastMaxIp2 = -1.0
-            tag = ''
-            date = ''
-            time = ''
-            secs = ''
-
-            # State vars for .csv file writing
-            Pon = 0
-            PumpsHot = 0
-            ePumpSelection = 0
-            PumpsShutdown = 0
-            P1CurrentHigh = 0
-            P2CurrentHigh = 0
-            maxIp1 = 0.0
-            maxIp2 = 0.0
-            fThrot = 0.0
-            fInTemp = 0.0
-            fOutTemp = 0.0
-            fFlow = 0.0
-            bIntOn = False
-            bRestart = False
-            bCold = False
-            bPowerdown = False
-            bLogClosed = False
-            bLeak = False
-            fMinFlow = 0.0
-            iMaxTemp = 0
-            iDissWatts = 0
-            iCmds = 0
-            iQrys = 0
-            iTouches = 0
-            ps24V = ' 0.00'
-            ps5V = ' 0.00'
-            ps3p3V = ' 0.00'
-            iCpuTemp = 0
-            iGlitch0 = 0
-            iGlitch1 = 0
-            iGlitch2 = 0
-            rbtMarker = 0
-            dogExpired = 0
-            bWDTreboot = 0
-            bMysteryRestart = 0
-
-            gotIt = False
-            txt = ''
-
-            # Parse and convert this non-timestamp log entry, recording in logOut.
-            def parseLogEntries(logLine) -> None:
-                # global logIn, logOut, csvOut
-                # global printIt, csvIt
-                nonlocal tag, date, time, secs, gotIt, txt
-
-                # for detecting pump state changes
-                nonlocal \
-                    lastPumpsOn, \
-                    lastPumpsHTshutdown, \
-                    lastPumpSelection, \
-                    lastPumpsShutdown
-                nonlocal lastP1CurrentHigh, lastP2CurrentHigh, lastMaxIp1, lastMaxIp2
-
-                # State variables for csv printing
-                nonlocal \
-                    Pon, \
-                    PumpsHot, \
-                    ePumpSelection, \
-                    PumpsShutdown, \
-                    P1CurrentHigh, \
-                    P2CurrentHigh, \
-                    maxIp1, \
-                    maxIp2
-                nonlocal \
-                    fThrot, \
-                    fInTemp, \
-                    fOutTemp, \
-                    fFlow, \
-                    bIntOn, \
-                    bRestart, \
-                    bCold, \
-                    bPowerdown, \
-                    bLogClosed, \
-                    bLeak
-                nonlocal \
-                    fMinFlow, \
-                    iMaxTemp, \
-                    iDissWatts, \
-                    iCmds, \
-                    iQrys, \
-                    iTouches, \
-                    ps24V, \
-                    ps5V, \
-                    ps3p3V, \
-                    iCpuTemp, \
-                    iGlitch0, \
-                    iGlitch1, \
-                    iGlitch2
-                nonlocal rbtMarker, dogExpired, bWDTreboot, bMysteryRestart
-
-                gotIt = False  # Did this line parse?
-                txt = ''
-                fluidSpecificHeat = 1796.0
-
-                with open(output_txt, 'a') as logOut:
-                    if (
-                        tag == 'PS'
-                    ):  # Pump states.  Many combined things packed in 24b / 8 decimal digits.
-                        secs = logLine[3:8]
-                        gotIt = True
-                        pStates = int(logLine[9:18])  # number conversion
-                        #  unsigned combined = (unsigned)pumpsOn&0x1;            //bit0
-                        Pon = pStates & 0x1
-                        if Pon != lastPumpsOn:
-                            lastPumpsOn = Pon
-                            if Pon == 1:
-                                txt = 'Pumps On                   '
-                            else:
-                                txt = 'Pumps Off                  '
-                            if self.printIt:
-                                print(
-                                    txt, f'{date} {time}:{secs}'
-                                )  # ...28 charactors allowed...
-                            logOut.write(txt + f' {date} {time}:{secs}\n')
-                        #  combined |= ((unsigned)pumpsHighTempShutdown&0x1)<<1; //bit1
-                        PumpsHot = (pStates >> 1) & 0x1
-                        if PumpsHot != lastPumpsHTshutdown:
-                            lastPumpsHTshutdown = PumpsHot
-                            if PumpsHot == 1:
-                                txt = 'PUMPS HOT, shut down!      '
-                            else:
-                                txt = 'Pumps not hot.             '
-                            if self.printIt:
-                                print(txt, f'{date} {time}:{secs}')
-                            logOut.write(txt + f' {date} {time}:{secs}\n')
-                        #  combined |= ((unsigned)pumpSelection&0x3)<<2;         //bit2, bit3
-                        ePumpSelection = (pStates >> 2) & 0x3
-                        if ePumpSelection != lastPumpSelection:
-                            lastPumpSelection = ePumpSelection
-                            if ePumpSelection == 0:
-                                txt = 'BOTH PUMPS DISABLED!?      '
-                            elif ePumpSelection == 1:
-                                txt = 'P.1 Enabled, P.2 DISABLED  '
-                            elif ePumpSelection == 2:
-                                txt = 'P.1 DISABLED, P.2 Enabled  '
-                            elif ePumpSelection == 3:
-                                txt = 'Both pumps enabled.        '
-                            if self.printIt:
-                                print(txt, f'{date} {time}:{secs}')
-                            logOut.write(txt + f' {date} {time}:{secs}\n')
-                        #  combined |= ((unsigned)pumpShutdownOverride&0x1)<<4;  //bit4
-                        PumpsShutdown = (pStates >> 4) & 0x1
-                        if PumpsShutdown != lastPumpsShutdown:
-                            lastPumpsShutdown = PumpsShutdown
-                            if PumpsShutdown == 1:
-                                txt = 'Pumps shutting down        '
-                            else:
-                                txt = 'Pumps running              '
-                            if self.printIt:
-                                print(txt, f'{date} {time}:{secs}')
-                            logOut.write(txt + f' {date} {time}:{secs}\n')
-                        #  combined |= ((unsigned)p1CurrentHigh&0x1)<<5;         //bit5
-                        P1CurrentHigh = (pStates >> 5) & 0x1
-                        if P1CurrentHigh != lastP1CurrentHigh:
-                            lastP1CurrentHigh = P1CurrentHigh
-                            if P1CurrentHigh == 1:
-                                txt = 'Pump 1 CURRENT HIGH        '
-                            else:
-                                txt = 'Pump 1 current normal.     '
-                            if self.printIt:
-                                print(txt, f'{date} {time}:{secs}')
-                            logOut.write(txt + f' {date} {time}:{secs}\n')
-                        #  combined |= ((unsigned)p2CurrentHigh&0x1)<<6;         //bit6
-                        P2CurrentHigh = (pStates >> 6) & 0x1
-                        if P2CurrentHigh != lastP2CurrentHigh:
-                            lastP2CurrentHigh = P2CurrentHigh
-                            if P2CurrentHigh == 1:
-                                txt = 'Pump 2 CURRENT HIGH        '
-                            else:
-                                txt = 'Pump 2 current normal.     '
-                            if self.printIt:
-                                print(txt, f'{date} {time}:{secs}')
-                            logOut.write(txt + f' {date} {time}:{secs}\n')
-                        #  combined |= ((unsigned)maxIp1<<7);                    //bits 7-14
-                        maxIp1 = float((pStates >> 7) & 0xFF) / 10.0
-                        if maxIp1 != lastMaxIp1:
-                            lastMaxIp1 = maxIp1
-                            if self.printIt:
-                                print(
-                                    f'Max pump 1 current {maxIp1:4.1f} A   {date} {time}{secs}'
-                                )
-                            logOut.write(
-                                f'Max pump 1 current {maxIp1:4.1f} A   {date} {time}:{secs}\n'
-                            )
-                        #  combined |= ((unsigned)maxIp2<<15);                   //bits 15-22
-                        maxIp2 = float((pStates >> 15) & 0xFF) / 10.0
-                        if maxIp2 != lastMaxIp2:
-                            lastMaxIp2 = maxIp2
-                            if self.printIt:
-                                print(
-                                    f'Max pump 2 current {maxIp2:4.1f} A   {date} {time}{secs}'
-                                )
-                            logOut.write(
-                                f'Max pump 2 current {maxIp2:4.1f} A   {date} {time}:{secs}\n'
-                            )
-                        # txt = f'(PS:{pStates:8d})              '
-                        txt = ''
-                        # bits 23-25 SPARE in 8 digits
-                        ### end tag=='PS' #####################################################################################
-                    if tag == 'TH':  # Pump Throttle change.
-                        gotIt = True
-                        throt = logLine[9:15]
-                        fThrot = float(throt)
-                        txt = f'Throttle: {fThrot:5.3f}            '
-                    if tag == 'TM':  # Temperature(s) changed.
-                        gotIt = True
-                        if self.logVersion == 1:
-                            inTemp = logLine[9:13]
-                            outTemp = logLine[13:18]
-                            fInTemp = float(inTemp)
-                            fOutTemp = float(outTemp)
-                            txt = f'Inlet:{fInTemp:4.1f} C, Outlet:{fOutTemp:4.1f} C'
-                        else:
-                            inTemp = logLine[9:14]
-                            outTemp = logLine[14:20]
-                            fInTemp = float(inTemp)
-                            fOutTemp = float(outTemp)
-                            txt = f'Inlet:{fInTemp:5.2f}C, Outlet:{fOutTemp:5.2f}C'
-                        iDissWatts = int(
-                            fFlow / 60.0 * (fInTemp - fOutTemp) * fluidSpecificHeat
-                        )
-                        if self.mute == 1:
-                            txt = ''
-                    if tag == 'FL':  # Flow rate changed.
-                        gotIt = True
-                        flow = logLine[9:14]
-                        fFlow = float(flow)
-                        txt = f'Flow rate: {fFlow:5.2f} l/min     '
-                        iDissWatts = int(
-                            fFlow / 60.0 * (fInTemp - fOutTemp) * fluidSpecificHeat
-                        )
-                        if self.mute == 1:
-                            txt = ''
-                    if tag == 'PR':  # Print of log.
-                        gotIt = True
-                        txt = 'Log File Read              '
-                    if tag == 'IN':  # Interlock On/Off.
-                        gotIt = True
-                        intOn = logLine[9:10]
-                        bIntOn = bool(int(intOn))
-                        if bIntOn:
-                            txt = 'Interlock On               '
-                        else:
-                            txt = 'Interlock Off              '
-                    bRestart = False  # bRestart is only true for one tag's duration.
-                    bCold = False  # bCold is only true for one tag's duration.
-                    if tag == 'RE':  # Restart
-                        bRestart = True
-                        if linenum != 0:  # not a blank log prior to this
-                            bMysteryRestart = (
-                                bPowerdown is False
-                            )  # We should have had a logged shutdown before this.  Why?  WDT?
-                        bWDTreboot = 0  # Will be set with another tag soon if it is a WDT reboot.
-                        gotIt = True
-                        cold = logLine[9:10]
-                        if cold == 'C':
-                            bCold = True
-                            txt = '\nCOLD RESTART               '  # From power-down or hard reset.
-                        else:
-                            txt = '\nWARM RESTART               '  # From brownout.
-                        lastPumpsOn = -1
-                        lastPumpsHTshutdown = -1
-                        lastPumpSelection = -1
-                        lastPumpsShutdown = -1
-                        lastP1CurrentHigh = -1.0
-                        lastP2CurrentHigh = -1.0
-                        lastMaxIp1 = -1.0
-                        lastMaxIp2 = -1.0
-
-                    bPowerdown = False
-                    if tag == 'PD':  # Power going down (voltage<min).
-                        bPowerdown = True
-                        gotIt = True
-                        txt = 'POWER GOING DOWN           '
-                    bLogClosed = False  # Log bool is only true for one tag's duration.
-                    if tag == 'CL':  # Close of log.
-                        bLogClosed = True
-                        bPowerdown = True  # COULD BE A SOFTWARE RELOAD WITH "RELOD" COMMAND, NOTE?
-                        gotIt = True
-                        txt = 'LOG CLOSED.                '
-                    if tag == 'LE':  # Leak detected?
-                        gotIt = True
-                        leak = logLine[9:10]
-                        bLeak = bool(int(leak))
-                        if bLeak:
-                            txt = 'LEAK detected              '
-                        else:
-                            txt = 'No leak                    '
-                    if tag == 'MF':  # Minimum (interlock) flow rate setting
-                        gotIt = True
-                        minFlow = logLine[9:14]
-                        fMinFlow = float(minFlow)
-                        txt = f'Min flow lim set:{fMinFlow:5.2f} l/m '
-                    if tag == 'MT':  # Minimum (interlock) temp rate setting
-                        gotIt = True
-                        maxTemp = logLine[9:11]
-                        iMaxTemp = int(maxTemp)
-                        txt = f'Max temp limit set:{iMaxTemp:2d} C    '
-                    if tag == 'VE':  # Version numbers
-                        gotIt = True
-                        th = logLine[9:11]
-                        ts = logLine[12:14]
-                        txt = f'Hardware V{th}, Software V{ts} '  # NOTE: does not sucessfuly produce ints, just strings.
-                        # txt = f'Hardware V{hV:2d}, Software V{sV:2d} '
-                        # Now determine and print if the unit rebooted without a shutdown or WDT reboot message:
-                        if bMysteryRestart:  # Restart without reason!
-                            logOut.write(
-                                f'Restart without Shutdown!   {date} {time}:{secs}\n'
-                            )  # Extra log entry
-                    if tag == 'DW':  # Dissipated Power, Watts.
-                        gotIt = True
-                        # dWatts = logLine[9:13]
-                        # iDissWatts = int(dWatts)   #logged power, but ignore it as it's behind the values it's created from,
-                        # and just adds double entries.
-                        # iDissWatts = int(fFlow/60.*(fInTemp-fOutTemp)*fluidSpecificHeat)
-                        # txt = f'Dissipated Power:{iDissWatts:4d} W    '
-                        txt = ''  # kill this anyway, it's a duplicate.
-                    if (
-                        tag == 'IF'
-                    ):  # New valid commands and queries received over the HEU interface(s)
-                        gotIt = True
-                        cmds = logLine[9:20]
-                        iCmds += int(cmds)
-                        qrys = logLine[20:31]
-                        iQrys += int(qrys)
-                        txt = f'Cmds:{iCmds:11d} Qrys:{iQrys:11d}'
-                        # txt = '' #IGNORE
-                    if tag == 'TU':  # New screen touches
-                        gotIt = True
-                        touches = logLine[9:20]
-                        iTouches += int(touches)
-                        txt = f'Touches:{iTouches:11d}'
-                    if tag == 'SV':  # (power) Supply Voltages.
-                        gotIt = True
-                        ps24V = logLine[9:14]  # 5 of 5 chars
-                        ps5V = logLine[16:20]  # 4 of 5 chars
-                        ps3p3V = logLine[22:26]  # 4 of 5 chars
-                        # fPs24V = float(ps24V)
-                        # fPs5V  = float(ps5V)
-                        # fPs3p3V = float(ps3p3V)
-                        txt = '24V:' + ps24V + ' 5V:' + ps5V + ' 3.3V:' + ps3p3V
-                    if tag == 'CT':  # CPU temperature
-                        gotIt = True
-                        cpuTemp = logLine[9:13]
-                        iCpuTemp = float(cpuTemp)
-                        txt = f'CPU temperature: {iCpuTemp:4.1f} C    '
-                    # "DB:%05.2f %03d %03d %03d\n", secondz(), fmGlitches0%1000,fmGlitches1%1000,fmGlitches2%1000);
-                    if (
-                        tag == 'DB'
-                    ):  # Debug print: three counters, 000-999, or any three charactor strings
-                        gotIt = True
-                        # print (logLine)
-                        glitch0 = logLine[9:12]  # 000 000 000\n
-                        glitch1 = logLine[13:16]
-                        glitch2 = logLine[17:20]
-                        iGlitch0 = int(glitch0)
-                        iGlitch1 = int(glitch1)
-                        iGlitch2 = int(glitch2)
-                        txt = f'Debug 0:{iGlitch0:03d} 1:{iGlitch1:03d} 2:{iGlitch2:03d}    '
-                        # txt = 'Debug 0:'+glitch0+'  1:'+glitch1+'  2:'+glitch2+'  '
-                        # txt = ''
-                    if tag == 'WD':  # WDT reboot: type?
-                        # "WD:%05.2f %1d %1d\n", secondz(), rebootMarker, dog3.expired());
-                        gotIt = True
-                        rbtMarker = logLine[9:11]
-                        dogExpired = logLine[11:12]
-                        # txt = f'WDT reboot: {rbtMarker:1d} {dogExpired:1d} '
-                        txt = 'WDT reboot:' + rbtMarker + dogExpired
-                        bWDTreboot = 1
-                        bMysteryRestart = False  # Aah.  That's why.
-                    # Now print that        :
-                    if gotIt is False and logLine != '\n' and logLine != '':
-                        txt = f'Unrecognizable tag: {logLine}'
-                        if self.printIt:  # Comment out for verbose run
-                            print(f'Line {linenum} ' + txt)
-                    else:
-                        if (self.mute == 0) & (txt != ''):
-                            if self.printIt:
-                                print(txt, f'{date} {time}{lastSecs}')
-                            logOut.write(txt + f' {date} {time}:{secs}\n')
-                        # if csvIt:
-                        #    csvOut.write('')
-                    # end parseLogEntries
-
-            if self.csvIt:  # Open the csv file and write the headers
-                # Write the HEADER line with the column names         #248 characters!
-                with open(output_csv, 'w') as csvOut:
-                    csvOut.write('Time,')
-                    csvOut.write(
-                        'Pon,PumpsHot,ePumpSelection,PumpsShutdown,P1CurrentHigh,P2CurrentHigh,maxIp1,maxIp2,'
-                    )
-                    csvOut.write(
-                        'fThrot,fInTemp,fOutTemp,fFlow,bIntOn,bRestart,bCold,bPowerdown,bLogClosed,bLeak,fMinFlow,'
-                    )
-                    # csvOut.write('iMaxTemp,iDissWatts,newCmds,newQrys,ps24V,ps5V,ps3p3V,iCpuTemp,Glitch0,Glitch1,Glitch2,')
-                    csvOut.write(
-                        'iMaxTemp,iDissWatts,newCmds,newQrys,newTouches,ps24V,ps5V,ps3p3V,iCpuTemp,iGlitch0,iGlitch1,iGlitch2,'
-                    )
-                    csvOut.write('bWDTreboot,bMysteryRestart\n')
-
-            # Scan from start, find location of start time/date,
-            #  danger: If TI is first, use Date from DT (-1 if midnight) and time from TI.
-            #  specified start doesn't exist? Complain, restart.
-            # Convert each line.
-            # Continue forward, end when desired stop time is reached.
-            linenum = 0
-            extraLines = 0
-            csvLine = ''
-            lastDateDup = ''
-            # lastTimeDup = ''
-            # lastSecsDup = ''
-            fSecs = 0.0
-            # fSecsPrev = 0.
-            fTimeSecs = 0.0
-            previousDT = datetime.strptime('01/01/00', '%m/%d/%y')
-
-            ## Open the file only once
-            with open(input_data, 'r') as logIn:
-                linenum = 1  # Start line number at 1
-
-                # Loop 1: Move to start line by reading and discarding lines
-                while linenum < self.startLine:
-                    logLine = logIn.readline()
-                    if not logLine:  # Check for end-of-file (shouldn't happen here if startLine is valid)
-                        print(
-                            f'Error: Reached end of file at line {linenum} before start line {self.startLine}'
-                        )
-                        return  # Or break, or handle the error
-                    linenum += 1
-
-                # Loop 2: Scan log lines from self.startLine up to (but not including) self.endLine
-                while linenum < self.endLine:
-                    logLine = logIn.readline()
-
-                    # Check for end-of-file *within* the desired scan range
-                    if not logLine:
-                        print(f'End of file reached at line {linenum}. Stopping scan.')
-                        break
-
-                    # IMPORTANT: Only increment linenum *after* successfully reading a line
-                    linenum += 1
-                    gotStamp = False
-                    # Extract date and time stamps, combine.
-                    tag = logLine[:2]
-                    # gotBAD = False
-
-                    if tag == 'DT':  # Update MM/DD/YY HH:MM:SS
-                        dateQ = logLine[3:6]
-                        if dateQ != 'BAD':
-                            date = logLine[3:11]
-                            # gotBAD = True
-                            # print('!')
-                        # else:  # unchanged from previous?  23 times out of 24...
-                        # date = logLine[3:8]     #BAD 1 or BAD 2
-                        time = logLine[12:17]
-                        # print (time)
-
-                        timeDT = datetime.strptime(time, '%H:%M')
-                        # print(timeDT.hour, timeDT.minute)
-                        dateDT = datetime.strptime(date, '%m/%d/%y')
-                        if timeDT.hour == 0:
-                            if dateDT.day == previousDT.day:
-                                # increment date by one day!
-                                dateDT += timedelta(days=1)
-                        if dateDT < previousDT:
-                            dateDT = previousDT  # REPLACE with later, previous date!
-                        # print(dateDT.month, dateDT.day , dateDT.year, timeDT.hour)
-                        day: int | None = None
-                        month: int | None = None
-                        year: int | None = None
-                        if (
-                            self.timeZoneOffset != 0
-                        ):  # Add time zone offset:  >REWRITE ALL TO USE DATETIME<
-                            hour = int(time[0:2]) + self.timeZoneOffset
-                            minute = int(time[3:5])
-                            day = int(date[3:5])
-                            month = int(date[0:2])
-                            year = int(date[6:8])
-                            if hour > 23:  # positive shift in date
-                                hour -= 24
-                                day += 1  # FAIL AT MONTH BOUNDARY!
-                            else:
-                                if hour < 0:  # negative shift in date
-                                    hour += 24
-                                    day -= 1  # FAIL AT MONTH BOUNDARY!
-                            time = f'{hour:02d}:{minute:02d}'  # re-form the time& date strings.
-                        if self.dateLineOffset != 0 or self.timeZoneOffset != 0:
-                            if day and month and year:
-                                day += self.dateLineOffset  # FAIL AT MONTH BOUNDARY!
-                                date = f'{month:02d}/{day:02d}/{year:02d}'
-
-                        secs = logLine[18:23]
-                        if startDate == '':
-                            startDate = date
-                        endDate = date
-                        if time != '':
-                            newTime = True
-                            if startTime == '':
-                                startTime = time
-                                endTime = time
-                        if secs != '':
-                            lastSecs = secs
-                            if startSecs == '':
-                                startSecs = secs
-                                if (
-                                    self.mute == 0
-                                ):  # This line isn't in the .csv file in any case:
-                                    print('\nStart:', startDate, startTime, startSecs)
-                            endSecs = secs
-                            newSecs = True
-                        gotStamp = True  # This log line is a time stamp?
-                        previousDT = dateDT  # Remember properly sequential date
-
-                    # Update H:M  (always preceeds another log entry, which has seconds)
-                    if tag == 'TI':
-                        time = logLine[3:8]
-
-                        if self.timeZoneOffset != 0:  # Add time zone offset:
-                            hour = int(time[0:2]) + self.timeZoneOffset
-                            minute = int(time[3:5])
-                            # day = int(date[3:5])       #DATE HAS ALREADY BEEN ADJUSTED IN DT TAG PROCESS
-                            # month = int(date[0:2])
-                            # year = int(date[6:8])
-                            if hour > 23:  # positive shift in date
-                                hour -= 24
-                            #    day += 1    #FAIL AT MONTH BOUNDARY!
-                            # else:
-                            #    if hour<0:  #negative shift in date
-                            #        hour += 24
-                            #        day -= 1    #FAIL AT MONTH BOUNDARY!
-                            # date = f'{month:02d}/{day:02d}/{year:02d}'
-                            time = (
-                                f'{hour:02d}:{minute:02d}'  # re-form the time string.
-                            )
-
-                        if (
-                            startTime == ''
-                        ):  # this may never happen... DT stamp comes first.
-                            startTime = time
-                        endTime = time
-                        gotStamp = True
-                        if time != lastTime:  # Detect changed time and print that.
-                            newTime = True
-                            lastTime = time
-                        newSecs = False
-
-                    if gotStamp is False:  # Other log entries: Update :secs.hundredths
-                        numThings += 1
-                        secs = logLine[3:8]
-                        if secs != '':
-                            if secs != lastSecs:
-                                if startSecs == '':
-                                    startSecs = secs
-                                endSecs = secs
-                            newSecs = True
-                            lastSecs = secs
-                        parseLogEntries(
-                            logLine
-                        )  # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
-                    # Ok, did we get a time stamp or a parsable tag with something else?
-                    if self.csvIt and date != '':
-                        # if time == '14:25': print(gotStamp,gotIt,txt,date,time,secs)
-                        if (gotStamp and newSecs) or (
-                            gotIt and txt != '' and newSecs
-                        ):  # blank txt is a flag to mute this log entry
-                            # Did we get a "BAD n" DateTime stamp?  Calculate the next hour and use that.
-
-                            # Did we log an earlier date stamp after a later one?
-                            # if (int(date[6:8]==0)) or (int(date[0:2]==0)) or (int(date[3:5]==0)):
-                            #    print ('Ble?', date[6:8], date[0:2], date[3:5])
-                            # if (date!='') and (lastDate!=''):
-                            #    yearD  = int(date[6:8]) - int(lastDate[6:8])
-                            #    monthD = int(date[0:2]) - int(lastDate[0:2])
-                            #    dayD   = int(date[3:5]) - int(lastDate[3:5])
-                            #    if (yearD<0) or (yearD==0 and monthD<0) or (yearD==0 and monthD==0 and dayD<0):
-                            #         print ('Bleh! ', date, lastDate)
-
-                            fTimeSecsPrev = fTimeSecs
-                            fSecs = float(secs)
-                            fMins = float(time[3:6])
-                            fHrs = float(time[0:2])
-                            fTimeSecs = fHrs * 3600 + fMins * 60 + fSecs
-                            # print (fSecs)
-                            with open(output_csv, 'a') as csvOut:
-                                if (
-                                    date == lastDateDup
-                                    and (fTimeSecs - fTimeSecsPrev) > 0.02
-                                ):
-                                    # if date==lastDateDup and time==lastTimeDup and secs==lastSecsDup:
-                                    if math.floor(fSecs * 100.0) != 0:
-                                        fLeadingEdge = (
-                                            math.floor(fSecs * 100.0) - 1.0
-                                        ) / 100.0
-                                    else:
-                                        fLeadingEdge = (
-                                            math.floor(fSecs * 100.0)
-                                        ) / 100.0
-                                    csvOut.write(
-                                        f'{date} {time}:{fLeadingEdge:05.2f},' + csvLine
-                                    )  # duplicate previous values
-                                    extraLines += 1
-                                #    print ('!')
-                                csvLine = f'{Pon},{PumpsHot},{ePumpSelection},{PumpsShutdown},'
-                                csvLine += f'{P1CurrentHigh},{P2CurrentHigh},{maxIp1},{maxIp2},'
-                                csvLine += f'{fThrot:05.3f},{fInTemp:5.2f},{fOutTemp:5.2f},{fFlow:5.2f},'
-                                csvLine += f'{int(bIntOn)},{int(bRestart)},{int(bCold)},{int(bPowerdown)},{int(bLogClosed)},{int(bLeak)},'
-                                csvLine += f'{fMinFlow:4.2f},{iMaxTemp},{iDissWatts},{iCmds},{iQrys},{iTouches},{ps24V},{ps5V},{ps3p3V},{iCpuTemp},'
-                                csvLine += f'{iGlitch0},{iGlitch1},{iGlitch2},{bWDTreboot},{int(bMysteryRestart)}\n'
-                                csvOut.write(f'{date} {time}:{secs},' + csvLine)
-                                lastDateDup = date
-                                # lastTimeDup = time
-                                # lastSecsDup = secs
-
-                    if date != lastDate:
-                        lastDate = date
-                        # newDate = True
-                    if newSecs is True and newTime is True:
-                        newSecs = False
-                        newTime = False
-                        # newDate = False
-
-            # print / return limits.
-            if endDate:  # This line isn't in the .csv file in any case:
-                print('End  :', endDate, endTime, endSecs)
-            print(linenum, 'lines +', extraLines, 'added')
-
+            engine = self._make_engine()
+            if not self.cache.fetch(engine, input_data, output_txt, output_csv):
+                # Only converts what's new if this log was converted here before
+                convert_resumable(engine, input_data, output_txt, output_csv)
+                self.cache.store(engine, input_data, output_txt, output_csv)
             success_flag = True
 
         except Exception as e:
@@ -0,0 +1,331 @@
+import contextlib
+import dataclasses
+import io
+import mmap
+import os
+import re
+import shutil
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from typing import Any, TextIO
+
+from .compress import compression_of
+from .engine import CSV_HEADER, ConvertEngine, ParserState, leading_edge
+from .mapped import MappedLog
+from .sinks import OutputSinks
+
+# Logs smaller than this per worker are not worth splitting up.
+MIN_CHUNK_BYTES: int = 4 * 1048576
+
+# Chunks only start at a complete, good DT stamp.  It sets the date, time and
+# seconds by itself, so no clock state has to be carried into the chunk.
+_GOOD_DT = re.compile(rb'^DT \d\d/\d\d/\d\d \d\d:\d\d:\d\d\.\d\d\r?$', re.MULTILINE)
+
+# A log line and its index, within the chunk or the whole log.
+_Line = tuple[int, str]
+
+
+def find_chunks(input_data: Path, chunks: int) -> list[int]:
+    """
+    Split a raw log into about `chunks` pieces of similar size, each starting
+    at a good DT stamp.
+
+    Inputs [input_data, chunks]:
+        Path to the raw log and the number of pieces wanted.
+    Returns [list(int)]:
+        Byte offset of the start of each piece; the first is always 0.
+    """
+    size = input_data.stat().st_size
+    starts = [0]
+    if size == 0 or chunks < 2:
+        return starts
+    with (
+        open(input_data, 'rb') as f,
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+    ):
+        for i in range(1, chunks):
+            match = _GOOD_DT.search(mm, max(size * i // chunks, starts[-1] + 1))
+            if match is None:
+                break
+            if match.start() > starts[-1]:
+                starts.append(match.start())
+    return starts
+
+
+def _read_lines(input_data: Path, start: int, end: int) -> Iterator[str]:
+    # Lines of [start, end) decoded just as open(input_data, 'r') would.
+    with MappedLog(input_data, start, end) as logIn:
+        yield from iter(logIn.readline, '')
+
+
+def _scan_chunk(input_data: Path, start: int, end: int) -> dict[str, Any]:
+    """
+    First pass over one chunk: the few lines and sums that decide the parser
+    state it leaves for the chunks after it.
+    """
+    last: dict[str, _Line] = {}  # last line of each tag, last good DT for 'DT'
+    firstDT: _Line | None = None
+    firstEntry: _Line | None = None  # first non-timestamp entry
+    entries: list[_Line] = []  # last two non-timestamp entries
+    preRE: _Line | None = None  # entry just before the last RE, if in chunk
+    iCmds = iQrys = iTouches = 0
+    idx = -1
+    for idx, logLine in enumerate(_read_lines(input_data, start, end)):
+        tag = logLine[:2]
+        if tag == 'DT':
+            if firstDT is None:
+                firstDT = (idx, logLine)
+            if logLine[3:6] != 'BAD':
+                last[tag] = (idx, logLine)
+            continue
+        if tag == 'TI':
+            last[tag] = (idx, logLine)
+            continue
+        if firstEntry is None:
+            firstEntry = (idx, logLine)
+        if tag == 'RE':
+            preRE = entries[-1] if entries else None
+        entries = [entries[-1], (idx, logLine)] if entries else [(idx, logLine)]
+        last[tag] = (idx, logLine)
+        try:
+            if tag == 'IF':
+                iCmds += int(logLine[9:20])
+                iQrys += int(logLine[20:31])
+            elif tag == 'TU':
+                iTouches += int(logLine[9:20])
+        except ValueError:
+            pass  # the conversion pass will fail on this line and report it
+    return {
+        'lines': idx + 1,
+        'last': last,
+        'firstDT': firstDT,
+        'firstEntry': firstEntry,
+        'entries': entries,
+        'preRE': preRE,
+        'iCmds': iCmds,
+        'iQrys': iQrys,
+        'iTouches': iTouches,
+    }
+
+
+def _shift(line: _Line | None, base: int) -> _Line | None:
+    return None if line is None else (base + line[0], line[1])
+
+
+def _entry_plans(summaries: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Work out, for every chunk, the lines to replay and the carried values that
+    rebuild the parser state the serial conversion would have at its start.
+
+    Every state variable is either set by the latest line of some tag, by the
+    latest entries (the one-tag flags and the RE mystery-restart check) or
+    summed (iCmds, iQrys, iTouches).  Replaying those few lines in log order
+    and then restoring the sums gives exactly the serial state.
+    """
+    plans: list[dict[str, Any]] = []
+    last: dict[str, _Line] = {}
+    firstDT: _Line | None = None
+    firstEntry: _Line | None = None
+    entries: list[_Line] = []
+    preRE: _Line | None = None
+    sums = {'iCmds': 0, 'iQrys': 0, 'iTouches': 0}
+    base = 0  # lines before the chunk
+    for summary in summaries:
+        replay = set(last.values()) | set(entries)
+        for line in (firstDT, firstEntry, preRE):
+            if line is not None:
+                replay.add(line)
+        plans.append(
+            {
+                'replay': [line for _, line in sorted(replay)],
+                'linenum': base + 1,
+                **sums,
+            }
+        )
+
+        if 'RE' in summary['last']:
+            # The RE's previous entry is in an earlier chunk if none came first
+            preRE = _shift(summary['preRE'], base) or (entries[-1] if entries else None)
+        for tag, line in summary['last'].items():
+            last[tag] = (base + line[0], line[1])
+        firstDT = firstDT or _shift(summary['firstDT'], base)
+        firstEntry = firstEntry or _shift(summary['firstEntry'], base)
+        entries = (entries + [(base + i, line) for i, line in summary['entries']])[-2:]
+        for key in sums:
+            sums[key] += summary[key]
+        base += summary['lines']
+    return plans
+
+
+def _convert_chunk(
+    engine: ConvertEngine,
+    input_data: Path,
+    start: int,
+    end: int,
+    plan: dict[str, Any],
+    part_txt: Path,
+    part_csv: Path | None,
+) -> tuple[ParserState | None, str, Exception | None]:
+    """
+    Second pass: convert one chunk into its own part files, starting from the
+    state rebuilt by replaying the plan's lines.
+
+    Returns [tuple(ParserState, str, Exception)]:
+        The parser state after the chunk (None if it failed), everything it
+        printed and the error that stopped it, if any.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        entry = engine.run(io.StringIO(''.join(plan['replay'])), io.StringIO(), None)
+    entry.linenum = plan['linenum']
+    entry.iCmds = plan['iCmds']
+    entry.iQrys = plan['iQrys']
+    entry.iTouches = plan['iTouches']
+    entry.extraLines = 0
+    entry.csvLine = ''
+    entry.lastDateDup = None  # leading edge of the first row is stitched in
+    printed = io.StringIO()
+    with (
+        OutputSinks(part_txt, part_csv) as sinks,
+        contextlib.redirect_stdout(printed),
+    ):
+        try:
+            with MappedLog(input_data, start, end) as logIn:
+                state = engine.run(logIn, sinks.txt, sinks.csv, entry)
+        except Exception as e:
+            return None, printed.getvalue(), e
+    return state, printed.getvalue(), None
+
+
+def _stitch_csv_row(csvOut: TextIO, part_csv: Path, prev: ParserState) -> int:
+    # The leading-edge row the serial conversion writes between the previous
+    # chunk's last row and this chunk's first row.
+    with open(part_csv, 'r') as f:
+        first = f.readline()
+    if not first:
+        return 0
+    date, stamp = first.split(',', 1)[0].split(' ', 1)
+    time, secs = stamp.rsplit(':', 1)
+    fSecs = float(secs)
+    fTimeSecs = float(time[0:2]) * 3600 + float(time[3:6]) * 60 + fSecs
+    if date == prev.lastDateDup and (fTimeSecs - prev.fTimeSecs) > 0.02:
+        csvOut.write(f'{date} {time}:{leading_edge(fSecs):05.2f},' + prev.csvLine)
+        return 1
+    return 0
+
+
+def convert_parallel(
+    engine: ConvertEngine,
+    input_data: Path,
+    output_txt: Path,
+    output_csv: Path,
+    workers: int | None = None,
+    chunk_bytes: int = MIN_CHUNK_BYTES,
+) -> None:
+    """
+    Convert one large raw log on several processes, with output identical to
+    engine.convert().
+
+    The log is split at good DT stamps.  A quick first pass over every chunk
+    collects what each one leaves behind (the latest line of every tag, the
+    interface/touch sums), from which the state at the start of each chunk is
+    rebuilt.  The chunks are then converted in parallel and their outputs
+    joined in order, with the leading-edge csv row at each join.
+
+    Falls back to engine.convert() for a single worker, small logs,
+    START_LINE/END_LINE limited conversions, the .npz, sparse csv, decimated
+    csv, fleet database and event index exports and compressed logs or
+    outputs.
+
+    Inputs [engine, input_data, output_txt, output_csv, workers, chunk_bytes]:
+        The engine with the settings, the raw log, the outputs as for
+        engine.convert(), the number of processes (None for one per CPU)
+        and the smallest chunk worth its own process.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = min(workers, input_data.stat().st_size // max(chunk_bytes, 1))
+    split = engine.startLine <= 1 and not (
+        engine.npzIt
+        or engine.sparseIt
+        or engine.decimateIt
+        or engine.fleetDb is not None
+        or engine.eventsIt
+        or engine.compression is not None
+        or compression_of(input_data) is not None
+    )
+    starts = find_chunks(input_data, chunks) if split else [0]
+    if len(starts) < 2:
+        engine.convert(input_data, output_txt, output_csv)
+        return
+    ends = starts[1:] + [input_data.stat().st_size]
+
+    parts: list[tuple[Path, Path | None]] = [
+        (
+            output_txt.with_name(f'{output_txt.name}.part{k}'),
+            output_csv.with_name(f'{output_csv.name}.part{k}')
+            if engine.csvIt
+            else None,
+        )
+        for k in range(len(starts))
+    ]
+    futures: list[Future] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        summaries = list(pool.map(_scan_chunk, repeat(input_data), starts, ends))
+        # END_LINE inside the log: not worth splitting, convert serially
+        serial = sum(s['lines'] for s in summaries) + 1 >= engine.endLine
+        if not serial:
+            try:
+                futures = [
+                    pool.submit(_convert_chunk, engine, input_data, s, e, plan, *part)
+                    for s, e, plan, part in zip(
+                        starts, ends, _entry_plans(summaries), parts
+                    )
+                ]
+                _join_parts(engine, futures, parts, output_txt, output_csv)
+            finally:
+                for future in futures:
+                    future.cancel()
+                for part_txt, part_csv in parts:
+                    part_txt.unlink(missing_ok=True)
+                    if part_csv is not None:
+                        part_csv.unlink(missing_ok=True)
+    if serial:
+        engine.convert(input_data, output_txt, output_csv)
+
+
+def _join_parts(
+    engine: ConvertEngine,
+    futures: list[Future],
+    parts: list[tuple[Path, Path | None]],
+    output_txt: Path,
+    output_csv: Path,
+) -> None:
+    # Append the chunks' part files to the outputs in log order.  A failed
+    # chunk still contributes what it converted and printed before the error
+    # is raised, just like a serial conversion.
+    extraLines = 0
+    state: ParserState | None = None
+    prev: ParserState | None = None  # state after the last csv row
+    with OutputSinks(output_txt, output_csv if engine.csvIt else None) as sinks:
+        if sinks.csv is not None:
+            sinks.csv.write(CSV_HEADER)
+        for future, (part_txt, part_csv) in zip(futures, parts):
+            chunk_state, printed, error = future.result()
+            if sinks.csv is not None and part_csv is not None and prev is not None:
+                extraLines += _stitch_csv_row(sinks.csv, part_csv, prev)
+            for part, out in ((part_txt, sinks.txt), (part_csv, sinks.csv)):
+                if part is not None and out is not None and part.exists():
+                    out.flush()
+                    with open(part, 'rb') as f:
+                        shutil.copyfileobj(f, out.buffer)
+            print(printed, end='')
+            if error is not None:
+                raise error
+            state = chunk_state
+            extraLines += state.extraLines
+            if state.lastDateDup is not None:  # the chunk wrote csv rows
+                prev = state
+    if state is not None:
+        engine.print_summary(dataclasses.replace(state, extraLines=extraLines))
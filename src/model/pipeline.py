@@ -0,0 +1,186 @@
+import copy
+import queue
+import threading
+from collections.abc import Generator
+from pathlib import Path
+from typing import TextIO
+
+from serial import Serial
+
+from .download import LogReceiver, receive_into, receive_log
+from .engine import ConvertEngine
+from .records import LogRecord, read_records
+
+# Batches of downloaded lines waiting for the parser.  A batch is whatever
+# one serial read completed, so this bounds the memory to a few MB.
+PIPELINE_QUEUE_SIZE: int = 64
+
+
+class LineQueue:
+    """
+    A bounded queue of raw log lines between the serial download and the
+    parser, read back through readline() like the raw log file would be.
+
+    Inputs [maxsize]:
+        The most batches of lines held before the download waits.
+    """
+
+    def __init__(self, maxsize: int = PIPELINE_QUEUE_SIZE) -> None:
+        self._queue: queue.Queue[list[str] | None] = queue.Queue(maxsize)
+        self._lines: list[str] = []
+        self._next = 0
+        self._eof = False
+        self.abandoned = False  # the parser stopped, drop anything more
+
+    def put(self, lines: list[str]) -> None:
+        """
+        Queue a batch of lines for the parser, waiting while the queue is full.
+        """
+        self._put(lines)
+
+    def close(self) -> None:
+        """
+        No more lines are coming: readline() returns '' once the queue drains.
+        """
+        self._put(None)
+
+    def _put(self, batch: list[str] | None) -> None:
+        while not self.abandoned:
+            try:
+                self._queue.put(batch, timeout=0.1)
+                return
+            except queue.Full:
+                pass  # check again whether the parser is still reading
+
+    def abandon(self) -> None:
+        """
+        The parser has stopped reading; let the download run on without it.
+        """
+        self.abandoned = True
+
+    def readline(self) -> str:
+        if self._next == len(self._lines):
+            if self._eof:
+                return ''
+            batch = self._queue.get()
+            if batch is None:
+                self._eof = True
+                return ''
+            self._lines = batch
+            self._next = 0
+        line = self._lines[self._next]
+        self._next += 1
+        # Lines read back from the raw log file have '\n' line endings
+        if line.endswith('\r\n'):
+            line = line[:-2] + '\n'
+        return line
+
+
+def pull_and_convert(
+    ser: Serial,
+    logOut: TextIO,
+    megs: int,
+    engine: ConvertEngine,
+    output_txt: Path,
+    output_csv: Path,
+    printIt: bool = False,
+) -> tuple[LogReceiver, Exception | None]:
+    """
+    Download a log and convert it at the same time.
+
+    The download runs here and hands each batch of new lines to a parser
+    thread through a LineQueue, so out.txt and out.csv are written while
+    the transfer is still going and are done moments after the last byte.
+    The raw log is written to logOut as usual.  If the conversion fails the
+    download still runs to the end.
+
+    Inputs [ser, logOut, megs, engine, output_txt, output_csv, printIt]:
+        The open serial port (the command already sent), the raw log file,
+        the MB requested, the engine with the conversion settings (its
+        fleetSN replaced by the serial number in the preamble, if there is
+        one), the outputs as for engine.convert() and whether to print the
+        guts.
+    Returns [tuple(LogReceiver, Exception)]:
+        The finished receiver and the error that stopped the conversion, if
+        any.  Download errors are raised.
+    """
+    lines = LineQueue()
+    errors: list[Exception] = []
+    engine = copy.copy(engine)
+
+    def convert() -> None:
+        try:
+            engine.convert_lines(lines, output_txt, output_csv)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            lines.abandon()
+
+    parser = threading.Thread(target=convert, name='convertLog', daemon=True)
+
+    def hand_over(batch: list[str]) -> None:
+        # The parser starts with the first guts: the preamble is in by then,
+        # so the fleet database gets the serial number the HEU reported
+        if parser.ident is None:
+            engine.fleetSN = receiver.SN or engine.fleetSN
+            parser.start()
+        lines.put(batch)
+
+    receiver = LogReceiver(logOut, printIt, hand_over)
+    try:
+        receive_into(ser, receiver, megs)
+    finally:
+        if parser.ident is None:
+            parser.start()  # no guts came: still write the empty outputs
+        lines.close()
+        parser.join()
+    return receiver, errors[0] if errors else None
+
+
+def pull_records(
+    ser: Serial,
+    logOut: TextIO,
+    megs: int,
+    engine: ConvertEngine | None = None,
+    states: bool = False,
+    printIt: bool = False,
+) -> Generator[LogRecord, None, LogReceiver]:
+    """
+    Download a log and yield its records (see records.read_records()) as the
+    lines come in.
+
+    The download runs on a thread that hands each batch of new lines over
+    through a LineQueue, and writes the raw log to logOut as usual.  If the
+    records stop being read the download still runs to the end.
+
+    Inputs [ser, logOut, megs, engine, states, printIt]:
+        The open serial port (the command already sent), the raw log file,
+        the MB requested, the engine with the conversion settings (None for
+        the defaults), whether to add the parser state to every record and
+        whether to print the guts.
+    Returns [Generator(LogRecord, None, LogReceiver)]:
+        The records, in log order.  The finished receiver is the generator's
+        return value; download errors are raised once the records run out.
+    """
+    lines = LineQueue()
+    results: list[LogReceiver] = []
+    errors: list[Exception] = []
+
+    def download() -> None:
+        try:
+            results.append(receive_log(ser, logOut, megs, printIt, lines.put))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            lines.close()
+
+    downloader = threading.Thread(target=download, name='frlog', daemon=True)
+    downloader.start()
+    try:
+        yield from read_records(lines, engine, states)
+    finally:
+        lines.abandon()
+        downloader.join()
+    if errors:
+        raise errors[0]
+    return results[0]
@@ -0,0 +1,162 @@
+import copy
+import os
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from operator import attrgetter
+from pathlib import Path
+from typing import Any, TextIO
+
+from .compress import open_log
+from .engine import ConvertEngine, ParserState
+from .stamps import TICKS_PER_SEC
+
+# The state fields each tag's decoder sets, in the order of its record's
+# fields.  IF and TU add to running counts, so their records hold the totals.
+# The stamps and the tags that only print something have none.
+RECORD_FIELDS: dict[str, tuple[str, ...]] = {
+    'DT': (),
+    'TI': (),
+    'PS': (
+        'Pon',
+        'PumpsHot',
+        'ePumpSelection',
+        'PumpsShutdown',
+        'P1CurrentHigh',
+        'P2CurrentHigh',
+        'maxIp1',
+        'maxIp2',
+    ),
+    'TH': ('fThrot',),
+    'TM': ('fInTemp', 'fOutTemp', 'iDissWatts'),
+    'FL': ('fFlow', 'iDissWatts'),
+    'PR': (),
+    'IN': ('bIntOn',),
+    'RE': ('bRestart', 'bCold', 'bMysteryRestart'),
+    'PD': ('bPowerdown',),
+    'CL': ('bLogClosed', 'bPowerdown'),
+    'LE': ('bLeak',),
+    'MF': ('fMinFlow',),
+    'MT': ('iMaxTemp',),
+    'VE': (),
+    'DW': (),
+    'IF': ('iCmds', 'iQrys'),
+    'TU': ('iTouches',),
+    'SV': ('ps24V', 'ps5V', 'ps3p3V'),
+    'CT': ('iCpuTemp',),
+    'DB': ('iGlitch0', 'iGlitch1', 'iGlitch2'),
+    'WD': ('rbtMarker', 'dogExpired', 'bWDTreboot'),
+}
+
+
+def _getter(names: tuple[str, ...]) -> Callable[[ParserState], tuple[Any, ...]]:
+    # A tuple of the named state fields, whatever their number
+    if not names:
+        return lambda st: ()
+    if len(names) == 1:
+        get = attrgetter(names[0])
+        return lambda st: (get(st),)
+    return attrgetter(*names)
+
+
+_GETTERS = {tag: _getter(names) for tag, names in RECORD_FIELDS.items()}
+
+
+@dataclass(slots=True, frozen=True)
+class LogRecord:
+    """
+    One parsed line of a raw log.
+
+    clock is the time of the line in hundredths of a second since 1970 (see
+    stamps), with the time zone and date line offsets: the minute of a TI
+    stamp, the minute and seconds of a DT stamp or an entry.  It is None
+    before the first DT stamp and when the seconds are garbled.  fields
+    holds the values the tag's decoder set, named in RECORD_FIELDS[tag],
+    and state a copy of the whole parser state after the line when asked
+    for.
+    """
+
+    linenum: int
+    tag: str
+    clock: int | None
+    fields: tuple[Any, ...]
+    state: ParserState | None = None
+
+    @property
+    def epoch(self) -> float | None:
+        """
+        The time of the line in seconds since 1970-01-01, as out.csv prints it.
+        """
+        return None if self.clock is None else self.clock / TICKS_PER_SEC
+
+    def named(self) -> dict[str, Any]:
+        """
+        The fields by name.
+        """
+        return dict(zip(RECORD_FIELDS[self.tag], self.fields))
+
+
+def _clock(st: ParserState) -> int | None:
+    # Time of the line just taken in, see LogRecord
+    if st.date == '':
+        return None
+    if st.tag == 'TI':
+        return st.minuteClock
+    try:
+        return st.minuteClock + round(float(st.secs) * TICKS_PER_SEC)
+    except ValueError:
+        return None
+
+
+def read_records(
+    source: Path | TextIO,
+    engine: ConvertEngine | None = None,
+    states: bool = False,
+) -> Iterator[LogRecord]:
+    """
+    Parse a raw log one line at a time, yielding a LogRecord for each line
+    that parsed, without writing out.txt or out.csv.
+
+    Only the current line and the parser state are held, so a log of any
+    size (or a download that hasn't finished, see pipeline.pull_records())
+    takes the same memory.  Lines that don't parse give no record.  A
+    garbled DT stamp raises ValueError, as it stops a conversion.
+
+    Inputs [source, engine, states]:
+        The raw log (compressed or not) or anything with a readline() (an
+        open file, a download in progress), the engine with the conversion
+        settings (None for the defaults) and whether to add a copy of the
+        parser state to every record, which costs a copy per line and the
+        csv bookkeeping a conversion does.
+    Returns [Iterator(LogRecord)]:
+        The records, in log order.
+    """
+    if isinstance(source, Path):
+        with open_log(source) as logIn:
+            yield from read_records(logIn, engine, states)
+        return
+    # Nothing printed, every line taken in one at a time
+    quiet = copy.copy(engine if engine is not None else ConvertEngine())
+    quiet.printIt = False
+    quiet.vectorIt = False
+    if quiet.mute == 0:
+        quiet.mute = 2  # the same state without writing out.txt lines
+    linenum = 1
+    while linenum < quiet.startLine:
+        if not source.readline():
+            return
+        linenum += 1
+    st = ParserState(linenum=linenum)
+    getters = _GETTERS
+    with open(os.devnull, 'w') as devnull:
+        csvOut = devnull if states else None
+        for _ in quiet.steps(st, source, devnull, csvOut):
+            tag = st.tag
+            if tag != 'DT' and tag != 'TI' and not st.gotIt:
+                continue
+            yield LogRecord(
+                st.linenum - 1,
+                tag,
+                _clock(st),
+                getters[tag](st),
+                st.copy() if states else None,
+            )
@@ -0,0 +1,74 @@
+from pathlib import Path
+from types import TracebackType
+from typing import Self, TextIO, cast
+
+from .compress import CompressedWriter, compressed_path
+
+# Bytes held in memory per output file before a write hits the disk.
+OUTPUT_BUFFER_SIZE: int = 1024 * 1024
+
+
+def _open(
+    path: Path, append: bool, buffer_size: int, compression: str | None
+) -> TextIO:
+    if compression is None:
+        return open(path, 'a' if append else 'w', buffering=buffer_size)
+    writer = CompressedWriter(compressed_path(path, compression), compression, append)
+    return cast(TextIO, writer)  # all the engine calls is write()
+
+
+class OutputSinks:
+    """
+    The out.txt and out.csv targets of one conversion.
+
+    Each file is opened once, written through a large buffer and flushed
+    when the sinks are closed, so a conversion costs a handful of writes
+    instead of an open/close per log line.
+
+    With a compression ('gz' or 'zst') both are written compressed, to
+    compressed_path() of each, through CompressedWriter.
+
+    Inputs [output_txt, output_csv, buffer_size, append_csv, compression]:
+        Path to the expanded text log, path to the csv (None to skip the
+        csv), the buffer size in bytes for each file, whether to add to
+        an existing csv instead of starting it over and the compression
+        (None for plain text).
+    """
+
+    def __init__(
+        self,
+        output_txt: Path,
+        output_csv: Path | None = None,
+        buffer_size: int = OUTPUT_BUFFER_SIZE,
+        append_csv: bool = False,
+        compression: str | None = None,
+    ) -> None:
+        self.txt: TextIO = _open(output_txt, True, buffer_size, compression)
+        self.csv: TextIO | None = None
+        if output_csv is not None:
+            try:
+                self.csv = _open(output_csv, append_csv, buffer_size, compression)
+            except Exception:
+                self.txt.close()
+                raise
+
+    def close(self) -> None:
+        """
+        Flush and close every open output file.
+        """
+        try:
+            self.txt.close()
+        finally:
+            if self.csv is not None:
+                self.csv.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
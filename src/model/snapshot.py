@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from .compress import compressed_path, compression_of
+from .engine import ConvertEngine, ParserState
+from .mapped import MappedLog
+from .sinks import OutputSinks
+
+SNAPSHOT_VERSION: int = 2
+
+# Bytes of raw log just before the resume point that must be unchanged.
+FINGERPRINT_BYTES: int = 4096
+
+
+def snapshot_path(output_txt: Path) -> Path:
+    """
+    Where the parser state of the conversion into output_txt is kept:
+    <fname>out.state.json next to <fname>out.txt.
+    """
+    return output_txt.with_name(output_txt.stem + '.state.json')
+
+
+def _settings(engine: ConvertEngine) -> dict[str, Any]:
+    # The settings that shape the outputs; printIt only affects the console,
+    # vectorIt only the speed and fleetSN only the fleet database
+    ignored = ('printIt', 'vectorIt', 'fleetSN')
+    return {k: v for k, v in vars(engine).items() if k not in ignored}
+
+
+def _tail(input_data: Path, offset: int) -> bytes:
+    with open(input_data, 'rb') as f:
+        f.seek(max(offset - FINGERPRINT_BYTES, 0))
+        return f.read(min(offset, FINGERPRINT_BYTES))
+
+
+def _size(path: Path | None) -> int | None:
+    return path.stat().st_size if path is not None and path.exists() else None
+
+
+def save_snapshot(
+    path: Path,
+    engine: ConvertEngine,
+    input_data: Path,
+    offset: int,
+    state: ParserState,
+    output_txt: Path,
+    output_csv: Path | None,
+) -> None:
+    """
+    Save the parser state at the end of a conversion, with what a later
+    conversion needs to check before picking up from it.
+
+    Inputs [path, engine, input_data, offset, state, output_txt, output_csv]:
+        The snapshot file, the engine used, the raw log and the byte offset
+        converted up to, the parser state there and the outputs written
+        (output_csv None without a csv).
+    """
+    tail = _tail(input_data, offset)
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'settings': _settings(engine),
+        'offset': offset,
+        'fingerprint': hashlib.sha256(tail).hexdigest(),
+        'txtSize': _size(output_txt),
+        'csvSize': _size(output_csv),
+        'state': state.to_json(),
+    }
+    path.write_text(json.dumps(snapshot, indent=1))
+
+
+def load_snapshot(path: Path) -> dict[str, Any] | None:
+    """
+    Read a snapshot written by save_snapshot().
+
+    Returns [dict(str, Any) | None]:
+        The snapshot, None if there is none or it can't be used.
+    """
+    try:
+        snapshot = json.loads(path.read_text())
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            return None
+        snapshot['state'] = ParserState.from_json(snapshot['state'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return snapshot
+
+
+def _can_resume(
+    snapshot: dict[str, Any],
+    engine: ConvertEngine,
+    input_data: Path,
+    output_txt: Path,
+    output_csv: Path | None,
+) -> bool:
+    # Same settings, the raw log still starts with what was converted and
+    # the outputs still hold at least what was written.
+    if snapshot['settings'] != _settings(engine):
+        return False
+    offset = snapshot['offset']
+    if input_data.stat().st_size < offset:
+        return False
+    if hashlib.sha256(_tail(input_data, offset)).hexdigest() != snapshot['fingerprint']:
+        return False
+    for path, size in (
+        (output_txt, snapshot['txtSize']),
+        (output_csv, snapshot['csvSize']),
+    ):
+        current = _size(path)
+        if (current is None) != (size is None) or (size is not None and current < size):
+            return False
+    return True
+
+
+def convert_resumable(
+    engine: ConvertEngine, input_data: Path, output_txt: Path, output_csv: Path
+) -> bool:
+    """
+    Convert a raw log like engine.convert(), but if it extends a log already
+    converted into these outputs, only convert the lines added since and
+    append them to out.txt and out.csv.
+
+    At the end of every conversion that reaches the end of the log the
+    parser state is saved next to out.txt (snapshot_path()), with the byte
+    offset reached and a fingerprint of the raw log just before it.  The
+    next conversion restores that state and seeks to the offset when the
+    settings match, the fingerprint still matches and the outputs are
+    intact, and otherwise converts the whole log as usual.  A compressed
+    log or compressed outputs are always converted whole.
+
+    Inputs [engine, input_data, output_txt, output_csv]:
+        As for engine.convert().
+    Returns [bool]:
+        True if the conversion picked up from a snapshot.
+    """
+    path = snapshot_path(output_txt)
+    csv = output_csv if engine.csvIt else None
+    snapshot = load_snapshot(path)
+    # The .npz columns are written in one go, the sparse csv only holds
+    # changes from the rows before, the last decimated buckets may still
+    # fill up, the fleet database takes a log's rows all at once and the
+    # event index counts csv rows from the start: none of them can be added
+    # to
+    resume = (
+        snapshot is not None
+        and not engine.npzIt
+        and not engine.sparseIt
+        and not engine.decimateIt
+        and engine.fleetDb is None
+        and not engine.eventsIt
+        and _can_resume(snapshot, engine, input_data, output_txt, csv)
+    )
+    path.unlink(missing_ok=True)  # the outputs are about to change
+    if not resume:
+        # out.txt is appended to: start it empty, as convert_file() does
+        compressed_path(output_txt, engine.compression).write_text('')
+    if engine.compression is not None or compression_of(input_data) is not None:
+        # Compressed files can't be seeked into or cut back: convert it all
+        engine.convert(input_data, output_txt, output_csv)
+        return False
+
+    with MappedLog(input_data) as logIn:
+        if resume:
+            # Drop anything written after the snapshot, e.g. by a failed run
+            os.truncate(output_txt, snapshot['txtSize'])
+            if csv is not None:
+                os.truncate(csv, snapshot['csvSize'])
+            logIn.seek(snapshot['offset'])
+            with OutputSinks(output_txt, csv, append_csv=True) as sinks:
+                state = engine.run(logIn, sinks.txt, sinks.csv, snapshot['state'])
+                engine.print_summary(state)
+        else:
+            state = engine.convert_lines(logIn, output_txt, output_csv)
+        offset = logIn.tell()
+
+    # Only a conversion that took in every whole line can be picked up
+    if state is not None and state.linenum < engine.endLine:
+        if _tail(input_data, offset)[-1:] == b'\n':
+            save_snapshot(path, engine, input_data, offset, state, output_txt, csv)
+    return resume
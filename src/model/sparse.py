@@ -0,0 +1,136 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+from .engine import CSV_HEADER, leading_edge
+from .sinks import OUTPUT_BUFFER_SIZE
+
+# The csv columns after Time, as named in the Column field.
+COLUMNS: list[str] = CSV_HEADER.strip().split(',')[1:]
+
+# First line of a sparse csv: what it is and how to read its values back.
+SPARSE_MAGIC = '# HEU3 sparse csv'
+SPARSE_HEADER: str = (
+    f'{SPARSE_MAGIC}, version=1, interpolation=step:'
+    ' each Value holds until the next row with the same Column;'
+    ' an empty Time is the same csv row as the row above;'
+    ' a row without a Column repeats the values as they are\n'
+    'Time,Column,Value\n'
+)
+
+
+def sparse_path(output_csv: Path) -> Path:
+    """
+    The change-only csv written next to out.csv: <fname>out.sparse.csv.
+    """
+    return output_csv.with_suffix('.sparse.csv')
+
+
+def dense_path(input_sparse: Path) -> Path:
+    """
+    The csv a sparse csv expands to: <fname>out.csv for <fname>out.sparse.csv.
+    """
+    return input_sparse.with_name(
+        input_sparse.name.removesuffix('.sparse.csv') + '.csv'
+    )
+
+
+class SparseWriter:
+    """
+    The csv rows of a conversion written as changes only: a Time,Column,Value
+    row for every column whose value differs from the previous csv row, the
+    Time only given on the first of them.
+
+    The leading-edge rows of the csv are left out, as the header declares
+    step interpolation: a value holds until its column's next change.  A
+    csv row where nothing changed is kept as a row with no Column, so
+    expand_sparse() gives back the csv exactly as the conversion writes it.
+    Values are the csv's text.
+
+    Inputs [output_sparse, buffer_size]:
+        Path to the sparse csv to write and its write buffer size in bytes.
+    """
+
+    def __init__(
+        self, output_sparse: Path, buffer_size: int = OUTPUT_BUFFER_SIZE
+    ) -> None:
+        self.out = open(output_sparse, 'w', buffering=buffer_size)
+        self.out.write(SPARSE_HEADER)
+
+    def append(self, stamp: str, changes: list[tuple[int, str]]) -> None:
+        """
+        Add a csv row.
+
+        Inputs [stamp, changes]:
+            The row's Time and the columns (by index after Time) whose text
+            changed since the previous row with their new text, as listed
+            by a tracking CsvRowFormatter.
+        """
+        if not changes:
+            self.out.write(f'{stamp},,\n')
+            return
+        self.out.write(
+            f'{stamp},' + ','.join([f'{COLUMNS[i]},{text}\n' for i, text in changes])
+        )
+
+    def close(self) -> None:
+        self.out.close()
+
+
+def read_sparse(input_sparse: Path) -> Iterator[tuple[str, str]]:
+    """
+    The rows of the csv a sparse csv was written from, without the
+    leading-edge rows.
+
+    Inputs [input_sparse]:
+        Path to a sparse csv written by SparseWriter.
+    Returns [Iterator(tuple(str, str))]:
+        Each row's Time and the rest of the row, '\\n' included.
+    """
+    index = {name: i for i, name in enumerate(COLUMNS)}
+    values = [''] * len(COLUMNS)
+    stamp = None
+    with open(input_sparse, 'r') as f:
+        if not f.readline().startswith(SPARSE_MAGIC):
+            raise ValueError(f'{input_sparse} is not a sparse csv')
+        f.readline()  # Time,Column,Value
+        for line in f:
+            time, name, value = line[:-1].split(',', 2)
+            if time:  # the next csv row
+                if stamp is not None:
+                    yield stamp, ','.join(values) + '\n'
+                stamp = time
+            if name:
+                values[index[name]] = value
+    if stamp is not None:
+        yield stamp, ','.join(values) + '\n'
+
+
+def expand_sparse(input_sparse: Path, output_csv: Path | None = None) -> Path:
+    """
+    Expand a sparse csv back into the full csv, leading-edge rows included,
+    as the conversion would have written it.
+
+    Inputs [input_sparse, output_csv]:
+        Path to the sparse csv and to the csv to write (None for
+        dense_path() next to it).
+    Returns [Path]:
+        The csv written.
+    """
+    if output_csv is None:
+        output_csv = dense_path(input_sparse)
+    lastDate = None
+    fTimeSecsPrev = 0.0
+    csvLine = ''
+    with open(output_csv, 'w', buffering=OUTPUT_BUFFER_SIZE) as csvOut:
+        csvOut.write(CSV_HEADER)
+        for stamp, row in read_sparse(input_sparse):
+            # The leading-edge row the conversion writes before a change
+            date, clock = stamp.split(' ', 1)
+            time, secs = clock.rsplit(':', 1)
+            fSecs = float(secs)
+            fTimeSecs = float(time[0:2]) * 3600 + float(time[3:6]) * 60 + fSecs
+            if date == lastDate and (fTimeSecs - fTimeSecsPrev) > 0.02:
+                csvOut.write(f'{date} {time}:{leading_edge(fSecs):05.2f},' + csvLine)
+            csvOut.write(f'{stamp},{row}')
+            lastDate, fTimeSecsPrev, csvLine = date, fTimeSecs, row
+    return output_csv
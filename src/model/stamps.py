@@ -0,0 +1,72 @@
+import datetime
+import functools
+import time
+from typing import AnyStr
+
+# The parser's clock: hundredths of a second since 1970-01-01, as logged (no
+# time zone) with the TIME_ZONE_OFFSET and DATE_LINE_OFFSET added.  A
+# hundredth is the finest a log stamp shows, so the clock is a plain int.
+TICKS_PER_SEC: int = 100
+TICKS_PER_MIN: int = 60 * TICKS_PER_SEC
+TICKS_PER_HOUR: int = 60 * TICKS_PER_MIN
+TICKS_PER_DAY: int = 24 * TICKS_PER_HOUR
+
+_EPOCH_DAY = datetime.date(1970, 1, 1).toordinal()
+
+
+def _fields(stamp: AnyStr, sep: str, count: int) -> list[int]:
+    # The two-digit fields of a MM/DD/YY or HH:MM stamp, as strict as
+    # strptime() was about them: ASCII digits with sep between them
+    text = stamp.decode('latin-1') if isinstance(stamp, bytes) else stamp
+    pairs = text.split(sep)
+    if len(pairs) != count or not all(
+        len(pair) == 2 and pair.isascii() and pair.isdigit() for pair in pairs
+    ):
+        raise ValueError(f'garbled stamp {text!r}')
+    return [int(pair) for pair in pairs]
+
+
+@functools.cache
+def day_ticks(date: AnyStr) -> int:
+    """
+    The clock at the start of a MM/DD/YY date stamp (20YY).  Raises
+    ValueError for a garbled or impossible date.
+    """
+    month, day, year = _fields(date, '/', 3)
+    days = datetime.date(2000 + year, month, day).toordinal() - _EPOCH_DAY
+    return days * TICKS_PER_DAY
+
+
+@functools.cache
+def time_ticks(hhmm: AnyStr) -> int:
+    """
+    The clock ticks into the day of a HH:MM time stamp.  Raises ValueError
+    for a garbled time, or one past 23:59.
+    """
+    hours, minutes = _fields(hhmm, ':', 2)
+    if hours > 23 or minutes > 59:
+        raise ValueError(f'impossible time {hhmm!r}')
+    return hours * TICKS_PER_HOUR + minutes * TICKS_PER_MIN
+
+
+def minute_ticks(date: AnyStr, hhmm: AnyStr) -> int:
+    """
+    The clock at a MM/DD/YY date and HH:MM time stamp, decoded from their
+    fixed-width fields.  Raises ValueError for a garbled stamp.
+    """
+    return day_ticks(date) + time_ticks(hhmm)
+
+
+def render_minute(ticks: int) -> tuple[str, str]:
+    """
+    The MM/DD/YY date and HH:MM time stamps of the minute the clock is in.
+    Raises ValueError for a clock before 1970, which offsets can move a
+    stamp to (gmtime() can't take it everywhere).
+    """
+    if ticks < 0:
+        raise ValueError('clock before 1970-01-01')
+    t = time.gmtime(ticks // TICKS_PER_SEC)
+    return (
+        f'{t.tm_mon:02d}/{t.tm_mday:02d}/{t.tm_year % 100:02d}',
+        f'{t.tm_hour:02d}:{t.tm_min:02d}',
+    )
@@ -0,0 +1,359 @@
+import bisect
+import calendar
+import contextlib
+import copy
+import dataclasses
+import hashlib
+import io
+import itertools
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from .compress import compressed_path, compression_of
+from .engine import CSV_HEADER, ConvertEngine, ParserState
+from .mapped import MappedLog
+from .sinks import OutputSinks
+from .stamps import TICKS_PER_SEC, minute_ticks
+
+INDEX_VERSION: int = 2
+
+# The parser state is saved at the first stamp after every this many bytes,
+# so a window conversion never replays more than this much of the log.
+CHECKPOINT_BYTES: int = 256 * 1024
+
+# Bytes at each end of the raw log that must be unchanged for its index to hold.
+FINGERPRINT_BYTES: int = 4096
+
+# Engine settings the index doesn't depend on: the line range, the outputs and
+# the speed.
+_UNINDEXED = (
+    'printIt',
+    'vectorIt',
+    'startLine',
+    'endLine',
+    'csvIt',
+    'npzIt',
+    'sparseIt',
+    'decimateIt',
+    'compression',
+    'fleetDb',
+    'fleetSN',
+    'eventsIt',
+)
+
+
+def index_path(input_data: Path) -> Path:
+    """
+    Where the time index of a raw log is kept: <fname>.index.json next to it.
+    """
+    return input_data.with_name(input_data.stem + '.index.json')
+
+
+def _settings(engine: ConvertEngine) -> dict[str, Any]:
+    return {k: v for k, v in vars(engine).items() if k not in _UNINDEXED}
+
+
+def _fingerprint(input_data: Path) -> str:
+    size = input_data.stat().st_size
+    with open(input_data, 'rb') as f:
+        head = f.read(FINGERPRINT_BYTES)
+        f.seek(max(size - FINGERPRINT_BYTES, 0))
+        tail = f.read()
+    return hashlib.sha256(head + tail).hexdigest()
+
+
+def _stamp_time(engine: ConvertEngine, date: bytes, hhmm: bytes) -> int | None:
+    # Seconds since 1970-01-01 of a DT/TI stamp, as out.txt prints it.
+    try:
+        clock = minute_ticks(date, hhmm)
+    except ValueError:
+        return None  # a garbled stamp
+    return (clock + engine.clock_offset()) // TICKS_PER_SEC
+
+
+def _scan_stamps(
+    engine: ConvertEngine, input_data: Path
+) -> tuple[list[int], list[int], list[tuple[int, int]]]:
+    # Time and line number of every DT/TI stamp, and the line number and
+    # byte offset of the stamps picked as checkpoints.
+    times: list[int] = []
+    lines: list[int] = []
+    checkpoints: list[tuple[int, int]] = []
+    date = b''
+    offset = 0
+    nextCheckpoint = CHECKPOINT_BYTES
+    with MappedLog(input_data) as logIn:
+        for linenum, logLine in enumerate(logIn.lines(), start=1):
+            tag = logLine[:2]
+            if tag == b'DT' or tag == b'TI':
+                if tag == b'DT':
+                    if logLine[3:6] != b'BAD':
+                        date = logLine[3:11]
+                    hhmm = logLine[12:17]
+                else:
+                    hhmm = logLine[3:8]
+                stamp = _stamp_time(engine, date, hhmm) if date else None
+                if stamp is not None:
+                    times.append(stamp)
+                    lines.append(linenum)
+                if offset >= nextCheckpoint:
+                    checkpoints.append((linenum, offset))
+                    nextCheckpoint = offset + CHECKPOINT_BYTES
+            offset += len(logLine)
+    return times, lines, checkpoints
+
+
+def _quiet_run(
+    engine: ConvertEngine, logIn: MappedLog, endLine: int, entry: ParserState
+) -> ParserState:
+    # Run the engine up to (not including) endLine, throwing the outputs and
+    # anything printed away.  The csv is always built so its state is right.
+    quiet = copy.copy(engine)
+    quiet.endLine = endLine
+    with (
+        open(os.devnull, 'w') as devnull,
+        contextlib.redirect_stdout(io.StringIO()),
+    ):
+        return quiet.run(logIn, devnull, devnull, entry)
+
+
+def build_index(engine: ConvertEngine, input_data: Path) -> dict[str, Any]:
+    """
+    Index a raw log by time and save the index next to it (index_path()).
+
+    The index holds the time (as printed in out.txt, in seconds since
+    1970-01-01) and line number of every DT and TI stamp, and at the first
+    stamp after every CHECKPOINT_BYTES the byte offset and the parser state
+    there, worked out by converting the log once without writing anything.
+
+    Inputs [engine, input_data]:
+        The engine with the conversion settings and the raw log.
+    Returns [dict(str, Any)]:
+        The index, as load_index() returns it.
+    """
+    times, lines, marks = _scan_stamps(engine, input_data)
+    checkpoints: list[dict[str, Any]] = []
+    state = ParserState()
+    with MappedLog(input_data) as logIn:
+        for linenum, offset in marks:
+            state = _quiet_run(engine, logIn, linenum, state)
+            checkpoints.append({'offset': offset, 'state': state})
+    index = {
+        'version': INDEX_VERSION,
+        'settings': _settings(engine),
+        'size': input_data.stat().st_size,
+        'fingerprint': _fingerprint(input_data),
+        'times': times,
+        'lines': lines,
+        'checkpoints': checkpoints,
+    }
+    saved = dict(
+        index,
+        checkpoints=[dict(c, state=c['state'].to_json()) for c in checkpoints],
+    )
+    index_path(input_data).write_text(json.dumps(saved, separators=(',', ':')))
+    return index
+
+
+def load_index(engine: ConvertEngine, input_data: Path) -> dict[str, Any] | None:
+    """
+    Read the saved index of a raw log.
+
+    Returns [dict(str, Any) | None]:
+        The index, None if there is none or it doesn't fit the log as it is
+        now or the engine's settings.
+    """
+    try:
+        index = json.loads(index_path(input_data).read_text())
+        if (
+            index.get('version') != INDEX_VERSION
+            or index['settings'] != _settings(engine)
+            or index['size'] != input_data.stat().st_size
+            or index['fingerprint'] != _fingerprint(input_data)
+        ):
+            return None
+        for checkpoint in index['checkpoints']:
+            checkpoint['state'] = ParserState.from_json(checkpoint['state'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return index
+
+
+def window_lines(
+    index: dict[str, Any], start: datetime | None, end: datetime | None
+) -> tuple[int, int | None] | None:
+    """
+    The lines of a raw log logged between two times.
+
+    The window opens at the first stamp at or after start and closes at the
+    first stamp after that one that is later than end, so the entries of
+    end's own minute are in it.  A clock set back in the log doesn't reopen
+    a window already passed.
+
+    Inputs [index, start, end]:
+        The log's index and the times (None for the start or end of the log).
+    Returns [tuple(int, int | None) | None]:
+        The first line of the window and the first line after it (None at
+        the end of the log), or None if nothing was logged in the window.
+    """
+    times = list(itertools.accumulate(index['times'], max))
+    lines = index['lines']
+    first = 0
+    if start is not None:
+        first = bisect.bisect_left(times, calendar.timegm(start.timetuple()))
+        if first == len(times):
+            return None
+    stop = len(times)
+    if end is not None:
+        stop = bisect.bisect_right(times, calendar.timegm(end.timetuple()), lo=first)
+        if stop == first:
+            return None
+    firstLine = lines[first] if start is not None else 1
+    return firstLine, lines[stop] if stop < len(lines) else None
+
+
+def convert_window(
+    engine: ConvertEngine,
+    input_data: Path,
+    start: datetime | None,
+    end: datetime | None,
+    output_txt: Path,
+    output_csv: Path,
+) -> ParserState | None:
+    """
+    Convert only what was logged between two times, as the same stretch of
+    a conversion of the whole log would read.
+
+    The log's index (built and saved the first time, see build_index()) gives
+    the lines of the window and the nearest checkpoint before it.  The parser
+    state is restored there and the few lines up to the window are run
+    through without output, so even a window at the end of a huge log is
+    quick.  out.txt and out.csv are replaced.  The log must be plain text
+    (a compressed log can't be seeked into); the outputs may be compressed.
+
+    Inputs [engine, input_data, start, end, output_txt, output_csv]:
+        The engine with the conversion settings (its line range is replaced
+        by the window's), the raw log, the times as printed in out.txt (None
+        for the start or end of the log) and the outputs as for
+        engine.convert().
+    Returns [ParserState | None]:
+        The parser state at the end of the window, None if nothing was
+        logged in it.
+    """
+    if compression_of(input_data) is not None:
+        raise ValueError(f'{input_data.name}: decompress the log to convert a window')
+    index = load_index(engine, input_data)
+    if index is None:
+        index = build_index(engine, input_data)
+    window = window_lines(index, start, end)
+    if window is None:
+        print(f'Nothing logged between {start} and {end}.')
+    return convert_span(engine, input_data, index, window, output_txt, output_csv)
+
+
+def convert_span(
+    engine: ConvertEngine,
+    input_data: Path,
+    index: dict[str, Any],
+    window: tuple[int, int | None] | None,
+    output_txt: Path,
+    output_csv: Path,
+    entry: tuple[int, ParserState] | None = None,
+) -> ParserState | None:
+    """
+    Convert only the lines of a window of an indexed log, as convert_window()
+    does once it has found them.
+
+    Inputs [engine, input_data, index, window, output_txt, output_csv, entry]:
+        The engine with the conversion settings, the raw log (plain text),
+        its index, the first line and the line to stop before (None for
+        the end of the log), as window_lines() gives them (None for an
+        empty window: the outputs are left empty), the outputs as for
+        engine.convert() and the byte offset of a line and the parser state
+        there to start from instead of the checkpoint before the window, if
+        it is nearer (e.g. the end of the window converted before).
+    Returns [ParserState | None]:
+        The parser state at the end of the window, None for an empty one.
+    """
+    compressed_path(output_txt, engine.compression).write_text('')
+    colOut = None
+    if engine.npzIt and window is not None:
+        from .columns import ColumnWriter, npz_path
+
+        colOut = ColumnWriter(npz_path(output_csv))
+    sparseOut = None
+    if engine.sparseIt and window is not None:
+        from .sparse import SparseWriter, sparse_path
+
+        sparseOut = SparseWriter(sparse_path(output_csv))
+    decOut = None
+    if engine.decimateIt and window is not None:
+        from .decimate import Decimator
+
+        decOut = Decimator(output_csv)
+    dbOut = None
+    if engine.fleetDb is not None and window is not None:
+        from .fleet import fleet_writer
+
+        dbOut = fleet_writer(engine.fleetDb, output_csv, engine.fleetSN)
+    evOut = None  # made once the log is open, for its byte offsets
+    with OutputSinks(
+        output_txt,
+        output_csv if engine.csvIt else None,
+        compression=engine.compression,
+    ) as sinks:
+        if sinks.csv is not None:
+            sinks.csv.write(CSV_HEADER)
+        if window is None:
+            return None
+        firstLine, stopLine = window
+        offsets = [0] + [c['offset'] for c in index['checkpoints']]
+        states = [ParserState()] + [c['state'] for c in index['checkpoints']]
+        lines = [1] + [c['state'].linenum for c in index['checkpoints']]
+        k = bisect.bisect_right(lines, firstLine) - 1
+        if entry is not None and lines[k] < entry[1].linenum <= firstLine:
+            offsets[k], states[k] = entry
+        try:
+            with MappedLog(input_data) as logIn:
+                if engine.eventsIt:
+                    from .events import EventWriter, events_path
+
+                    evOut = EventWriter(events_path(output_csv), logIn)
+                logIn.seek(offsets[k])
+                start = _quiet_run(engine, logIn, firstLine, states[k])
+                if evOut is not None:
+                    evOut.resume(start)
+                windowed = copy.copy(engine)
+                if stopLine is not None:
+                    windowed.endLine = stopLine
+                state = windowed.run(
+                    logIn,
+                    sinks.txt,
+                    sinks.csv,
+                    start,
+                    colOut,
+                    sparseOut,
+                    decOut,
+                    dbOut,
+                    evOut,
+                )
+                # Only the rows added in the window, not in the lines before
+                extraLines = state.extraLines - start.extraLines
+                windowed.print_summary(
+                    dataclasses.replace(state, extraLines=extraLines)
+                )
+        finally:
+            if colOut is not None:
+                colOut.save()
+            if sparseOut is not None:
+                sparseOut.close()
+            if decOut is not None:
+                decOut.close()
+            if dbOut is not None:
+                dbOut.close()
+            if evOut is not None:
+                evOut.close()
+    return state
@@ -0,0 +1,472 @@
+import bisect
+import functools
+import itertools
+import math
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, TextIO
+
+from .csvrow import CsvRowFormatter
+from .engine import FLUID_SPECIFIC_HEAT
+
+if TYPE_CHECKING:
+    from .engine import ConvertEngine, ParserState
+
+# Log lines decoded at a time.
+VECTOR_BLOCK_LINES: int = 8192
+
+# The lines taken here, by their code in a block (0 for any other line).
+_FL, _TM, _DB, _TH, _TI = 1, 2, 3, 4, 5
+
+# Characters of a line the fields are read from: the DB counters end at 20.
+_HEAD = 20
+
+
+@dataclass(slots=True)
+class _Block:
+    # A block of log lines decoded column by column.  The per-line lists are
+    # indexed by line, the per-position ones by the lines taken in before:
+    # [0] holds the parser state's values at the start of the block and
+    # [i + 1] the values after line i.
+    lines: list[str]
+    runs: list[tuple[int, int, bool]]  # (start, end, taken here) of each run
+    ticks: list[int]  # the TI lines
+    kinds: list[int]
+    secs: list[str]
+    fSecs: list[float]
+    edge: list[str]  # seconds text of a leading-edge row before the line
+    txt: list[str]  # out.txt entry, as the decoder words it
+    # per position from here on
+    measured: list[tuple[float, Any, Any]]  # (state's, per line, source) of each
+    diss: list[int]
+    glitch: list[tuple[int, int, int]]
+    meas: list[str]  # csv text of fThrot,fInTemp,fOutTemp,fFlow
+    dissText: list[str]
+    glitchText: list[str]  # csv text of iGlitch0,iGlitch1,iGlitch2
+
+    def measures(self, position: int) -> list[float]:
+        # fThrot, fInTemp, fOutTemp and fFlow, the state's own objects until
+        # a line sets them
+        return [
+            initial if source[position] == 0 else float(perLine[source[position] - 1])
+            for initial, perLine, source in self.measured
+        ]
+
+
+def _same(a: float, b: float) -> bool:
+    # Same value and same csv text: 0.0 == -0.0 but they print apart
+    return a is b or (a == b and math.copysign(1.0, a) == math.copysign(1.0, b))
+
+
+def _usable(st: 'ParserState') -> bool:
+    # Whether the state's measurements fit the block arithmetic.  A garbled
+    # line that float() still read (' 9e99') leaves the block to run().
+    return (
+        all(
+            isinstance(v, float) and abs(v) < 1e6
+            for v in (st.fThrot, st.fInTemp, st.fOutTemp, st.fFlow)
+        )
+        and abs(st.iDissWatts) < 2**53
+    )
+
+
+class VectorReader:
+    """
+    The log lines of a conversion read a block at a time, with the FL, TM,
+    DB and TH entries and the TI stamps between them (most of any log)
+    converted by the block instead of one by one.  ConvertEngine.run()
+    reads through it when vectorIt.
+
+    Every block of VECTOR_BLOCK_LINES lines is decoded with numpy: the tags
+    are classified and the fixed-width fields of every line read at once,
+    the measurements carried forward from line to line and the dissipated
+    power worked out for the whole block.  A run of those lines is then
+    written to out.txt and out.csv and taken into the parser state in one
+    go.  readline() only hands run() the other lines, and any FL/TM/DB/TH
+    line whose fields are not exactly as the decoders would print them
+    again (a garbled field, a LOG_VERSION 1 TM, ' 03.50' ...), to convert
+    as usual.  The outputs are exactly those of converting line by line.
+
+    Needs NumPy, which the rest of the converter does not.
+
+    Inputs [engine, st, offset, logIn, logOut, csvOut]:
+        The engine with the settings, the parser state run() converts
+        with (updated here as the runs are converted), the ticks run()
+        adds to the clock, the raw log and the outputs (csvOut None for no
+        csv).
+    """
+
+    def __init__(
+        self,
+        engine: 'ConvertEngine',
+        st: 'ParserState',
+        offset: int,
+        logIn: TextIO,
+        logOut: TextIO,
+        csvOut: TextIO | None,
+    ) -> None:
+        try:
+            import numpy
+        except ImportError as e:
+            raise ImportError('The vectorized conversion needs numpy') from e
+        self._np = numpy
+        self._engine = engine
+        self._st = st
+        self._offset = offset
+        self._logIn = logIn
+        self._logOut = logOut
+        self._csvOut = csvOut
+        self._formatter = CsvRowFormatter()
+        self.readline = functools.partial(next, self._lines(), '')
+
+    def _lines(self) -> Iterator[str]:
+        # The lines left to run(), converting the runs decoded here between
+        # them.  run() has taken in every line handed out before the next
+        # one is asked for, so the state is always up to date here.
+        st = self._st
+        endLine = self._engine.endLine
+        logLines = iter(self._logIn.readline, '')
+        while st.linenum < endLine:
+            count = min(VECTOR_BLOCK_LINES, endLine - st.linenum)
+            lines = list(itertools.islice(logLines, count))
+            if not lines:
+                return
+            if not _usable(st):
+                yield from lines
+                continue
+            block = self._decode(lines)
+            for start, end, taken in block.runs:
+                if taken and self._synced(block, start):
+                    self._convert(block, start, end)
+                else:
+                    yield from lines[start:end]
+
+    def _synced(self, block: _Block, start: int) -> bool:
+        # Whether the values carried through the block still hold at start.
+        # A line left to run() in between (a garbled FL ...) changed them.
+        st = self._st
+        return (
+            st.iDissWatts == block.diss[start]
+            and (st.iGlitch0, st.iGlitch1, st.iGlitch2) == block.glitch[start]
+            and all(
+                map(
+                    _same,
+                    (st.fThrot, st.fInTemp, st.fOutTemp, st.fFlow),
+                    block.measures(start),
+                )
+            )
+        )
+
+    def _decode(self, lines: list[str]) -> _Block:
+        np = self._np
+        st = self._st
+        n = len(lines)
+        # Character codes of the start of every line, 0 past its end
+        codes = np.array(lines, dtype=f'U{_HEAD}').view(np.uint32).reshape(n, _HEAD)
+        lengths = np.fromiter(map(len, lines), dtype=np.int64, count=n)
+
+        def text(columns: Any) -> Any:
+            width = columns.shape[1]
+            return np.ascontiguousarray(columns).view(f'U{width}').ravel()
+
+        def tagged(tag: str) -> Any:
+            return (codes[:, 0] == ord(tag[0])) & (codes[:, 1] == ord(tag[1]))
+
+        digit = (codes >= 48) & (codes <= 57)
+        # SS.hh seconds, which the out.txt and csv stamps print as logged
+        secsOK = digit[:, [3, 4, 6, 7]].all(axis=1) & (codes[:, 5] == 46)
+        secs = text(codes[:, 3:8])
+        hundredths = (codes[:, [3, 4, 6, 7]].astype(np.int64) - 48) @ [1000, 100, 10, 1]
+        fSecs = hundredths / 100.0
+        # Seconds of the leading-edge rows, as leading_edge() works them out
+        floor = np.where(secsOK, np.floor(fSecs * 100.0), 0).astype(np.int64)
+        edge = np.where(floor != 0, floor - 1, floor)
+        edgeCodes = np.stack(
+            [edge // 1000, edge // 100 % 10, edge, edge // 10 % 10, edge % 10], axis=1
+        )
+        edgeCodes += 48
+        edgeCodes[:, 2] = 46
+        edgeText = text(edgeCodes.astype(np.uint32))
+
+        # FL flow and TM inlet temperature share their columns
+        flowOK, flow, flowText = inOK, inTemp, inText = _fixed(np, codes[:, 9:14], 2)
+        outOK, outTemp, outText = _fixed(np, codes[:, 14:20], 2)
+        throtOK, throt, throtText = _fixed(np, codes[:, 9:14], 3)
+        # float() reads TH up to column 15, which must add nothing
+        throtOK &= (lengths <= 14) | (codes[:, 14] == 10) | (codes[:, 14] == 32)
+        glitchCols = [(9, 12), (13, 16), (17, 20)]
+        glitchOK = np.logical_and.reduce(
+            [digit[:, a:b].all(axis=1) for a, b in glitchCols]
+        )
+
+        kinds = np.zeros(n, dtype=np.int64)
+        kinds[tagged('FL') & secsOK & flowOK] = _FL
+        if self._engine.logVersion != 1:
+            kinds[tagged('TM') & secsOK & inOK & outOK] = _TM
+        kinds[tagged('DB') & secsOK & glitchOK] = _DB
+        kinds[tagged('TH') & secsOK & throtOK] = _TH
+        kinds[tagged('TI')] = _TI
+        isFL, isTM, isDB, isTH = (kinds == k for k in (_FL, _TM, _DB, _TH))
+
+        # out.txt entries, worded as by decode_FL(), decode_TM() ...
+        add = np.char.add
+        txt = np.full(n, '', dtype='U32')
+        txt[isFL] = add(add('Flow rate: ', flowText[isFL]), ' l/min     ')
+        txt[isTM] = add(
+            add(add(add('Inlet:', inText[isTM]), 'C, Outlet:'), outText[isTM]), 'C'
+        )
+        txt[isTH] = add(add('Throttle: ', throtText[isTH]), '            ')
+        dbText = [text(codes[isDB, a:b]) for a, b in glitchCols]
+        txt[isDB] = add(
+            add(
+                add(add(add(add('Debug 0:', dbText[0]), ' 1:'), dbText[1]), ' 2:'),
+                dbText[2],
+            ),
+            '    ',
+        )
+
+        # The values after every line, carried forward from the line that
+        # last set them or the state's
+        def carried(mask: Any) -> Any:
+            source = np.where(mask, np.arange(1, n + 1), 0)
+            return np.concatenate(([0], np.maximum.accumulate(source)))
+
+        def texts(initial: str, perLine: Any, source: Any) -> Any:
+            return np.concatenate((np.array([initial]), perLine))[source]
+
+        self._formatter.row(st)  # the texts of the state's measurements
+        fmt = self._formatter
+        throtAt, tmAt, flowAt = (carried(m) for m in (isTH, isTM, isFL))
+        measText = texts(fmt.throtText, throtText, throtAt)
+        for initial, perLine, source in (
+            (fmt.inTempText, inText, tmAt),
+            (fmt.outTempText, outText, tmAt),
+            (fmt.flowText, flowText, flowAt),
+        ):
+            measText = add(add(measText, ','), texts(initial, perLine, source))
+
+        # iDissWatts at every FL and TM, from the values carried to it
+        flowHeld = np.concatenate(([st.fFlow], flow))[flowAt]
+        inHeld = np.concatenate(([st.fInTemp], inTemp))[tmAt]
+        outHeld = np.concatenate(([st.fOutTemp], outTemp))[tmAt]
+        watts = flowHeld / 60.0 * (inHeld - outHeld) * FLUID_SPECIFIC_HEAT
+        watts[0] = st.iDissWatts
+        diss = watts.astype(np.int64)[carried(isFL | isTM)].tolist()
+
+        # The DB counters, carried by their rank among the DB lines
+        glitches = [
+            (st.iGlitch0, st.iGlitch1, st.iGlitch2),
+            *zip(
+                *(
+                    ((codes[isDB, a:b].astype(np.int64) - 48) @ [100, 10, 1]).tolist()
+                    for a, b in glitchCols
+                )
+            ),
+        ]
+        glitchAt = np.concatenate(
+            ([0], np.maximum.accumulate(np.where(isDB, np.cumsum(isDB), 0)))
+        ).tolist()
+        glitchTexts = ['{},{},{}'.format(*counters) for counters in glitches]
+
+        runs = (np.flatnonzero(np.diff(kinds != 0)) + 1).tolist()
+        taken = (kinds != 0).tolist()
+        return _Block(
+            lines=lines,
+            runs=[
+                (start, end, taken[start]) for start, end in zip([0, *runs], [*runs, n])
+            ],
+            ticks=np.flatnonzero(kinds == _TI).tolist(),
+            kinds=kinds.tolist(),
+            secs=secs.tolist(),
+            fSecs=fSecs.tolist(),
+            edge=edgeText.tolist(),
+            txt=txt.tolist(),
+            measured=[
+                (st.fThrot, throt, throtAt),
+                (st.fInTemp, inTemp, tmAt),
+                (st.fOutTemp, outTemp, tmAt),
+                (st.fFlow, flow, flowAt),
+            ],
+            diss=diss,
+            glitch=[glitches[i] for i in glitchAt],
+            meas=measText.tolist(),
+            dissText=list(map(str, diss)),
+            glitchText=[glitchTexts[i] for i in glitchAt],
+        )
+
+    def _convert(self, block: _Block, start: int, end: int) -> None:
+        # Convert a run of lines as run() would one by one.  The TI stamps
+        # only move the clock: they split the run into entries with the
+        # same time stamp.
+        engine = self._engine
+        st = self._st
+        ticks = block.ticks
+        entries: list[int] = []  # the lines of the run but the TI stamps
+        stamps: list[str] = []  # the 'date time:' of each entry
+        dates: list[str] = []
+        minutes: list[int] = []  # minuteSecs of each entry
+        first = start
+        for tick in [
+            *ticks[bisect.bisect_left(ticks, start) : bisect.bisect_left(ticks, end)],
+            end,
+        ]:
+            if tick > first:
+                count = tick - first
+                entries += range(first, tick)
+                stamps += [f'{st.date} {st.time}:'] * count
+                dates += [st.date] * count
+                minutes += [st.minuteSecs] * count
+                # As run() leaves them after these entries
+                st.newSecs = count > 1 or not st.newTime
+                st.newTime = False
+            if tick < end:
+                engine.take_TI(st, block.lines[tick], self._offset)
+            first = tick + 1
+        st.linenum += end - start
+        st.tag = block.lines[end - 1][:2]
+        st.lastDate = st.date
+        if not entries:
+            return
+
+        # As parseLogEntries() leaves them: every entry clears the one-tag
+        # flags, so only a lone entry sees the previous bPowerdown
+        st.wasPowerdown = st.bPowerdown if len(entries) == 1 else False
+        st.bRestart = st.bCold = st.bPowerdown = st.bLogClosed = False
+        secs = [block.secs[i] for i in entries]
+        if engine.mute == 0:
+            txt = block.txt
+            self._logOut.write(
+                ''.join(
+                    [
+                        f'{txt[i]} {stamp}{s}\n'
+                        for i, stamp, s in zip(entries, stamps, secs)
+                    ]
+                )
+            )
+        if self._csvOut is not None:
+            if engine.mute != 1 and '' not in dates:
+                self._write_rows(block, entries, stamps, dates, minutes)
+            else:
+                kinds = block.kinds
+                # No row before the first date, nor for a muted FL or TM
+                rows = [
+                    k
+                    for k, i in enumerate(entries)
+                    if dates[k] != '' and (engine.mute != 1 or kinds[i] in (_DB, _TH))
+                ]
+                if rows:
+                    self._write_rows(
+                        block,
+                        [entries[k] for k in rows],
+                        [stamps[k] for k in rows],
+                        [dates[k] for k in rows],
+                        [minutes[k] for k in rows],
+                    )
+
+        last = st.lastSecs
+        for s in secs:
+            if s != last:
+                if st.startSecs == '':
+                    st.startSecs = s
+                st.endSecs = last = s
+        st.secs = st.lastSecs = secs[-1]
+        st.fThrot, st.fInTemp, st.fOutTemp, st.fFlow = block.measures(end)
+        st.iDissWatts = block.diss[end]
+        st.iGlitch0, st.iGlitch1, st.iGlitch2 = block.glitch[end]
+        st.numThings += len(entries)
+        st.gotIt = True
+        st.txt = block.txt[entries[-1]]
+        if engine.mute == 1 and block.kinds[entries[-1]] in (_FL, _TM):
+            st.txt = ''
+
+    def _write_rows(
+        self,
+        block: _Block,
+        rows: list[int],
+        stamps: list[str],
+        dates: list[str],
+        minutes: list[int],
+    ) -> None:
+        # The csv rows of the entries of a run, with their leading-edge rows
+        st = self._st
+        head, mid, counts, tail = self._formatter.frame(st)
+        meas, dissText, glitchText = block.meas, block.dissText, block.glitchText
+        bodies = [
+            f'{head}{meas[i + 1]}{mid}{dissText[i + 1]}{counts}{glitchText[i + 1]}{tail}'
+            for i in rows
+        ]
+        fSecs = block.fSecs
+        times = [minute + fSecs[i] for i, minute in zip(rows, minutes)]
+        # In floats, as run() compares them
+        edges = [
+            date == prevDate and t - prev > 0.02
+            for date, prevDate, t, prev in zip(
+                dates, [st.lastDateDup, *dates], times, [st.fTimeSecs, *times]
+            )
+        ]
+        secs, edge = block.secs, block.edge
+        self._csvOut.write(
+            ''.join(
+                [
+                    f'{stamp}{edge[i]},{prev}{stamp}{secs[i]},{body}'
+                    if isEdge
+                    else f'{stamp}{secs[i]},{body}'
+                    for i, stamp, isEdge, prev, body in zip(
+                        rows, stamps, edges, [st.csvLine, *bodies], bodies
+                    )
+                ]
+            )
+        )
+        st.extraLines += sum(edges)
+        st.fSecs = fSecs[rows[-1]]
+        st.fTimeSecs = times[-1]
+        st.csvLine = bodies[-1]
+        st.lastDateDup = dates[-1]
+
+
+def _fixed(np: Any, columns: Any, decimals: int) -> tuple[Any, Any, Any]:
+    """
+    Read a fixed-point field of every line, as float() does.
+
+    Inputs [np, columns, decimals]:
+        numpy, the character codes of the field (lines x width) and the
+        decimals it has.
+    Returns [tuple(array, array, array)]:
+        Whether each field is written exactly as f'{value:5.{decimals}f}'
+        prints its value (space padded, an optional '-', no leading zeros),
+        the values and that text.  Other fields are left to the decoders.
+    """
+    width = columns.shape[1]
+    point = width - decimals - 1
+    digit = (columns >= 48) & (columns <= 57)
+    space = columns == 32
+    minus = columns == 45
+    valid = (columns[:, point] == 46) & digit[:, point - 1]
+    for j in range(point + 1, width):
+        valid &= digit[:, j]
+    # Before the point: spaces, a '-' and digits, the first one not a 0
+    # unless it is the units
+    for j in range(point - 1):
+        valid &= space[:, j] | minus[:, j] | digit[:, j]
+        valid &= ~minus[:, j] | digit[:, j + 1]
+        if j == 0:
+            valid &= columns[:, j] != 48
+        else:
+            valid &= ~space[:, j] | space[:, j - 1]
+            valid &= ~minus[:, j] | space[:, j - 1]
+            valid &= (columns[:, j] != 48) | digit[:, j - 1]
+    scaled = 0
+    for j in range(width):
+        if j != point:
+            place = width - 1 - j - (j < point)
+            scaled = scaled + np.where(digit[:, j], columns[:, j] - 48, 0) * 10**place
+    value = scaled / 10.0**decimals
+    value = np.where(minus[:, :point].any(axis=1), -value, value)
+    # The text is the field without the padding past 5 characters
+    if width > 5:
+        shifted = np.concatenate(
+            (columns[:, 1:], np.zeros_like(columns[:, :1])), axis=1
+        )
+        columns = np.where(space[:, :1], shifted, columns)
+    text = np.ascontiguousarray(columns).view(f'U{width}').ravel()
+    return valid, value, text
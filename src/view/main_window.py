@@ -26,7 +26,8 @@ from ..view.connection_window import ConnectionWindow
 
 class MainWindow(QMainWindow):
     # Define Signals to emit to Controller
-    commandIt_sig = Signal()
+    # is `New Data Only`, `Convert on Pull` and `Create CSV` checked?
+    commandIt_sig = Signal(bool, bool, bool)
     printIt_sig = Signal(bool)  # is `Print Log` checked?
     convertLog_sig = Signal(bool, bool)  # is `Print Log` and `Create CSV` checked?
     fname_sig = Signal(str, str)  # serial number and log number
@@ -60,7 +61,7 @@ class MainWindow(QMainWindow):
 
     def create_gui(self) -> None:
         window_width = 350
-        window_height = 250
+        window_height = 280
         self.setFixedSize(window_width, window_height)
         root_dir: Path = h.get_root_dir()
         icon_path: str = str(root_dir / 'assets' / 'icon.ico')
@@ -75,6 +76,10 @@ class MainWindow(QMainWindow):
         self.printIt_cb.setChecked(False)
         self.csvIt_cb = QCheckBox('Create CSV')
         self.csvIt_cb.setChecked(True)
+        self.convertIt_cb = QCheckBox('Convert on Pull')
+        self.convertIt_cb.setChecked(False)
+        self.pullNew_cb = QCheckBox('New Data Only')
+        self.pullNew_cb.setChecked(False)
         self.commandIt_pb = QPushButton('Pull Data Log')
         self.SN_le = QLineEdit(placeholderText='Enter Serial Number')
         self.logNum_le = QLineEdit(placeholderText='Enter Log Number')
@@ -104,6 +109,7 @@ class MainWindow(QMainWindow):
         cb_layout = QHBoxLayout()
         cb_layout.addWidget(self.printIt_cb)
         cb_layout.addWidget(self.csvIt_cb)
+        cb_layout.addWidget(self.convertIt_cb)
 
         group_box = QGroupBox()
         group_box.setStyleSheet("""
@@ -125,6 +131,7 @@ class MainWindow(QMainWindow):
 
         main_layout = QVBoxLayout()
         main_layout.addLayout(le_layout)
+        main_layout.addWidget(self.pullNew_cb)
         main_layout.addWidget(self.commandIt_pb)
         main_layout.addItem(spacer)
         main_layout.addWidget(group_box)
@@ -174,7 +181,11 @@ class MainWindow(QMainWindow):
             return
         self.fname_sig.emit(self.SN_le.text(), self.logNum_le.text())
         self.folder_path_sig.emit(folder_path)
-        self.commandIt_sig.emit()
+        self.commandIt_sig.emit(
+            self.pullNew_cb.isChecked(),
+            self.convertIt_cb.isChecked(),
+            self.csvIt_cb.isChecked(),
+        )
 
     def handle_convertLog_clicked(self) -> None:
         self.convertLog_pb.setEnabled(False)